@@ -3,10 +3,10 @@ from datetime import datetime
 
 from typing import TypeVar, Type
 
-from sqlalchemy import update
+from sqlalchemy import update, and_, ColumnElement
 from ulid import ULID
 
-from app.data.database import db_add, db_session_query, db_exec
+from app.data.database import db_add, db_session_query, db_exec, async_db_add, async_db_get, db_exec_all
 from app.data.entity.base import Base
 
 T = TypeVar('T', bound=Base)
@@ -27,6 +27,17 @@ class BaseDAO:
         db_add(instance_copy)
         return str(instance.id)
 
+    @staticmethod
+    async def add_async(instance: T) -> str:
+        if instance.id is None:
+            instance.id = str(ULID())
+        instance.created_at = datetime.now()
+        instance.updated_at = instance.created_at
+        instance.updated_by = instance.created_by
+        instance_copy = copy.deepcopy(instance)
+        await async_db_add(instance_copy)
+        return str(instance.id)
+
     def get(self, instance_id: str | int) -> T | None:
         if instance_id is None or instance_id == '':
             return None
@@ -35,7 +46,36 @@ class BaseDAO:
             res = session.get(self._cls, instance_id)
         return res
 
+    async def get_async(self, instance_id: str | int) -> T | None:
+        if instance_id is None or instance_id == '':
+            return None
+        return await async_db_get(self._cls, instance_id)
+
     def delete(self, instance_id: str, updated_by: str, is_deleted: bool = True):
         stmt = update(self._cls).where(self._cls.id == instance_id).values(
             is_deleted=True if is_deleted else None, updated_at=datetime.now(), updated_by=updated_by)
         db_exec(stmt)
+
+
+def soft_delete_cascade(targets: list[tuple[type, ColumnElement]], updated_by: str,
+                        restore_of: str | None = None) -> str:
+    """
+    Soft-delete the rows of several entities, one set-based UPDATE per (entity, criterion), all in one
+    transaction. Every row deleted together is stamped with the same deleted_batch id, which is returned.
+    Passing that id as restore_of restores exactly those rows: rows deleted on their own, before or
+    after, carry no or another batch id and stay deleted, whatever was written to them since.
+    """
+    now = datetime.now()
+    batch = str(ULID())
+    statements = []
+    for cls, criterion in targets:
+        if restore_of is None:
+            state, values = cls.is_deleted.isnot(True), {'is_deleted': True, 'deleted_batch': batch}
+        else:
+            state, values = and_(cls.is_deleted.is_(True), cls.deleted_batch == restore_of), \
+                {'is_deleted': None, 'deleted_batch': None}
+        statements.append(update(cls).where(criterion, state)
+                          .values(**values, updated_at=now, updated_by=updated_by)
+                          .execution_options(synchronize_session=False))
+    db_exec_all(*statements)
+    return batch
@@ -1,7 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+from ulid import ULID
+
 from app.data.dao.base_dao import BaseDAO
+from app.data.database import async_db_exec_many
 from app.data.entity.entities import Behavior
 
 
 class BehaviorDAO(BaseDAO):
     def __init__(self):
         super().__init__(Behavior)
+
+    @staticmethod
+    async def add_batch_async(rows: list[dict]) -> int:
+        """Insert many behavior rows (user_id, behavior_type, ip, optional created_at) with one executemany."""
+        now = datetime.now()
+        values = []
+        for row in rows:
+            created_at = row.get('created_at') or now
+            values.append({
+                'id': str(ULID()),
+                'user_id': row.get('user_id'),
+                'behavior_type': row.get('behavior_type'),
+                'ip': row.get('ip'),
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        await async_db_exec_many(insert(Behavior), values)
+        return len(values)
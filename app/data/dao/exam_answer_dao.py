@@ -1,10 +1,49 @@
 from datetime import datetime
+from typing import Callable
 
-from sqlalchemy import select, update
+from sqlalchemy import select, update, cast, Float, Numeric, bindparam, case, func
+from ulid import ULID
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_one_or_none, db_exec
-from app.data.entity.entities import ExamAnswer
+from app.data.database import db_exec, async_db_one_or_none, \
+    async_db_session_commit, dialect_insert, async_db_scalars, async_db_rows, async_db_row_or_none
+from app.data.entity.entities import ExamAnswer, Question, Exam, ExamSection, Paper, PaperSection, Users
+
+# Columns an examinee may change through an answer delta
+ANSWER_DELTA_FIELDS: tuple[str, ...] = ('answer', 'marked')
+
+# Scores saved answers in place and returns the running-total rows (b_id, b_delta, b_pass_score)
+# of the exam sections and exams they belong to
+AnswerScorer = Callable[[list[ExamAnswer]], tuple[list[dict], list[dict]]]
+
+
+def _add_score_statement(entity):
+    """Add b_delta to the running score of an exam or exam section and re-evaluate is_passed against b_pass_score."""
+    table = entity.__table__
+    score = func.coalesce(table.c.score, 0) + bindparam('b_delta', type_=Numeric(6, 2))
+    pass_score = bindparam('b_pass_score', type_=Numeric(6, 2))
+    return (update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(score=score, is_passed=case((pass_score.is_(None), None), else_=score >= pass_score)))
+
+
+def _recompute_score_statement(entity, ids: list[str], updated_by: str | None, now: datetime):
+    """Set the score of exams or exam sections to the sum of their live answers and re-evaluate is_passed."""
+    if entity is ExamSection:
+        owner = ExamAnswer.exam_section_id
+        pass_score = select(PaperSection.pass_score).where(PaperSection.id == ExamSection.paper_section_id)
+    else:
+        owner = ExamAnswer.exam_id
+        pass_score = select(Paper.pass_score).where(Paper.id == Exam.paper_id)
+    pass_score = pass_score.scalar_subquery()
+    total = (select(func.coalesce(func.sum(ExamAnswer.score), 0))
+             .where(owner == entity.id, ExamAnswer.is_deleted.is_(None))
+             .scalar_subquery())
+    return (update(entity)
+            .where(entity.id.in_(ids))
+            .values(score=total, is_passed=case((pass_score.is_(None), None), else_=total >= pass_score),
+                    updated_at=now, updated_by=updated_by)
+            .execution_options(synchronize_session=False))
 
 
 class ExamAnswerDAO(BaseDAO):
@@ -12,9 +51,90 @@ class ExamAnswerDAO(BaseDAO):
         super().__init__(ExamAnswer)
 
     @staticmethod
-    def get_by_examinee_question(examinee_id: str, question_id: str):
-        stmt = select(ExamAnswer).where(ExamAnswer.question_id == question_id, ExamAnswer.examinee_id == examinee_id)
-        return db_one_or_none(stmt)
+    async def get_by_exam_question_async(exam_id: str, question_id: str) -> ExamAnswer | None:
+        stmt = select(ExamAnswer).where(ExamAnswer.exam_id == exam_id, ExamAnswer.question_id == question_id)
+        return await async_db_one_or_none(stmt)
+
+    @staticmethod
+    async def list_by_exam_section_async(exam_id: str, exam_section_id: str) -> list[ExamAnswer]:
+        # exam_id first, so the (exam_id, question_id) index serves the lookup
+        stmt = (select(ExamAnswer)
+                .where(ExamAnswer.exam_id == exam_id, ExamAnswer.exam_section_id == exam_section_id)
+                .order_by(ExamAnswer.seq))
+        return await async_db_scalars(stmt)
+
+    @staticmethod
+    async def list_for_grading_async(schedule_session_id: str):
+        """(id, exam_id, exam_section_id, question_id, answer, score, is_correct) of a session's live answers."""
+        # score as float: the grading pass works on floats and Decimal conversion dominates large cohorts
+        stmt = (select(ExamAnswer.id, ExamAnswer.exam_id, ExamAnswer.exam_section_id, ExamAnswer.question_id,
+                       ExamAnswer.answer, cast(ExamAnswer.score, Float).label('score'), ExamAnswer.is_correct)
+                .join(Exam, Exam.id == ExamAnswer.exam_id)
+                .where(Exam.schedule_session_id == schedule_session_id, Exam.is_deleted.is_(None),
+                       ExamAnswer.is_deleted.is_(None)))
+        return await async_db_rows(stmt)
+
+    @staticmethod
+    async def list_for_regrade_async(paper_id: str, question_ids: list[str]):
+        """(id, exam_id, exam_section_id, question_id, answer, score, is_correct) of live answers to some questions."""
+        stmt = (select(ExamAnswer.id, ExamAnswer.exam_id, ExamAnswer.exam_section_id, ExamAnswer.question_id,
+                       ExamAnswer.answer, cast(ExamAnswer.score, Float).label('score'), ExamAnswer.is_correct)
+                .join(Exam, Exam.id == ExamAnswer.exam_id)
+                .where(Exam.paper_id == paper_id, ExamAnswer.question_id.in_(question_ids), Exam.is_deleted.is_(None),
+                       ExamAnswer.is_deleted.is_(None)))
+        return await async_db_rows(stmt)
+
+    @staticmethod
+    def export_statement(schedule_session_id: str):
+        """One row per live answer of a session with its examinee, section and question, for results export."""
+        return (select(Users.enroll_number, Users.surname, Users.name, ExamSection.seq.label('section_seq'),
+                       ExamAnswer.seq.label('question_seq'), Question.code.label('question_code'),
+                       Question.question_type, ExamAnswer.answer, ExamAnswer.marked, ExamAnswer.is_correct,
+                       ExamAnswer.score, ExamAnswer.updated_at)
+                .join(Exam, Exam.id == ExamAnswer.exam_id)
+                .join(Users, Users.id == ExamAnswer.examinee_id)
+                .outerjoin(ExamSection, ExamSection.id == ExamAnswer.exam_section_id)
+                .outerjoin(Question, Question.id == ExamAnswer.question_id)
+                .where(Exam.schedule_session_id == schedule_session_id, Exam.is_deleted.is_(None),
+                       ExamAnswer.is_deleted.is_(None))
+                .order_by(Users.enroll_number, ExamAnswer.exam_id, ExamSection.seq, ExamAnswer.seq))
+
+    @staticmethod
+    def _analysis_filter(stmt, paper_id: str, schedule_session_id: str | None):
+        stmt = (stmt.join(Exam, Exam.id == ExamAnswer.exam_id)
+                .where(Exam.paper_id == paper_id, Exam.is_deleted.is_(None), ExamAnswer.is_deleted.is_(None)))
+        if schedule_session_id is not None:
+            stmt = stmt.where(Exam.schedule_session_id == schedule_session_id)
+        return stmt
+
+    @staticmethod
+    async def list_for_analysis_async(paper_id: str, schedule_session_id: str | None = None):
+        """(exam_id, question_id, answer, score) of the live answers to a paper, optionally of one session."""
+        stmt = select(ExamAnswer.exam_id, ExamAnswer.question_id, ExamAnswer.answer,
+                      cast(ExamAnswer.score, Float).label('score'))
+        return await async_db_rows(ExamAnswerDAO._analysis_filter(stmt, paper_id, schedule_session_id))
+
+    @staticmethod
+    async def get_analysis_fingerprint_async(paper_id: str, schedule_session_id: str | None = None):
+        """(answer count, latest updated_at) of the answers list_for_analysis_async returns; changes when they do."""
+        stmt = select(func.count(ExamAnswer.id), func.max(ExamAnswer.updated_at))
+        return await async_db_row_or_none(ExamAnswerDAO._analysis_filter(stmt, paper_id, schedule_session_id))
+
+    @staticmethod
+    async def apply_regrade_async(answers: list[dict], exam_section_ids: list[str], exam_ids: list[str],
+                                  updated_by: str | None, chunk_size: int = 1000):
+        """
+        Write rescored answers (bulk UPDATE by primary key), then recompute the totals of the touched exam
+        sections and exams from their answers with set-based UPDATEs, all in one transaction.
+        """
+        now = datetime.now()
+        async with async_db_session_commit() as session:
+            if answers:
+                await session.execute(update(ExamAnswer), answers)
+            for entity, ids in ((ExamSection, exam_section_ids), (Exam, exam_ids)):
+                for start in range(0, len(ids), chunk_size):
+                    await session.execute(_recompute_score_statement(entity, ids[start:start + chunk_size],
+                                                                     updated_by, now))
 
     @staticmethod
     def mark(user_id:str, instance_id:str, mark: bool):
@@ -26,4 +146,72 @@ class ExamAnswerDAO(BaseDAO):
     def submit(user_id:str, instance_id:str, answer: str):
         stmt = update(ExamAnswer).where(ExamAnswer.id == instance_id).values(
             answer=answer, updated_at=datetime.now(), updated_by=user_id)
-        db_exec(stmt)
\ No newline at end of file
+        db_exec(stmt)
+
+    @staticmethod
+    def coalesce_deltas(deltas: list[dict]) -> dict[tuple[str, str], dict]:
+        """Merge deltas hitting the same (exam_id, question_id); later values win field by field."""
+        merged: dict[tuple[str, str], dict] = {}
+        for delta in deltas:
+            key = (delta['exam_id'], delta['question_id'])
+            merged[key] = {**merged.get(key, {}), **delta}
+        return merged
+
+    @staticmethod
+    def _upsert_statement(rows: list[dict], fields: tuple[str, ...]):
+        stmt = dialect_insert(ExamAnswer).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[ExamAnswer.exam_id, ExamAnswer.question_id],
+            set_={field: stmt.excluded[field] for field in fields + ('updated_at', 'updated_by')},
+            # an answer row is only ever rewritten by the examinee it belongs to
+            where=ExamAnswer.examinee_id == stmt.excluded.examinee_id,
+        ).returning(ExamAnswer)
+
+    @staticmethod
+    async def upsert_batch_async(deltas: list[dict], scorer: AnswerScorer | None = None) -> list[ExamAnswer]:
+        """
+        Write answer deltas (exam_id, exam_section_id, examinee_id, question_id, optional seq plus any of
+        answer/marked) from any number of examinees in one transaction.
+        Rows are keyed by the unique (exam_id, question_id) index, so each delta is a single
+        INSERT ... ON CONFLICT DO UPDATE ... RETURNING, without a lookup beforehand.
+        A scorer, when given, scores the written answers and its running totals are added in the same
+        transaction; the upserted rows stay locked until commit, so concurrent saves of an answer cannot
+        apply the same score delta twice.
+        """
+        merged = ExamAnswerDAO.coalesce_deltas(deltas)
+        now = datetime.now()
+        # one multi-row upsert per set of changed columns, all rows of a statement share its shape
+        rows_by_fields: dict[tuple[str, ...], list[dict]] = {}
+        for delta in merged.values():
+            fields = tuple(field for field in ANSWER_DELTA_FIELDS if field in delta)
+            seq = delta.get('seq')
+            if seq is None:
+                seq = select(Question.seq).where(Question.id == delta['question_id']).scalar_subquery()
+            row = {
+                'id': str(ULID()),
+                'seq': seq,
+                'question_id': delta['question_id'],
+                'examinee_id': delta['examinee_id'],
+                'exam_section_id': delta['exam_section_id'],
+                'exam_id': delta['exam_id'],
+                'created_by': delta['examinee_id'],
+                'created_at': now,
+                'updated_by': delta['examinee_id'],
+                'updated_at': now,
+            }
+            row.update({field: delta[field] for field in fields})
+            rows_by_fields.setdefault(fields, []).append(row)
+
+        answers: list[ExamAnswer] = []
+        async with async_db_session_commit() as session:
+            for fields, rows in rows_by_fields.items():
+                res = await session.scalars(ExamAnswerDAO._upsert_statement(rows, fields),
+                                            execution_options={'populate_existing': True})
+                answers.extend(res.all())
+            if scorer is not None:
+                section_totals, exam_totals = scorer(answers)
+                if section_totals:
+                    await session.execute(_add_score_statement(ExamSection), section_totals)
+                if exam_totals:
+                    await session.execute(_add_score_statement(Exam), exam_totals)
+        return answers
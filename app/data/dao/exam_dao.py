@@ -1,16 +1,26 @@
 from datetime import datetime
 
-from sqlalchemy import update, select, text
+from sqlalchemy import update, select, insert, and_, or_, func
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_one_or_none, db_session_query, engine
-from app.data.entity.entities import Exam, ScheduleSession, Users
+from app.data.database import db_exec, db_one_or_none, engine, async_db_one_or_none, async_db_exec, \
+    async_db_row_or_none, db_rows, async_db_rows, db_exec_all
+from app.data.entity.entities import Exam, ScheduleSession, Users, ExamSection, ScheduleSection
 
 EXAM_STATUS_NOT_STARTED: int = 0
 EXAM_STATUS_IN_PREPARATION: int = 1
 EXAM_STATUS_IN_EXAM: int = 2
 EXAM_STATUS_CLOSED: int = 3
 
+# rows per multi-row INSERT of add_many
+INSERT_CHUNK_ROWS: int = 1000
+
+
+def _examinee_name():
+    # NULL-safe on every backend: a missing surname or given name must not blank the whole name
+    return func.coalesce(Users.surname, '') + ', ' + func.coalesce(Users.name, '')
+
+
 class ExamDAO(BaseDAO):
     def __init__(self):
         super().__init__(Exam)
@@ -26,9 +36,30 @@ class ExamDAO(BaseDAO):
 
     @staticmethod
     def get_by_session_examinee(schedule_session_id: str, examinee_email: str):
-        stmt = select(Exam).where(Exam.schedule_session_id == schedule_session_id, Exam.examinee_email == examinee_email)
+        stmt = select(Exam).where(Exam.schedule_session_id == schedule_session_id, Exam.examinee_email == examinee_email,
+                                  Exam.is_deleted.is_(None))
         return db_one_or_none(stmt)
 
+    @staticmethod
+    def map_examinee_exams(schedule_session_id: str) -> dict[str, tuple[str, bool]]:
+        """Examinee email -> (exam id, is live) of a session's exams, a live exam winning over deleted ones."""
+        stmt = (select(Exam.examinee_email, Exam.id, Exam.is_deleted.is_(None))
+                .where(Exam.schedule_session_id == schedule_session_id)
+                .order_by(Exam.is_deleted.is_(None)))
+        return {email: (exam_id, bool(is_live)) for email, exam_id, is_live in db_rows(stmt)}
+
+    @staticmethod
+    def add_many(rows: list[dict], restore_ids: list[str] = (), updated_by: str | None = None):
+        """
+        Insert exams given as column dicts with multi-row INSERTs, and un-delete the exams of restore_ids,
+        all in one transaction.
+        """
+        statements = [insert(Exam).values(rows[i:i + INSERT_CHUNK_ROWS]) for i in range(0, len(rows), INSERT_CHUNK_ROWS)]
+        if restore_ids:
+            statements.append(update(Exam).where(Exam.id.in_(restore_ids))
+                              .values(is_deleted=None, updated_at=datetime.now(), updated_by=updated_by))
+        db_exec_all(*statements)
+
     @staticmethod
     def get_unclosed_for_examinee(examinee_id: str) -> Exam:
         stmt = (select(Exam)
@@ -37,6 +68,103 @@ class ExamDAO(BaseDAO):
                 .order_by(ScheduleSession.plan_start).limit(1))
         return db_one_or_none(stmt)
 
+    @staticmethod
+    async def get_unclosed_for_examinee_async(examinee_id: str) -> Exam:
+        stmt = (select(Exam)
+                .where(Exam.examinee_id==examinee_id, Exam.status!=EXAM_STATUS_CLOSED, Exam.is_deleted.is_(None))
+                .join(ScheduleSession, Exam.paper_id == ScheduleSession.paper_id)
+                .order_by(ScheduleSession.plan_start).limit(1))
+        return await async_db_one_or_none(stmt)
+
+    @staticmethod
+    async def get_with_last_section_async(exam_id: str):
+        """(Exam, latest ExamSection or None) in one query; section ids are ULIDs, so the max id is the newest."""
+        last_section_id = select(func.max(ExamSection.id)).where(ExamSection.exam_id == exam_id).scalar_subquery()
+        stmt = (select(Exam, ExamSection)
+                .outerjoin(ExamSection, ExamSection.id == last_section_id)
+                .where(Exam.id == exam_id))
+        return await async_db_row_or_none(stmt)
+
+    @staticmethod
+    async def get_with_section_seq_async(exam_id: str, seq: int):
+        """(Exam, ExamSection or None, ScheduleSection or None) of one section sequence in one query."""
+        stmt = (select(Exam, ExamSection, ScheduleSection)
+                .outerjoin(ExamSection, and_(ExamSection.exam_id == Exam.id, ExamSection.seq == seq))
+                .outerjoin(ScheduleSection, and_(ScheduleSection.schedule_session_id == Exam.schedule_session_id,
+                                                 ScheduleSection.seq == seq))
+                .where(Exam.id == exam_id))
+        return await async_db_row_or_none(stmt)
+
+    @staticmethod
+    async def get_with_section_async(exam_id: str, section_id: str):
+        """(Exam, ExamSection or None, ScheduleSection or None) of one exam section in one query."""
+        stmt = (select(Exam, ExamSection, ScheduleSection)
+                .outerjoin(ExamSection, and_(ExamSection.exam_id == Exam.id, ExamSection.id == section_id))
+                .outerjoin(ScheduleSection, and_(ScheduleSection.schedule_session_id == Exam.schedule_session_id,
+                                                 ScheduleSection.seq == ExamSection.seq))
+                .where(Exam.id == exam_id))
+        return await async_db_row_or_none(stmt)
+
+    @staticmethod
+    def _roster_statement(*criteria):
+        return (select(Users, Exam, ScheduleSession.plan_start)
+                .join(Exam, Exam.examinee_id == Users.id)
+                .join(ScheduleSession, ScheduleSession.id == Exam.schedule_session_id)
+                .where(*criteria, Exam.status != EXAM_STATUS_CLOSED,
+                       Exam.is_deleted.is_(None), Users.is_deleted.isnot(True),
+                       ScheduleSession.is_ready.is_(True), ScheduleSession.is_deleted.is_(None)))
+
+    @staticmethod
+    def list_roster(schedule_session_id: str):
+        """(Users, Exam, plan_start) of every unclosed exam in a ready session; empty when the session is not ready."""
+        return db_rows(ExamDAO._roster_statement(Exam.schedule_session_id == schedule_session_id))
+
+    @staticmethod
+    async def list_roster_async(schedule_session_id: str):
+        return await async_db_rows(ExamDAO._roster_statement(Exam.schedule_session_id == schedule_session_id))
+
+    @staticmethod
+    async def get_roster_row_async(exam_id: str):
+        """Current (Users, Exam, plan_start) of one exam, or None once it has left its session's roster."""
+        return await async_db_row_or_none(ExamDAO._roster_statement(Exam.id == exam_id))
+
+    @staticmethod
+    def list_students_by_sessions(schedule_session_ids: list[str], offset: int = 0, limit: int | None = None):
+        """
+        (id, schedule_session_id, examinee_email, examinee_enroll_number, status, rn, total) of the live exams
+        of many sessions, numbered (rn) by enroll number within each session, with the session's exam count.
+        With offset/limit only that page of each session is returned, plus its first row, which carries the
+        count of a session whose page is empty.
+        """
+        numbered = (select(Exam.id, Exam.schedule_session_id, Exam.examinee_email, Exam.examinee_enroll_number,
+                           Exam.status,
+                           func.row_number().over(partition_by=Exam.schedule_session_id,
+                                                  order_by=(Exam.examinee_enroll_number, Exam.id)).label('rn'),
+                           func.count().over(partition_by=Exam.schedule_session_id).label('total'))
+                    .where(Exam.schedule_session_id.in_(schedule_session_ids), Exam.is_deleted.is_(None))
+                    .subquery())
+        page = numbered.c.rn > offset
+        if limit is not None:
+            page = and_(page, numbered.c.rn <= offset + limit)
+        stmt = (select(numbered)
+                .where(or_(page, numbered.c.rn == 1))
+                .order_by(numbered.c.schedule_session_id, numbered.c.rn))
+        return db_rows(stmt)
+
+    @staticmethod
+    async def list_paper_ids_async(exam_ids: list[str]):
+        """(id, paper_id) of the given live exams."""
+        stmt = select(Exam.id, Exam.paper_id).where(Exam.id.in_(exam_ids), Exam.is_deleted.is_(None))
+        return await async_db_rows(stmt)
+
+    @staticmethod
+    async def set_status_async(exam_id: str, status: int, updated_by: str, from_status: int | None = None):
+        """Set only the status of an exam, optionally only while it is still in from_status."""
+        stmt = update(Exam).where(Exam.id == exam_id)
+        if from_status is not None:
+            stmt = stmt.where(Exam.status == from_status)
+        await async_db_exec(stmt.values(status=status, updated_at=datetime.now(), updated_by=updated_by))
+
     @staticmethod
     def get_unclosed_by_examinee_email(email: str):
         stmt = select(Exam).where(Exam.examinee_email==email, Exam.status!=EXAM_STATUS_CLOSED, Exam.is_deleted.is_(None))
@@ -55,34 +183,71 @@ class ExamDAO(BaseDAO):
             ).values(current_seq=seq, updated_at=now, updated_by=user_id)
         db_exec(statement)
 
+    @staticmethod
+    def export_statement(schedule_session_id: str):
+        """One row per live exam of a session with its examinee, for results export."""
+        return (select(Users.enroll_number, Users.surname, Users.name, Users.email, Exam.status,
+                       Exam.actual_start, Exam.actual_end, Exam.is_timeout, Exam.score, Exam.is_passed)
+                .join(Users, Users.id == Exam.examinee_id)
+                .where(Exam.schedule_session_id == schedule_session_id, Exam.is_deleted.is_(None))
+                .order_by(Users.enroll_number, Exam.id))
+
+    @staticmethod
+    async def list_activity_async(schedule_session_id: str):
+        """
+        (exam id, examinee, status, actual_start, actual_end, updated_at, section id, seq, name, status,
+        actual_start, actual_end, is_timeout, updated_at) of every live exam of a session and each of its
+        live sections; the section columns are None for an exam without sections.
+        """
+        stmt = (select(Exam.id, _examinee_name().label('examinee'), Exam.status,
+                       Exam.actual_start, Exam.actual_end, Exam.updated_at,
+                       ExamSection.id, ExamSection.seq, ExamSection.name, ExamSection.status, ExamSection.actual_start,
+                       ExamSection.actual_end, ExamSection.is_timeout, ExamSection.updated_at)
+                .join(Users, Users.id == Exam.examinee_id)
+                .outerjoin(ExamSection, and_(ExamSection.exam_id == Exam.id, ExamSection.is_deleted.is_(None)))
+                .where(Exam.schedule_session_id == schedule_session_id, Exam.is_deleted.is_(None)))
+        return await async_db_rows(stmt)
+
+    @staticmethod
+    def _proctor_view_statement(schedule_session_id: str):
+        # the latest section of each exam, numbered within the session's sections only
+        latest = (select(ExamSection.exam_id, ExamSection.name, ExamSection.status, ExamSection.actual_start,
+                         ExamSection.actual_end,
+                         func.row_number().over(partition_by=ExamSection.exam_id,
+                                                order_by=ExamSection.seq.desc()).label('rn'))
+                  .where(ExamSection.schedule_session_id == schedule_session_id)
+                  .subquery())
+        return (select(Exam.id.label('exam_id'), Exam.status, Exam.actual_start, Exam.actual_end,
+                       _examinee_name().label('examinee'),
+                       latest.c.name.label('section'), latest.c.status.label('section_status'),
+                       latest.c.actual_start.label('section_start'), latest.c.actual_end.label('section_end'))
+                .join(Users, Users.id == Exam.examinee_id)
+                .outerjoin(latest, and_(latest.c.exam_id == Exam.id, latest.c.rn == 1))
+                .where(Exam.schedule_session_id == schedule_session_id, Exam.is_deleted.is_(None)))
+
     @staticmethod
     def list_in_schedule_session_for_proctor(schedule_session_id: str):
-        stmt = """
-SELECT
-  Exam.status, Exam.actual_start, Exam.actual_end, CONCAT(Users.surname, ', ', Users.name) AS examinee,
-  es.name AS section, es.status as section_status, es.actual_start AS section_start, es.actual_end AS section_end
-FROM Exam
-LEFT JOIN (
-  SELECT es1.schedule_session_id, es1.name, exam_id, status, actual_start, actual_end FROM exam_section es1
-  JOIN (
-    SELECT schedule_session_id, examinee_id, MAX(seq) AS seq
-        FROM exam_section
-        GROUP BY schedule_session_id, examinee_id) es2
-    ON es1.schedule_session_id=es2.schedule_session_id AND es1.examinee_id=es2.examinee_id AND es1.seq=es2.seq) es
-  ON es.exam_id = exam.id
-JOIN Users ON Exam.examinee_id = Users.id
-where Exam.schedule_session_id=:schedule_session_id AND Exam.is_deleted IS NULL
-"""
-        result = db_session_query().execute(text(stmt).params(schedule_session_id=schedule_session_id)).all()
-        return result
+        """Status of every live exam of a session with its examinee and latest section, for the proctor view."""
+        return db_rows(ExamDAO._proctor_view_statement(schedule_session_id))
 
     @staticmethod
-    def submit(exam_id: str, updated_by: str, is_timeout: bool=False):
+    async def list_in_schedule_session_for_proctor_async(schedule_session_id: str):
+        return await async_db_rows(ExamDAO._proctor_view_statement(schedule_session_id))
+
+    @staticmethod
+    def _submit_statement(exam_id: str, updated_by: str, is_timeout: bool):
         now = datetime.now()
-        statement = update(Exam).where(Exam.id == exam_id).values(
+        return update(Exam).where(Exam.id == exam_id).values(
             status=EXAM_STATUS_CLOSED, actual_end=now, is_timeout=is_timeout,
             updated_at=now, updated_by=updated_by)
-        db_exec(statement)
+
+    @staticmethod
+    def submit(exam_id: str, updated_by: str, is_timeout: bool=False):
+        db_exec(ExamDAO._submit_statement(exam_id, updated_by, is_timeout))
+
+    @staticmethod
+    async def submit_async(exam_id: str, updated_by: str, is_timeout: bool=False):
+        await async_db_exec(ExamDAO._submit_statement(exam_id, updated_by, is_timeout))
 
     @staticmethod
     def update(exam: Exam):
@@ -5,8 +5,8 @@ from sqlalchemy.sql.functions import count
 
 from app.data.dao.base_dao import BaseDAO
 from app.data.dao.exam_dao import EXAM_STATUS_IN_EXAM, EXAM_STATUS_CLOSED
-from app.data.database import db_exec, db_scalars, db_one_or_none
-from app.data.entity.entities import ExamSection
+from app.data.database import db_exec, db_scalars, db_one_or_none, async_db_exec, async_db_one_or_none, async_db_rows
+from app.data.entity.entities import ExamSection, Exam, Users
 
 
 class ExamSectionDAO(BaseDAO):
@@ -28,24 +28,66 @@ class ExamSectionDAO(BaseDAO):
         statement = select(ExamSection).where(ExamSection.exam_id==exam_id).order_by(ExamSection.id.desc()).limit(1)
         return db_one_or_none(statement)
 
+    @staticmethod
+    async def get_last_section_async(exam_id: str) -> ExamSection | None:
+        statement = select(ExamSection).where(ExamSection.exam_id==exam_id).order_by(ExamSection.id.desc()).limit(1)
+        return await async_db_one_or_none(statement)
+
     @staticmethod
     def list_by_exam(exam_id: str) -> list[ExamSection]:
         statement = select(ExamSection).where(ExamSection.exam_id == exam_id).order_by(ExamSection.created_at)
         return db_scalars(statement)
 
     @staticmethod
-    def start(section_id: str, updated_by: str) -> datetime:
-        now = datetime.now()
-        statement = update(ExamSection).where(ExamSection.id == section_id).values(
+    async def list_for_grading_async(schedule_session_id: str):
+        """(id, exam_id, paper_section_id) of a session's live exam sections."""
+        stmt = (select(ExamSection.id, ExamSection.exam_id, ExamSection.paper_section_id)
+                .join(Exam, Exam.id == ExamSection.exam_id)
+                .where(ExamSection.schedule_session_id == schedule_session_id, ExamSection.is_deleted.is_(None),
+                       Exam.is_deleted.is_(None)))
+        return await async_db_rows(stmt)
+
+    @staticmethod
+    def export_statement(schedule_session_id: str):
+        """One row per live exam section of a session with its examinee, for results export."""
+        return (select(Users.enroll_number, Users.surname, Users.name, ExamSection.seq.label('section_seq'),
+                       ExamSection.name.label('section'), ExamSection.status, ExamSection.actual_start,
+                       ExamSection.actual_end, ExamSection.is_timeout, ExamSection.score, ExamSection.is_passed)
+                .join(Exam, Exam.id == ExamSection.exam_id)
+                .join(Users, Users.id == ExamSection.examinee_id)
+                .where(ExamSection.schedule_session_id == schedule_session_id, ExamSection.is_deleted.is_(None),
+                       Exam.is_deleted.is_(None))
+                .order_by(Users.enroll_number, ExamSection.exam_id, ExamSection.seq))
+
+    @staticmethod
+    def _start_statement(section_id: str, updated_by: str, now: datetime):
+        return update(ExamSection).where(ExamSection.id == section_id).values(
             actual_start=now, status=EXAM_STATUS_IN_EXAM,
             updated_at=now, updated_by=updated_by)
-        db_exec(statement)
+
+    @staticmethod
+    def start(section_id: str, updated_by: str) -> datetime:
+        now = datetime.now()
+        db_exec(ExamSectionDAO._start_statement(section_id, updated_by, now))
         return now
 
     @staticmethod
-    def submit(section_id: str, updated_by: str, is_timeout: bool=False):
+    async def start_async(section_id: str, updated_by: str) -> datetime:
+        now = datetime.now()
+        await async_db_exec(ExamSectionDAO._start_statement(section_id, updated_by, now))
+        return now
+
+    @staticmethod
+    def _submit_statement(section_id: str, updated_by: str, is_timeout: bool):
         now = datetime.now()
-        statement = update(ExamSection).where(ExamSection.id == section_id).values(
+        return update(ExamSection).where(ExamSection.id == section_id).values(
             actual_end=now, status=EXAM_STATUS_CLOSED, is_timeout=is_timeout,
             updated_at=now, updated_by=updated_by)
-        db_exec(statement)
\ No newline at end of file
+
+    @staticmethod
+    def submit(section_id: str, updated_by: str, is_timeout: bool=False):
+        db_exec(ExamSectionDAO._submit_statement(section_id, updated_by, is_timeout))
+
+    @staticmethod
+    async def submit_async(section_id: str, updated_by: str, is_timeout: bool=False):
+        await async_db_exec(ExamSectionDAO._submit_statement(section_id, updated_by, is_timeout))
\ No newline at end of file
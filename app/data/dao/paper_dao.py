@@ -1,9 +1,9 @@
 from datetime import datetime
 
-from sqlalchemy import update
+from sqlalchemy import update, select
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec
+from app.data.database import db_exec, async_db_one_or_none
 from app.data.entity.entities import Paper
 
 QUESTION_TYPE_SINGLE_CHOICE: int = 1
@@ -15,6 +15,12 @@ QUESTION_TYPE_WRITING: int = 6
 QUESTION_TYPE_LISTENING: int = 7
 QUESTION_TYPE_SPEAKING: int = 8
 
+# Paper.scoring_policy / PaperSection.scoring_policy of objective questions; a section's policy overrides its paper's
+SCORING_POLICY_ALL_OR_NOTHING: int = 1
+SCORING_POLICY_PROPORTIONAL: int = 2
+SCORING_POLICY_NEGATIVE_MARKING: int = 3
+SCORING_POLICY_ORDER_SENSITIVE: int = 4
+
 
 class PaperDAO(BaseDAO):
     def __init__(self):
@@ -29,6 +35,11 @@ class PaperDAO(BaseDAO):
             self.update(paper)
             return instance_existing.id
 
+    @staticmethod
+    async def get_version_async(paper_id: str):
+        """updated_at of a paper, which every write to its content bumps; None when never updated or missing."""
+        return await async_db_one_or_none(select(Paper.updated_at).where(Paper.id == paper_id))
+
     @staticmethod
     def update(paper: Paper):
         statement = update(Paper).where(Paper.id == paper.id).values(
@@ -36,5 +47,6 @@ class PaperDAO(BaseDAO):
             paper_type=paper.paper_type,
             question_type=paper.question_type, unit_score=paper.unit_score, full_score=paper.full_score,
             pass_score=paper.pass_score, question_num=paper.question_num, section_num=paper.section_num,
+            scoring_policy=paper.scoring_policy,
             is_deleted=paper.is_deleted, updated_at=datetime.now(), updated_by=paper.updated_by)
         db_exec(statement)
\ No newline at end of file
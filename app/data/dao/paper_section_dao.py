@@ -4,7 +4,7 @@ from sqlalchemy import update, and_, select
 from ulid import ULID
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_session_query, db_one_or_none, db_scalars
+from app.data.database import db_exec, db_session_query, db_one_or_none, db_scalars, async_db_scalars
 from app.data.entity.entities import PaperSection
 
 
@@ -38,6 +38,13 @@ class PaperSectionDAO(BaseDAO):
                 .order_by(PaperSection.seq))
         return db_scalars(stmt)
 
+    @staticmethod
+    async def list_by_paper_async(paper_id: str):
+        stmt = (select(PaperSection)
+                .where(PaperSection.paper_id==paper_id, PaperSection.is_deleted.is_(None))
+                .order_by(PaperSection.seq))
+        return await async_db_scalars(stmt)
+
     @staticmethod
     def update(section: PaperSection):
         statement = update(PaperSection).where(and_(PaperSection.paper_id == section.paper_id,
@@ -45,5 +52,6 @@ class PaperSectionDAO(BaseDAO):
             seq=section.seq, name=section.name, content=section.content, note=section.note, question_type=section.question_type,
             duration=section.duration, full_score=section.full_score,
             pass_score=section.pass_score, unit_score=section.unit_score, question_num=section.question_num,
+            scoring_policy=section.scoring_policy,
             is_deleted=section.is_deleted, updated_at=datetime.now(), updated_by=section.updated_by)
         db_exec(statement)
\ No newline at end of file
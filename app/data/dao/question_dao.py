@@ -3,7 +3,8 @@ from datetime import datetime
 from sqlalchemy import update, select
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_session_query, db_one_or_none, db_scalars
+from app.data.database import db_exec, db_session_query, db_one_or_none, db_scalars, async_db_scalars, \
+    async_db_exec
 from app.data.entity.entities import Question
 
 
@@ -28,13 +29,25 @@ class QuestionDAO(BaseDAO):
                                       Question.seq == seq)
         return db_one_or_none(stmt)
 
-
-
     @staticmethod
     def list_by_section(section_id: str):
         stmt = select(Question).where(Question.section_id == section_id).order_by(Question.seq)
         return db_scalars(stmt)
 
+    @staticmethod
+    def list_by_paper(paper_id: str):
+        stmt = (select(Question)
+                .where(Question.paper_id == paper_id, Question.is_deleted.is_(None))
+                .order_by(Question.section_id, Question.seq))
+        return db_scalars(stmt)
+
+    @staticmethod
+    async def list_by_paper_async(paper_id: str):
+        stmt = (select(Question)
+                .where(Question.paper_id == paper_id, Question.is_deleted.is_(None))
+                .order_by(Question.section_id, Question.seq))
+        return await async_db_scalars(stmt)
+
     @staticmethod
     def update(question: Question):
         statement = update(Question).where(Question.id == question.id).values(
@@ -43,3 +56,22 @@ class QuestionDAO(BaseDAO):
             section_id=question.section_id, paper_id=question.paper_id,
             is_deleted=question.is_deleted, updated_at=datetime.now(), updated_by=question.updated_by)
         db_exec(statement)
+
+    @staticmethod
+    def mark_rekeyed(question_ids: list[str], rekeyed_at: datetime):
+        db_exec(update(Question).where(Question.id.in_(question_ids)).values(rekeyed_at=rekeyed_at))
+
+    @staticmethod
+    async def list_rekeyed_async(paper_id: str) -> list[str]:
+        """Ids of the questions of a paper, deleted ones included, re-keyed since they were last regraded."""
+        stmt = (select(Question.id)
+                .where(Question.paper_id == paper_id, Question.rekeyed_at.isnot(None))
+                .order_by(Question.id))
+        return await async_db_scalars(stmt)
+
+    @staticmethod
+    async def clear_rekeyed_async(question_ids: list[str], regraded_at: datetime):
+        """Clear the re-key flags a regrade has dealt with; keys changed after regraded_at stay flagged."""
+        await async_db_exec(update(Question)
+                            .where(Question.id.in_(question_ids), Question.rekeyed_at <= regraded_at)
+                            .values(rekeyed_at=None))
@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy import select, update
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_session_query, db_exec, db_one_or_none, db_scalars
+from app.data.database import db_session_query, db_exec, db_one_or_none, db_scalars, async_db_scalars
 from app.data.entity.entities import QuestionOption
 
 
@@ -46,10 +46,26 @@ class QuestionOptionDAO(BaseDAO):
             option.is_correct = None
         return options
 
+    @staticmethod
+    def list_by_paper(paper_id: str) -> list[QuestionOption]:
+        """All live options of a paper, including the answer key; callers must sanitize before exposing."""
+        stmt = (select(QuestionOption)
+                .where(QuestionOption.paper_id == paper_id, QuestionOption.is_deleted.is_(None))
+                .order_by(QuestionOption.question_id, QuestionOption.code))
+        return db_scalars(stmt)
+
+    @staticmethod
+    async def list_by_paper_async(paper_id: str) -> list[QuestionOption]:
+        """All live options of a paper, including the answer key; callers must sanitize before exposing."""
+        stmt = (select(QuestionOption)
+                .where(QuestionOption.paper_id == paper_id, QuestionOption.is_deleted.is_(None))
+                .order_by(QuestionOption.question_id, QuestionOption.code))
+        return await async_db_scalars(stmt)
+
     @staticmethod
     def update(option: QuestionOption):
         statement = update(QuestionOption).where(QuestionOption.id == option.id).values(
-            code=option.code, content=option.content, is_correct=option.is_correct,
+            code=option.code, content=option.content, is_correct=option.is_correct, correct_seq=option.correct_seq,
             question_id=option.question_id, paper_id=option.paper_id,
             is_deleted=option.is_deleted, updated_at=datetime.now(), updated_by=option.updated_by)
         db_exec(statement)
\ No newline at end of file
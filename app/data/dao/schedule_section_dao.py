@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy import update, select
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_one_or_none
+from app.data.database import db_exec, db_one_or_none, async_db_scalars, db_scalars
 from app.data.entity.entities import ScheduleSection
 
 
@@ -25,6 +25,21 @@ class ScheduleSectionDAO(BaseDAO):
         stmt = select(ScheduleSection).where(ScheduleSection.schedule_session_id==schedule_session_id, ScheduleSection.seq==seq)
         return db_one_or_none(stmt)
 
+    @staticmethod
+    async def list_by_session_async(schedule_session_id: str) -> list[ScheduleSection]:
+        stmt = (select(ScheduleSection)
+                .where(ScheduleSection.schedule_session_id == schedule_session_id, ScheduleSection.is_deleted.is_(None))
+                .order_by(ScheduleSection.seq))
+        return await async_db_scalars(stmt)
+
+    @staticmethod
+    def list_by_sessions(schedule_session_ids: list[str]) -> list[ScheduleSection]:
+        stmt = (select(ScheduleSection)
+                .where(ScheduleSection.schedule_session_id.in_(schedule_session_ids),
+                       ScheduleSection.is_deleted.is_(None))
+                .order_by(ScheduleSection.schedule_session_id, ScheduleSection.seq))
+        return db_scalars(stmt)
+
     @staticmethod
     def update(instance: ScheduleSection):
         statement = update(ScheduleSection).where(ScheduleSection.id == instance.id).values(
@@ -3,7 +3,7 @@ from datetime import datetime
 from sqlalchemy import update, select, desc
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_scalars, db_session_query
+from app.data.database import db_exec, db_scalars, db_session_query, async_db_scalars
 from app.data.entity.entities import ScheduleSession, Schedule
 
 
@@ -27,6 +27,20 @@ class ScheduleSessionDAO(BaseDAO):
             desc(ScheduleSession.plan_start))
         return db_scalars(statement)
 
+    @staticmethod
+    def list_by_schedule(schedule_id: str) -> list[ScheduleSession]:
+        statement = select(ScheduleSession).where(ScheduleSession.schedule_id == schedule_id,
+            ScheduleSession.is_deleted.is_(None)).order_by(ScheduleSession.plan_start)
+        return db_scalars(statement)
+
+    @staticmethod
+    async def list_live_ids_async(now: datetime):
+        """Ids of the ready sessions whose planned time spans now."""
+        statement = select(ScheduleSession.id).where(
+            ScheduleSession.is_ready.is_(True), ScheduleSession.is_deleted.is_(None),
+            ScheduleSession.plan_start <= now, ScheduleSession.plan_end >= now)
+        return await async_db_scalars(statement)
+
     @staticmethod
     def update(schedule_session: ScheduleSession):
         statement = update(ScheduleSession).where(ScheduleSession.id == schedule_session.id).values(
@@ -1,9 +1,10 @@
 from datetime import datetime
 
-from sqlalchemy import update, select
+from sqlalchemy import update, select, or_
+from ulid import ULID
 
 from app.data.dao.base_dao import BaseDAO
-from app.data.database import db_exec, db_one_or_none
+from app.data.database import db_exec, db_one_or_none, async_db_one_or_none, db_scalars, db_rows, dialect_insert
 from app.data.entity.entities import Users
 
 class UserDAO(BaseDAO):
@@ -24,11 +25,48 @@ class UserDAO(BaseDAO):
         stmt = select(Users).where(Users.email == email)
         return db_one_or_none(stmt)
 
+    @staticmethod
+    async def get_by_email_async(email: str) -> Users | None:
+        stmt = select(Users).where(Users.email == email)
+        return await async_db_one_or_none(stmt)
+
+    @staticmethod
+    def list_by_emails(emails: list[str]) -> list[Users]:
+        """Users of many emails in one query on the unique email index."""
+        stmt = select(Users).where(Users.email.in_(emails))
+        return db_scalars(stmt)
+
+    @staticmethod
+    def list_email_enroll_numbers(emails: list[str], enroll_numbers: list[str]) -> list[tuple[str, str]]:
+        """(email, enroll_number) of the users holding any of the given emails or enroll numbers, in one query."""
+        stmt = select(Users.email, Users.enroll_number).where(
+            or_(Users.email.in_(emails), Users.enroll_number.in_(enroll_numbers)))
+        return [tuple(row) for row in db_rows(stmt)]
+
+    @staticmethod
+    def upsert_by_email(rows: list[dict], fields: tuple[str, ...]):
+        """
+        Insert users, or update the given fields of the users already holding their emails, in a single
+        multi-row INSERT ... ON CONFLICT (email) DO UPDATE. Emails must be unique within the rows.
+        """
+        now = datetime.now()
+        values = [{'id': str(ULID()), 'created_at': now, 'updated_at': now, **row} for row in rows]
+        stmt = dialect_insert(Users).values(values)
+        db_exec(stmt.on_conflict_do_update(
+            index_elements=[Users.email],
+            set_={field: stmt.excluded[field] for field in fields + ('updated_at',)},
+        ))
+
     @staticmethod
     def get_by_enroll_number(enroll_number: str) -> Users | None:
         stmt = select(Users).where(Users.enroll_number == enroll_number)
         return db_one_or_none(stmt)
 
+    @staticmethod
+    async def get_by_enroll_number_async(enroll_number: str) -> Users | None:
+        stmt = select(Users).where(Users.enroll_number == enroll_number)
+        return await async_db_one_or_none(stmt)
+
     @staticmethod
     def update_by_email(user: Users):
         statement = update(Users).where(Users.email == user.email).values(
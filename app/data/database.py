@@ -1,10 +1,13 @@
 import logging
 import os
 from collections.abc import Iterable
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
-from sqlalchemy import create_engine, Executable
+from sqlalchemy import create_engine, Executable, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import IntegrityError, OperationalError, DatabaseError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import Session
 # print(os.environ)
 db_url = os.environ["SQLALCHEMY_DATABASE_URL"]
@@ -19,6 +22,35 @@ engine = create_engine(
 )
 # Base.metadata.create_all(engine)   # create tables
 
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+def to_async_db_url(url: str) -> str:
+    """Map a sync database URL onto the async driver of the same backend."""
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise Exception(f"No async driver configured for database backend '{backend}'")
+    return url_obj.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+async_db_url = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL") or to_async_db_url(db_url)
+async_engine = create_async_engine(
+    async_db_url,
+    echo=os.environ["SQLALCHEMY_ECHO"]=='True',
+    pool_size=20,
+    max_overflow=50,
+    pool_timeout=20
+)
+async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+def dialect_insert(entity):
+    """INSERT construct of the configured backend, which exposes on_conflict_do_update() for upserts."""
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(entity)
+    return sqlite.insert(entity)
+
 def db_session_query() -> Session:
     return Session(engine)
 
@@ -61,6 +93,21 @@ def db_exec(statement: Executable):
     except DatabaseError:
         raise
 
+def db_exec_all(*statements: Executable | tuple[Executable, list[dict]]):
+    """
+    Execute several statements in one transaction: all of them take effect or none.
+    A (statement, rows) pair is executed once for many parameter sets (executemany).
+    """
+    try:
+        with db_session_commit() as session:
+            for statement in statements:
+                if isinstance(statement, tuple):
+                    session.execute(*statement)
+                else:
+                    session.execute(statement)
+    except DatabaseError:
+        raise
+
 def db_scalars(statement: Executable):
     res = None
     try:
@@ -77,4 +124,98 @@ def db_one_or_none(statement: Executable):
             res = session.scalars(statement).one_or_none()
     except DatabaseError:
         raise
-    return res
\ No newline at end of file
+    return res
+
+def db_rows(statement: Executable):
+    """All rows of a multi-entity/column select."""
+    res = None
+    try:
+        with Session(engine) as session:
+            res = session.execute(statement).all()
+    except DatabaseError:
+        raise
+    return res
+
+
+# Async helpers, mirroring the sync helpers above, for handlers running on the event loop
+
+def async_db_session_query() -> AsyncSession:
+    return async_session_factory()
+
+@asynccontextmanager
+async def async_db_session_commit():
+    try:
+        async with async_session_factory() as session:
+            yield session
+            await session.commit()
+    except IntegrityError as e:
+        logging.error(f"Data Integrity Error: {str(e)}")
+        raise
+    except OperationalError as e:
+        logging.error(f"Database Connection Error: {str(e)}")
+        raise
+    except SQLAlchemyError as e:
+        logging.exception(f"Unknown SQLAlchemy Error: {str(e)}")
+        raise
+
+async def async_db_add(instance: object):
+    async with async_db_session_commit() as session:
+        session.add(instance)
+
+async def async_db_add_all(instances: Iterable[object]):
+    async with async_db_session_commit() as session:
+        session.add_all(instances)
+
+async def async_db_exec(statement: Executable):
+    async with async_db_session_commit() as session:
+        await session.execute(statement)
+
+async def async_db_exec_many(statement: Executable, rows: list[dict]):
+    """Execute one statement for many parameter sets (executemany) in one transaction."""
+    if not rows:
+        return
+    async with async_db_session_commit() as session:
+        await session.execute(statement, rows)
+
+async def async_db_bulk_update(*updates: tuple[type, list[dict]]):
+    """ORM bulk UPDATE by primary key (executemany) of one or more entities, all in one transaction."""
+    async with async_db_session_commit() as session:
+        for cls, rows in updates:
+            if rows:
+                await session.execute(update(cls), rows)
+
+async def async_db_get(cls: type, instance_id: str | int):
+    async with async_session_factory() as session:
+        return await session.get(cls, instance_id)
+
+async def async_db_scalars(statement: Executable):
+    async with async_session_factory() as session:
+        res = await session.scalars(statement)
+        return res.all()
+
+async def async_db_one_or_none(statement: Executable):
+    async with async_session_factory() as session:
+        res = await session.scalars(statement)
+        return res.one_or_none()
+
+async def async_db_rows(statement: Executable):
+    async with async_session_factory() as session:
+        res = await session.execute(statement)
+        return res.all()
+
+async def async_db_stream(statement: Executable, yield_per: int = 1000):
+    """
+    Rows of a select fetched through a server-side cursor, yield_per rows at a time, so that memory
+    does not grow with the result size. The connection is held until the iteration ends.
+    """
+    async with async_session_factory() as session:
+        result = await session.stream(statement, execution_options={'yield_per': yield_per})
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+
+async def async_db_row_or_none(statement: Executable):
+    """Single row of a multi-entity/column select, e.g. a join returning (Exam, ExamSection)."""
+    async with async_session_factory() as session:
+        res = await session.execute(statement)
+        return res.one_or_none()
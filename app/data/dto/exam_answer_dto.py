@@ -0,0 +1,26 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ExamAnswerDelta(BaseModel):
+    """One changed answer; only the fields sent by the client are written."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    question_id: str
+    question_seq: Optional[int] = Field(default=None)
+    # accepted from older clients only, answers are keyed by (exam_id, question_id)
+    exam_answer_id: Optional[str] = Field(default=None)
+    answer: Optional[str] = Field(default=None)
+    marked: Optional[bool] = Field(default=None)
+
+
+class ExamAnswerBatchPayload(BaseModel):
+    """Answer deltas of one exam section, saved together."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    exam_id: str
+    exam_section_id: str
+    answers: List[ExamAnswerDelta] = Field(default_factory=list)
@@ -1,6 +1,6 @@
 import re
 from decimal import Decimal
-from typing import List
+from typing import List, TextIO
 
 from markdown_it import MarkdownIt
 
@@ -32,9 +32,17 @@ class PaperDTO:
         self.pass_score:Decimal = Decimal('0')
         self.sections:List[PaperSectionDTO] = []
         self.questions:List[QuestionDTO] = []
+        # raw markdown of the note and of each section's and question's content, rendered once parsing ends
+        self._fragments: dict[tuple[int, str], tuple[object, str, list[str]]] = {}
 
-    def _append_paragraph(self, src: str | None, content: str) -> str:
-        return (src or '') + self.md.render(content)
+    def _append_fragment(self, node: object, attribute: str, text: str):
+        self._fragments.setdefault((id(node), attribute), (node, attribute, []))[2].append(text)
+
+    def _render_fragments(self):
+        """Render each node's markdown in one pass; blank lines keep the fragments separate blocks."""
+        for node, attribute, fragments in self._fragments.values():
+            setattr(node, attribute, (getattr(node, attribute) or '') + self.md.render('\n\n'.join(fragments)))
+        self._fragments.clear()
 
     @staticmethod
     def _append_content(paper_dto: "PaperDTO", idx: int, content: str):
@@ -49,11 +57,11 @@ class PaperDTO:
 
     def md_parse(self, filename: str) -> "PaperDTO":
         with open(filename, 'r', encoding='utf-8') as f:
-            md_content = f.read()
-        tokens = self.md.parse(md_content)
-        return self._parse_tokens(tokens)
+            return self.md_parse_content(f)
 
-    def md_parse_content(self, md_content: str) -> "PaperDTO":
+    def md_parse_content(self, md_content: str | TextIO) -> "PaperDTO":
+        if not isinstance(md_content, str):
+            md_content = md_content.read()
         tokens = self.md.parse(md_content)
         return self._parse_tokens(tokens)
 
@@ -109,6 +117,7 @@ class PaperDTO:
                     last_question = paper_dto.sections[-1].questions[-1]
                     if last_question.question_options:
                         last_question.question_options[-1].md_parse_meta(token.content)
+        paper_dto._render_fragments()
         return paper_dto
 
     def md_parse_meta(self, text: str):
@@ -159,16 +168,13 @@ class PaperDTO:
             question_dto.seq = 0
 
     def md_parse_append_paper_note(self, text: str):
-        self.note = self.md.render(self._append_paragraph(self.note, text))
+        self._append_fragment(self, 'note', text)
 
     def md_parse_append_section_content(self, text: str):
-        section_dto = self.sections[-1]
-        section_dto.content = (section_dto.content or '') + self.md.render(text)
+        self._append_fragment(self.sections[-1], 'content', text)
 
     def md_parse_append_question_content(self, text: str):
-        section_dto = self.sections[-1]
-        question_dto = section_dto.questions[-1]
-        question_dto.content = self.md.render(self._append_paragraph(question_dto.content, text))
+        self._append_fragment(self.sections[-1].questions[-1], 'content', text)
 
     def md_parse_append_question_option(self, text: str):
         text = text.strip()
@@ -56,6 +56,7 @@ class Exam(Base):
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -63,6 +64,7 @@ class ExamAnswer(Base):
     __tablename__ = 'exam_answer'
     __table_args__ = (
         PrimaryKeyConstraint('id', name='exam_answer_pkey'),
+        Index('idx_exam_answer_exam_question', 'exam_id', 'question_id', unique=True),
         {'comment': 'Exam Answer'}
     )
 
@@ -132,11 +134,13 @@ class Paper(Base):
     unit_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Unit/Question Score')
     full_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Full Score')
     pass_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Pass Score')
+    scoring_policy: Mapped[Optional[int]] = mapped_column(SmallInteger, comment='Scoring Policy of objective questions;1.all-or-nothing; 2.proportional; 3.negative marking; 4.order-sensitive')
     duration: Mapped[Optional[int]] = mapped_column(SmallInteger, comment='Duration in Minutes')
     created_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Creator ID')
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -158,12 +162,14 @@ class PaperSection(Base):
     unit_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Unit/Question Score')
     full_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Full Score')
     pass_score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Pass Score')
+    scoring_policy: Mapped[Optional[int]] = mapped_column(SmallInteger, comment='Scoring Policy of objective questions;1.all-or-nothing; 2.proportional; 3.negative marking; 4.order-sensitive')
     note: Mapped[Optional[str]] = mapped_column(Text, comment='Note')
     paper_id: Mapped[Optional[str]] = mapped_column(String(26), comment='Paper ID')
     created_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Creator ID')
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -182,10 +188,12 @@ class Question(Base):
     score: Mapped[Optional[decimal.Decimal]] = mapped_column(Numeric(6, 2), comment='Score')
     section_id: Mapped[Optional[str]] = mapped_column(String(26), comment='Section ID')
     paper_id: Mapped[Optional[str]] = mapped_column(String(26), comment='Paper ID')
+    rekeyed_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Answer Key Changed Datetime, cleared by regrade')
     created_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Creator ID')
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -207,6 +215,7 @@ class QuestionOption(Base):
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -224,6 +233,7 @@ class Schedule(Base):
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
@@ -244,6 +254,7 @@ class ScheduleSection(Base):
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[str]] = mapped_column(String, comment='Is Deleted')
 
 
@@ -270,6 +281,7 @@ class ScheduleSession(Base):
     created_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Create Datetime')
     updated_by: Mapped[Optional[str]] = mapped_column(String(26), comment='Updator ID')
     updated_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, comment='Update Datetime')
+    deleted_batch: Mapped[Optional[str]] = mapped_column(String(26), comment='ID of the cascade that soft-deleted the row')
     is_deleted: Mapped[Optional[bool]] = mapped_column(Boolean, comment='Is Deleted')
 
 
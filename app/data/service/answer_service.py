@@ -0,0 +1,105 @@
+"""Answer service: group-committed writes of examinee answer deltas."""
+
+import asyncio
+import logging
+import os
+from functools import partial
+
+from app.data.dao.exam_answer_dao import ExamAnswerDAO, ANSWER_DELTA_FIELDS
+from app.data.dao.exam_dao import EXAM_STATUS_CLOSED
+from app.data.entity.entities import ExamAnswer
+from app.data.service.exam_state_service import ExamStateError, ExamStateResolver
+from app.data.service.grading_service import get_answer_keys_by_exam, score_saved_answers
+from app.util.util_batch import GroupCommitter
+
+
+class AnswerCommitBuffer:
+    """
+    Coalesces answer deltas arriving from many examinees within a short window into one transaction.
+
+    Callers await submit() and get back the persisted rows of their own deltas. Deltas are group
+    committed (see GroupCommitter), so per-answer write order is preserved. Objective answers are scored
+    as they are written and the exam section and exam totals are kept up to date in the same transaction.
+    """
+
+    def __init__(self, window_ms: float = 5, max_batch: int = 1000):
+        self._committer: GroupCommitter[tuple[dict, asyncio.Future]] = GroupCommitter(
+            self._flush, window_ms=window_ms, max_batch=max_batch)
+
+    async def submit(self, deltas: list[dict]) -> list[ExamAnswer]:
+        """Queue deltas for the next group commit and wait until they are durable."""
+        if not deltas:
+            return []
+        loop = asyncio.get_running_loop()
+        pending = [(delta, loop.create_future()) for delta in deltas]
+        self._committer.put(*pending)
+        answers = await asyncio.gather(*(future for _, future in pending))
+        # a batch may repeat a question, the coalesced row is returned once
+        unique = {answer.id: answer for answer in answers}
+        return list(unique.values())
+
+    @staticmethod
+    async def _scorer(batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            keys_by_exam = await get_answer_keys_by_exam(list({delta['exam_id'] for delta, _ in batch}))
+        except Exception as e:
+            # saving must not depend on grading, a batch grade run catches these answers up
+            logging.error(f"Answer key lookup failed, saving without scores: {str(e)}")
+            return None
+        return partial(score_saved_answers, keys_by_exam) if keys_by_exam else None
+
+    @staticmethod
+    async def _flush(batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            answers = await ExamAnswerDAO.upsert_batch_async([delta for delta, _ in batch],
+                                                             scorer=await AnswerCommitBuffer._scorer(batch))
+        except Exception as e:
+            logging.error(f"Answer group commit of {len(batch)} deltas failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_key = {(answer.exam_id, answer.question_id): answer for answer in answers}
+        for delta, future in batch:
+            if not future.done():
+                future.set_result(by_key.get((delta['exam_id'], delta['question_id'])))
+
+    async def close(self):
+        """Flush whatever is still queued and stop the flusher; used on application shutdown."""
+        await self._committer.close()
+
+
+answer_commit_buffer = AnswerCommitBuffer(
+    window_ms=float(os.getenv("ANSWER_COMMIT_WINDOW_MS", "5")),
+    max_batch=int(os.getenv("ANSWER_COMMIT_MAX_BATCH", "1000")),
+)
+
+
+class AnswerService:
+    """Service class for examinee answer writes."""
+
+    @staticmethod
+    async def save_answers(examinee_id: str, exam_id: str, exam_section_id: str,
+                           deltas: list[dict]) -> list[ExamAnswer]:
+        """
+        Save answer deltas of one exam section through the group-commit buffer.
+        Each delta has question_id and optionally question_seq, answer and marked.
+        Raises ExamStateError unless the section is the examinee's own, of that exam, and still open.
+        """
+        exam_section = await ExamStateResolver(examinee_id).own_exam_section(exam_id, exam_section_id)
+        if exam_section.status == EXAM_STATUS_CLOSED:
+            raise ExamStateError("Exam section is over!")
+        rows = []
+        for delta in deltas:
+            row = {
+                'exam_id': exam_id,
+                'exam_section_id': exam_section_id,
+                'examinee_id': examinee_id,
+                'question_id': delta['question_id'],
+                'seq': delta.get('question_seq'),
+            }
+            for field in ANSWER_DELTA_FIELDS:
+                if field in delta:
+                    row[field] = delta[field]
+            rows.append(row)
+        return await answer_commit_buffer.submit(rows)
@@ -0,0 +1,79 @@
+"""Behavior service: buffered ingestion of examinee behavior events."""
+
+import logging
+import os
+from datetime import datetime
+
+from app.data.dao.behavior_dao import BehaviorDAO
+from app.util.util_batch import GroupCommitter
+
+QUEUE_POLICY_DROP: str = "drop"
+QUEUE_POLICY_BLOCK: str = "block"
+
+
+class BehaviorRecorder:
+    """
+    Bounded in-process queue of behavior events, batch-inserted by a group committer (see GroupCommitter).
+
+    When the queue is full, events are either dropped and counted (policy "drop"), or the caller waits
+    until the flusher has made room (policy "block"). Events are timestamped when recorded, not when
+    flushed. close() flushes what is still queued.
+    """
+
+    def __init__(self, max_queue: int = 100000, flush_ms: float = 200, max_batch: int = 5000,
+                 policy: str = QUEUE_POLICY_DROP):
+        if policy not in (QUEUE_POLICY_DROP, QUEUE_POLICY_BLOCK):
+            raise ValueError(f"Unknown behavior queue policy: {policy}")
+        self._max_queue = max_queue
+        self._policy = policy
+        self._committer: GroupCommitter[dict] = GroupCommitter(self._flush, window_ms=flush_ms, max_batch=max_batch)
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+
+    async def record(self, user_id: str, behavior_type: str, ip: str | None) -> bool:
+        """Queue one event; returns False when it was dropped because the queue is full."""
+        while len(self._committer) >= self._max_queue:
+            if self._policy == QUEUE_POLICY_DROP:
+                self.dropped += 1
+                return False
+            await self._committer.wait_flushed()
+        self._committer.put({
+            'user_id': user_id,
+            'behavior_type': behavior_type,
+            'ip': ip,
+            'created_at': datetime.now(),
+        })
+        self.recorded += 1
+        return True
+
+    async def _flush(self, batch: list[dict]):
+        try:
+            self.flushed += await BehaviorDAO.add_batch_async(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logging.error(f"Behavior flush of {len(batch)} events failed: {str(e)}")
+
+    async def close(self):
+        """Flush whatever is still queued and stop the flusher; used on application shutdown."""
+        await self._committer.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._committer),
+            "max_queue": self._max_queue,
+            "policy": self._policy,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "failed": self.failed,
+        }
+
+
+behavior_recorder = BehaviorRecorder(
+    max_queue=int(os.getenv("BEHAVIOR_QUEUE_SIZE", "100000")),
+    flush_ms=float(os.getenv("BEHAVIOR_FLUSH_MS", "200")),
+    max_batch=int(os.getenv("BEHAVIOR_BATCH_SIZE", "5000")),
+    policy=os.getenv("BEHAVIOR_QUEUE_POLICY", QUEUE_POLICY_DROP),
+)
@@ -0,0 +1,179 @@
+"""Exam event service: pushed timers and state changes for examinee clients (Server-Sent Events)."""
+
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_CLOSED, EXAM_STATUS_IN_EXAM, EXAM_STATUS_NOT_STARTED
+from app.data.dao.schedule_section_dao import ScheduleSectionDAO
+from app.data.entity.entities import Exam, ExamSection
+from app.data.service.paper_cache import paper_cache
+from app.util.util import entity_to_dict
+from app.util.util_cache import TTLCache
+from app.util.util_event import event_hub, format_sse, Event
+
+EVENT_SECTION_START: str = "section_start"
+EVENT_SECTION_CLOSE: str = "section_close"
+EVENT_EXAM_CLOSE: str = "exam_close"
+EVENT_ANNOUNCEMENT: str = "announcement"
+EVENT_TICK: str = "tick"
+EVENT_STATE: str = "state"
+
+TICK_SECONDS: float = float(os.getenv("EXAM_EVENT_TICK_SECONDS", "5"))
+
+# schedule_session_id -> {seq: schedule section dict}; section and session writes invalidate a session
+schedule_section_cache = TTLCache(max_size=256, ttl=float(os.getenv("SCHEDULE_SECTION_CACHE_TTL", "60")))
+
+
+def invalidate_schedule_sections(schedule_session_id: str):
+    schedule_section_cache.pop(schedule_session_id)
+
+
+def exam_channel(exam_id: str) -> str:
+    return f"exam:{exam_id}"
+
+
+def session_channel(schedule_session_id: str) -> str:
+    return f"session:{schedule_session_id}"
+
+
+def publish_exam_event(exam_id: str, name: str, data: dict | None = None) -> int:
+    return event_hub.publish(exam_channel(exam_id), name, data or {})
+
+
+def publish_session_event(schedule_session_id: str, name: str, data: dict | None = None) -> int:
+    return event_hub.publish(session_channel(schedule_session_id), name, data or {})
+
+
+async def get_schedule_sections(schedule_session_id: str) -> dict[int, dict]:
+    sections = schedule_section_cache.get(schedule_session_id)
+    if sections is None:
+        sections = {section.seq: entity_to_dict(section)
+                    for section in await ScheduleSectionDAO.list_by_session_async(schedule_session_id)}
+        schedule_section_cache.put(schedule_session_id, sections)
+    return sections
+
+
+def _seconds(delta: timedelta) -> float:
+    return round(delta.total_seconds(), 3)
+
+
+class ExamTimer:
+    """
+    Timer and section state of one exam as seen by one event stream.
+
+    Built from one query plus the cached paper and schedule section timings, then kept current by the
+    events published on the exam and session channels; ticks are computed in memory. The hub is per
+    process, so transitions made through another worker reach the client with its next reconnect.
+    """
+
+    def __init__(self, exam: Exam, last_section: ExamSection | None, paper_sections: list[dict],
+                 schedule_sections: dict[int, dict]):
+        self.exam_id = exam.id
+        self.schedule_session_id = exam.schedule_session_id
+        self.exam_status = exam.status
+        self._durations = {section['seq']: section['duration'] for section in paper_sections}
+        self._schedule_sections = schedule_sections
+        self.section_id = None
+        self.section_seq = 1
+        self.section_status = EXAM_STATUS_NOT_STARTED
+        self.actual_start = None
+        if last_section is not None:
+            self.section_id = last_section.id
+            self.section_seq = last_section.seq
+            self.section_status = last_section.status
+            self.actual_start = last_section.actual_start
+            if last_section.status == EXAM_STATUS_CLOSED:
+                self._advance()
+
+    @staticmethod
+    async def open(examinee_id: str, exam_id: str) -> "ExamTimer | None":
+        """Timer of an examinee's own exam, or None when there is no such exam or paper."""
+        row = await ExamDAO.get_with_last_section_async(exam_id)
+        exam: Exam = row[0] if row else None
+        if exam is None or exam.is_deleted or exam.examinee_id != examinee_id:
+            return None
+        compiled_paper = await paper_cache.get(exam.paper_id)
+        if compiled_paper is None:
+            return None
+        schedule_sections = await get_schedule_sections(exam.schedule_session_id)
+        return ExamTimer(exam, row[1], compiled_paper.sections, schedule_sections)
+
+    @property
+    def closed(self) -> bool:
+        return self.exam_status == EXAM_STATUS_CLOSED
+
+    def _advance(self):
+        # after a section closes, the next one is pending; past the last one only /exam can close the exam
+        if self.section_seq < len(self._durations):
+            self.section_id = None
+            self.section_seq += 1
+            self.section_status = EXAM_STATUS_NOT_STARTED
+            self.actual_start = None
+
+    def apply(self, event: Event):
+        data = event.data or {}
+        if event.name == EVENT_SECTION_START:
+            self.exam_status = EXAM_STATUS_IN_EXAM
+            self.section_id = data.get('exam_section_id')
+            self.section_seq = data.get('seq', self.section_seq)
+            self.section_status = EXAM_STATUS_IN_EXAM
+            self.actual_start = data.get('actual_start')
+        elif event.name == EVENT_SECTION_CLOSE:
+            if data.get('exam_section_id') in (None, self.section_id) and self.section_status != EXAM_STATUS_CLOSED:
+                self.section_status = EXAM_STATUS_CLOSED
+                self._advance()
+        elif event.name == EVENT_EXAM_CLOSE:
+            self.exam_status = EXAM_STATUS_CLOSED
+
+    def state(self, now: datetime | None = None) -> dict:
+        now = now or datetime.now()
+        start_count_down = None
+        end_count_down = None
+        if self.section_status == EXAM_STATUS_IN_EXAM and self.actual_start is not None:
+            duration = self._durations.get(self.section_seq, 0)
+            end_count_down = _seconds(self.actual_start + timedelta(minutes=duration) - now)
+        elif self.section_status == EXAM_STATUS_NOT_STARTED:
+            schedule_section = self._schedule_sections.get(self.section_seq)
+            if schedule_section is not None and schedule_section['plan_start_early'] is not None:
+                start_count_down = max(_seconds(schedule_section['plan_start_early'] - now), 0)
+        return {
+            "exam_id": self.exam_id,
+            "exam_status": self.exam_status,
+            "section_seq": self.section_seq,
+            "section_status": self.section_status,
+            "start_count_down": start_count_down,
+            "end_count_down": end_count_down,
+        }
+
+    def tick(self) -> list[tuple[str, dict]]:
+        """Events due now: the tick itself, preceded by a timeout close of a section whose time ran out."""
+        events = []
+        state = self.state()
+        if state["end_count_down"] is not None and state["end_count_down"] <= 0:
+            events.append((EVENT_SECTION_CLOSE, {"exam_section_id": self.section_id, "seq": self.section_seq,
+                                                 "is_timeout": True}))
+            self.section_status = EXAM_STATUS_CLOSED
+            self._advance()
+            state = self.state()
+        events.append((EVENT_TICK, state))
+        return events
+
+    async def stream(self, tick_seconds: float = TICK_SECONDS) -> AsyncIterator[bytes]:
+        subscription = event_hub.subscribe(exam_channel(self.exam_id), session_channel(self.schedule_session_id))
+        try:
+            yield format_sse(EVENT_STATE, self.state())
+            deadline = datetime.now() + timedelta(seconds=tick_seconds)
+            while not self.closed:
+                event = await subscription.get(timeout=max((deadline - datetime.now()).total_seconds(), 0))
+                if event is not None:
+                    self.apply(event)
+                    yield format_sse(event.name, event.data)
+                    continue
+                # section timings edited since the stream opened apply from the next tick
+                self._schedule_sections = await get_schedule_sections(self.schedule_session_id)
+                for name, data in self.tick():
+                    yield format_sse(name, data)
+                deadline = datetime.now() + timedelta(seconds=tick_seconds)
+        finally:
+            subscription.close()
@@ -0,0 +1,186 @@
+"""Exam state resolution for the examinee /exam, /section and /section_start endpoints."""
+
+from datetime import datetime, timedelta
+
+from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_NOT_STARTED, EXAM_STATUS_CLOSED, EXAM_STATUS_IN_EXAM
+from app.data.dao.exam_section_dao import ExamSectionDAO
+from app.data.entity.entities import Exam, ExamSection, ScheduleSection
+from app.data.service.exam_event_service import publish_exam_event, EVENT_SECTION_START, EVENT_SECTION_CLOSE, \
+    EVENT_EXAM_CLOSE
+from app.data.service.paper_cache import paper_cache, CompiledPaper
+from app.data.service.roster_cache import roster_cache
+from app.data.service.session_monitor import session_monitor
+
+
+class ExamStateError(Exception):
+    """The exam is not in a state the request can be served in; the message is shown to the examinee."""
+
+
+class ExamStateResolver:
+    """
+    Resolves an examinee's exam, section and timing state.
+
+    Exam, exam section and schedule section rows come from one joined query, paper and paper sections
+    from the compiled paper cache. The timeout/advance state machine runs in memory and only the
+    transitions that actually happen are written back.
+    """
+
+    def __init__(self, examinee_id: str):
+        self.examinee_id = examinee_id
+
+    def _check_exam(self, exam: Exam | None) -> Exam:
+        if exam is None or exam.is_deleted or exam.examinee_id != self.examinee_id:
+            raise ExamStateError("Exam not exist!")
+        return exam
+
+    async def own_exam_section(self, exam_id: str, exam_section_id: str) -> ExamSection:
+        """The exam section, when it is the examinee's own and of that exam."""
+        exam_section = await ExamSectionDAO().get_async(exam_section_id)
+        if exam_section is None or exam_section.examinee_id != self.examinee_id or exam_section.exam_id != exam_id:
+            raise ExamStateError("Exam Section not exist!")
+        return exam_section
+
+    @staticmethod
+    async def _compiled_paper(exam: Exam) -> CompiledPaper:
+        compiled_paper = await paper_cache.get(exam.paper_id)
+        if compiled_paper is None:
+            raise ExamStateError("Paper not exist!")
+        return compiled_paper
+
+    async def resolve_exam(self, exam_id: str) -> dict:
+        """State of a whole exam: timed-out sections are closed and the section to continue with is picked."""
+        row = await ExamDAO.get_with_last_section_async(exam_id)
+        exam: Exam = self._check_exam(row[0] if row else None)
+        if exam.status == EXAM_STATUS_CLOSED:
+            return {
+                "exam": exam,
+            }
+        compiled_paper = await self._compiled_paper(exam)
+        paper_sections = compiled_paper.sections
+
+        section_seq = 1
+        if exam.status == EXAM_STATUS_IN_EXAM:
+            exam_section: ExamSection = row[1]
+            if exam_section is None:
+                raise ExamStateError("Exam Section not exist!")
+            section_seq = exam_section.seq
+            if exam_section.status == EXAM_STATUS_IN_EXAM:
+                paper_section = compiled_paper.section_by_seq(section_seq)
+                if paper_section is None:
+                    raise ExamStateError("Paper Section not exist!")
+                plan_end = exam_section.actual_start + timedelta(minutes=paper_section['duration'])
+                if datetime.now() >= plan_end:
+                    await ExamSectionDAO.submit_async(exam_section.id, self.examinee_id, is_timeout=True)
+                    exam_section.status = EXAM_STATUS_CLOSED
+                    session_monitor.section_close(exam_id, exam_section.id, section_seq, is_timeout=True)
+                    publish_exam_event(exam_id, EVENT_SECTION_CLOSE,
+                                       {"exam_section_id": exam_section.id, "seq": section_seq, "is_timeout": True})
+            if exam_section.status == EXAM_STATUS_CLOSED:
+                if section_seq < len(paper_sections):
+                    section_seq = exam_section.seq + 1
+                else:
+                    await ExamDAO.submit_async(exam_id, self.examinee_id)
+                    roster_cache.set_exam_status(exam_id, EXAM_STATUS_CLOSED)
+                    session_monitor.exam_close(exam_id)
+                    publish_exam_event(exam_id, EVENT_EXAM_CLOSE, {"is_timeout": True})
+                    raise ExamStateError("Last section is timeout and exam is over!")
+        return {
+            "exam": exam,
+            "paper": compiled_paper.paper,
+            "paper_sections": paper_sections,
+            "section_seq": section_seq,
+        }
+
+    async def resolve_section(self, exam_id: str, section_seq: int) -> dict:
+        """State of one section before it starts; the exam section row is created on first visit."""
+        row = await ExamDAO.get_with_section_seq_async(exam_id, section_seq)
+        exam: Exam = self._check_exam(row[0] if row else None)
+        if exam.status == EXAM_STATUS_CLOSED:
+            raise ExamStateError("Exam is over!")
+        exam_section: ExamSection | None = row[1]
+        schedule_section: ScheduleSection | None = row[2]
+        compiled_paper = await self._compiled_paper(exam)
+        paper_section = compiled_paper.section_by_seq(section_seq)
+        if paper_section is None:
+            raise ExamStateError("Paper Section not exist!")
+        if schedule_section is None:
+            raise ExamStateError("Schedule section not exist!")
+        now = datetime.now()
+        if now > schedule_section.plan_start_late:
+            raise ExamStateError("The time to start this exam section is over!")
+
+        if exam_section is None:
+            exam_section = ExamSection(
+                exam_id=exam_id,
+                examinee_id=self.examinee_id,
+                name=paper_section['name'],
+                paper_id=exam.paper_id,
+                paper_section_id=paper_section['id'],
+                schedule_id=exam.schedule_id,
+                schedule_session_id=exam.schedule_session_id,
+                seq=section_seq,
+                status=EXAM_STATUS_NOT_STARTED,
+            )
+            exam_section.id = await ExamSectionDAO().add_async(exam_section)
+
+        start_count_down = None
+        if now <= schedule_section.plan_start_early:
+            start_count_down = schedule_section.plan_start_early - now
+        return {
+            "exam": exam,
+            "exam_section": exam_section,
+            "paper_section": paper_section,
+            "start_count_down": start_count_down,
+        }
+
+    async def start_section(self, exam_id: str, section_id: str) -> dict:
+        """Start a section, or resume it; a section whose time has run out is closed instead."""
+        row = await ExamDAO.get_with_section_async(exam_id, section_id)
+        exam: Exam = self._check_exam(row[0] if row else None)
+        if exam.status == EXAM_STATUS_CLOSED:
+            raise ExamStateError("Exam is over!")
+        exam_section: ExamSection | None = row[1]
+        schedule_section: ScheduleSection | None = row[2]
+        if exam_section is None or exam_section.is_deleted:
+            raise ExamStateError("Exam section not exist!")
+        if exam_section.status == EXAM_STATUS_CLOSED:
+            raise ExamStateError("Exam section is over!")
+        compiled_paper = await self._compiled_paper(exam)
+        paper_section = compiled_paper.section_by_id(exam_section.paper_section_id)
+        if paper_section is None:
+            raise ExamStateError("Paper section not exist!")
+        if schedule_section is None:
+            raise ExamStateError("Schedule section not exist!")
+        now = datetime.now()
+        if now < schedule_section.plan_start_early:
+            raise ExamStateError("It's not time to start this exam section!")
+        if now > schedule_section.plan_start_late:
+            raise ExamStateError("The time to start this exam section is over!")
+
+        if exam_section.status != EXAM_STATUS_IN_EXAM:
+            exam_section.actual_start = await ExamSectionDAO.start_async(section_id=section_id,
+                                                                         updated_by=self.examinee_id)
+            exam_section.status = EXAM_STATUS_IN_EXAM
+            if exam_section.seq == 1 and exam.status != EXAM_STATUS_IN_EXAM:
+                exam.status = EXAM_STATUS_IN_EXAM
+                # status only: the loaded row's score may already be behind answers scored since
+                await ExamDAO.set_status_async(exam_id, EXAM_STATUS_IN_EXAM, self.examinee_id)
+                roster_cache.set_exam_status(exam_id, EXAM_STATUS_IN_EXAM)
+                session_monitor.exam_status(exam_id, EXAM_STATUS_IN_EXAM)
+            session_monitor.section_start(exam_id, section_id, exam_section.seq, exam_section.name,
+                                          exam_section.actual_start)
+            publish_exam_event(exam_id, EVENT_SECTION_START, {"exam_section_id": section_id, "seq": exam_section.seq,
+                                                              "actual_start": exam_section.actual_start})
+
+        end_count_down = timedelta(minutes=paper_section['duration']) - (datetime.now() - exam_section.actual_start)
+        if end_count_down <= timedelta(0):
+            await ExamSectionDAO.submit_async(section_id=section_id, updated_by=self.examinee_id, is_timeout=True)
+            session_monitor.section_close(exam_id, section_id, exam_section.seq, is_timeout=True)
+            publish_exam_event(exam_id, EVENT_SECTION_CLOSE,
+                               {"exam_section_id": section_id, "seq": exam_section.seq, "is_timeout": True})
+            exam_section = None
+        return {
+            "end_count_down": end_count_down,
+            "exam": exam,
+            "exam_section": exam_section,
+        }
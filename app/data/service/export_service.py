@@ -0,0 +1,93 @@
+"""Export service: streamed CSV/XLSX results of a schedule session."""
+
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from typing import AsyncIterator
+
+from openpyxl import Workbook
+
+from app.data.dao.exam_answer_dao import ExamAnswerDAO
+from app.data.dao.exam_dao import ExamDAO
+from app.data.dao.exam_section_dao import ExamSectionDAO
+from app.data.database import async_db_stream
+
+EXPORT_STATEMENTS = {
+    "exams": ExamDAO.export_statement,
+    "sections": ExamSectionDAO.export_statement,
+    "answers": ExamAnswerDAO.export_statement,
+}
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# rows fetched per server-side cursor round trip, and rows written per output chunk
+EXPORT_FETCH_ROWS: int = int(os.getenv("EXPORT_FETCH_ROWS", "1000"))
+EXPORT_CHUNK_ROWS: int = 500
+XLSX_READ_BYTES: int = 64 * 1024
+
+
+async def _row_batches(kind: str, schedule_session_id: str) -> AsyncIterator[list[tuple]]:
+    batch = []
+    async for row in async_db_stream(EXPORT_STATEMENTS[kind](schedule_session_id), yield_per=EXPORT_FETCH_ROWS):
+        batch.append(tuple(row))
+        if len(batch) >= EXPORT_CHUNK_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_header(kind: str) -> list[str]:
+    return list(EXPORT_STATEMENTS[kind]("").selected_columns.keys())
+
+
+async def stream_csv(kind: str, schedule_session_id: str) -> AsyncIterator[bytes]:
+    """CSV of an export, written and sent EXPORT_CHUNK_ROWS rows at a time; starts with a BOM for Excel."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(export_header(kind))
+    async for batch in _row_batches(kind, schedule_session_id):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _append_rows(sheet, rows: list[tuple]):
+    for row in rows:
+        sheet.append(row)
+
+
+async def stream_xlsx(kind: str, schedule_session_id: str) -> AsyncIterator[bytes]:
+    """
+    XLSX of an export. The workbook is write-only: openpyxl streams each row to a temporary file instead
+    of keeping cells in memory. The zip can only be sent once complete, so it is saved to a temporary
+    file and read back in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=kind)
+    sheet.append(export_header(kind))
+    async for batch in _row_batches(kind, schedule_session_id):
+        # appending is CPU bound; keep the event loop free while a batch is written
+        await asyncio.to_thread(_append_rows, sheet, batch)
+    with tempfile.TemporaryFile() as file:
+        await asyncio.to_thread(workbook.save, file)
+        file.seek(0)
+        while chunk := await asyncio.to_thread(file.read, XLSX_READ_BYTES):
+            yield chunk
+
+
+class ExportService:
+    """Service class for results export."""
+
+    @staticmethod
+    def stream(kind: str, export_format: str, schedule_session_id: str) -> AsyncIterator[bytes]:
+        if export_format == "xlsx":
+            return stream_xlsx(kind, schedule_session_id)
+        return stream_csv(kind, schedule_session_id)
@@ -0,0 +1,582 @@
+"""Grading service: vectorized auto-grading of objective questions."""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.data.dao.exam_answer_dao import ExamAnswerDAO
+from app.data.dao.exam_dao import ExamDAO
+from app.data.dao.exam_section_dao import ExamSectionDAO
+from app.data.dao.paper_dao import PaperDAO, QUESTION_TYPE_SINGLE_CHOICE, QUESTION_TYPE_TRUE_FALSE, \
+    QUESTION_TYPE_DEFINITE_MULTIPLE_CHOICE, QUESTION_TYPE_INDEFINITE_MULTIPLE_CHOICE, SCORING_POLICY_ALL_OR_NOTHING, \
+    SCORING_POLICY_PROPORTIONAL, SCORING_POLICY_NEGATIVE_MARKING, SCORING_POLICY_ORDER_SENSITIVE
+from app.data.dao.paper_section_dao import PaperSectionDAO
+from app.data.dao.question_dao import QuestionDAO
+from app.data.dao.question_option import QuestionOptionDAO
+from app.data.database import async_db_bulk_update
+from app.data.entity.entities import Paper, PaperSection, Question, QuestionOption, ExamAnswer, ExamSection, Exam
+from app.data.service.paper_cache import paper_cache
+from app.util.util_cache import LRUCache, TTLCache
+
+GRADABLE_QUESTION_TYPES: tuple[int, ...] = (
+    QUESTION_TYPE_SINGLE_CHOICE,
+    QUESTION_TYPE_TRUE_FALSE,
+    QUESTION_TYPE_DEFINITE_MULTIPLE_CHOICE,
+    QUESTION_TYPE_INDEFINITE_MULTIPLE_CHOICE,
+)
+
+# ExamAnswer.is_correct
+ANSWER_WRONG: int = 0
+ANSWER_HALF_CORRECT: int = 1
+ANSWER_ALL_CORRECT: int = 2
+
+# answers are bit masks of chosen options: option codes "1".."63" or "A".."Z" map to bits 0..62,
+# bit 63 flags a token that names no option, so such an answer never equals a key
+MAX_OPTIONS: int = 63
+INVALID_OPTION_BIT = np.uint64(1 << 63)
+_ANSWER_TOKEN_SPLIT = re.compile(r"[\s,;|]+")
+
+# for order-sensitive scoring an answer is also packed into a sequence code: 6 bits (option bit + 1) per
+# position, first choice in the lowest bits; positions past MAX_SEQUENCE are not order-checked
+SEQUENCE_ITEM_BITS: int = 6
+MAX_SEQUENCE: int = 10
+_SEQUENCE_ITEM_MASK = np.uint64((1 << SEQUENCE_ITEM_BITS) - 1)
+
+# set bits of every byte value; popcount of a uint64 is the sum over its 8 bytes
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+SCORING_POLICIES: tuple[int, ...] = (
+    SCORING_POLICY_ALL_OR_NOTHING,
+    SCORING_POLICY_PROPORTIONAL,
+    SCORING_POLICY_NEGATIVE_MARKING,
+    SCORING_POLICY_ORDER_SENSITIVE,
+)
+
+
+def option_bit(code: str | None) -> int:
+    """Bit index of an option code, or -1 when the code cannot name an option."""
+    code = (code or "").strip()
+    if code.isdigit():
+        bit = int(code) - 1
+    elif len(code) == 1 and code.isalpha():
+        bit = ord(code.upper()) - ord('A')
+    else:
+        return -1
+    return bit if 0 <= bit < MAX_OPTIONS else -1
+
+
+def _tokens(answer: str | None) -> list[str]:
+    return [token for token in _ANSWER_TOKEN_SPLIT.split(answer or "") if token]
+
+
+def parse_answer(answer: str | None) -> int:
+    """Bit mask of the options chosen in an answer string such as "2", "1,3" or "A C"."""
+    mask = 0
+    for token in _tokens(answer):
+        bit = option_bit(token)
+        mask |= (1 << bit) if bit >= 0 else int(INVALID_OPTION_BIT)
+    return mask
+
+
+def sequence_code(bits: Sequence[int]) -> int:
+    """Sequence code of option bits in order; an invalid bit (-1) packs as 0 and never matches a position."""
+    code = 0
+    for position, bit in enumerate(bits[:MAX_SEQUENCE]):
+        code |= (bit + 1) << (position * SEQUENCE_ITEM_BITS)
+    return code
+
+
+def parse_answer_sequence(answer: str | None) -> int:
+    """Sequence code of the options chosen in an answer string, in the order given."""
+    return sequence_code([option_bit(token) for token in _tokens(answer)])
+
+
+def parse_answers_with_order(answers: Sequence[str | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Bit masks and sequence codes of many answers; each distinct answer string is parsed only once."""
+    codes, uniques = pd.factorize(pd.Series(answers, dtype=object), use_na_sentinel=True)
+    unique_masks = np.fromiter((parse_answer(answer) for answer in uniques), dtype=np.uint64, count=len(uniques))
+    unique_sequences = np.fromiter((parse_answer_sequence(answer) for answer in uniques), dtype=np.uint64,
+                                   count=len(uniques))
+    masks = np.zeros(len(codes), dtype=np.uint64)
+    sequences = np.zeros(len(codes), dtype=np.uint64)
+    answered = codes >= 0
+    masks[answered] = unique_masks[codes[answered]]
+    sequences[answered] = unique_sequences[codes[answered]]
+    return masks, sequences
+
+
+def parse_answers(answers: Sequence[str | None]) -> np.ndarray:
+    """Bit masks of many answers; each distinct answer string is parsed only once."""
+    return parse_answers_with_order(answers)[0]
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """Number of set bits of each uint64, through the byte lookup table."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int16)
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """
+    A paper's objective answer key compiled to arrays indexed by question position.
+
+    key_mask holds the bit mask of the correct options, weight the full score of a question, and
+    section_index the position of its paper section in section_ids. The scoring policy of each question
+    is resolved at compile time (section over paper) and comes with the lookup tables its rule needs:
+    key_count and distractor_count (number of correct and wrong options) and key_sequence, the sequence
+    code of the correct options ordered by correct_seq.
+    """
+    paper_id: str
+    question_ids: list[str]
+    question_index: dict[str, int]
+    question_type: np.ndarray
+    key_mask: np.ndarray
+    gradable: np.ndarray
+    weight: np.ndarray
+    section_index: np.ndarray
+    section_ids: list[str]
+    section_pass_score: np.ndarray
+    paper_pass_score: float
+    policy: np.ndarray
+    key_count: np.ndarray
+    distractor_count: np.ndarray
+    key_sequence: np.ndarray
+    sequence_length: np.ndarray
+
+    def indexes_of(self, question_ids: Sequence[str]) -> np.ndarray:
+        """Question positions of many question ids; -1 for questions not in the key."""
+        return pd.Index(self.question_ids).get_indexer(pd.Index(question_ids, dtype=object))
+
+
+def _to_float(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def compile_answer_key(paper: Paper, sections: Sequence[PaperSection], questions: Sequence[Question],
+                       options: Sequence[QuestionOption]) -> AnswerKey:
+    section_ids = [section.id for section in sections]
+    section_position = {section_id: i for i, section_id in enumerate(section_ids)}
+    sections_by_id = {section.id: section for section in sections}
+
+    key_masks: dict[str, int] = {}
+    option_masks: dict[str, int] = {}
+    ordered_keys: dict[str, list[tuple[int, int]]] = {}
+    for option in options:
+        bit = option_bit(option.code)
+        if bit < 0:
+            continue
+        option_masks[option.question_id] = option_masks.get(option.question_id, 0) | (1 << bit)
+        if option.is_correct:
+            key_masks[option.question_id] = key_masks.get(option.question_id, 0) | (1 << bit)
+            if option.correct_seq is not None:
+                ordered_keys.setdefault(option.question_id, []).append((option.correct_seq, bit))
+
+    question_ids = [question.id for question in questions]
+    question_type = np.array([question.question_type or 0 for question in questions], dtype=np.int16)
+    key_mask = np.array([key_masks.get(question_id, 0) for question_id in question_ids], dtype=np.uint64)
+    option_mask = np.array([option_masks.get(question_id, 0) for question_id in question_ids], dtype=np.uint64)
+    key_sequence = np.array([sequence_code([bit for _, bit in sorted(ordered_keys.get(question_id, []))])
+                             for question_id in question_ids], dtype=np.uint64)
+    sequence_length = np.array([min(len(ordered_keys.get(question_id, [])), MAX_SEQUENCE)
+                                for question_id in question_ids], dtype=np.int16)
+    weight = np.empty(len(questions), dtype=np.float64)
+    section_index = np.empty(len(questions), dtype=np.int32)
+    policy = np.empty(len(questions), dtype=np.int8)
+    for i, question in enumerate(questions):
+        section = sections_by_id.get(question.section_id)
+        # a question's own score, else its section's unit score, else the paper's
+        unit_score = question.score
+        if unit_score is None and section is not None:
+            unit_score = section.unit_score
+        if unit_score is None:
+            unit_score = paper.unit_score
+        weight[i] = float(unit_score) if unit_score is not None else 1.0
+        section_index[i] = section_position.get(question.section_id, -1)
+        question_policy = section.scoring_policy if section is not None and section.scoring_policy else \
+            paper.scoring_policy
+        policy[i] = question_policy if question_policy in SCORING_POLICIES else SCORING_POLICY_ALL_OR_NOTHING
+    # order-sensitive scoring needs correct_seq on the key; without it a question is scored all-or-nothing
+    policy[(policy == SCORING_POLICY_ORDER_SENSITIVE) & (sequence_length == 0)] = SCORING_POLICY_ALL_OR_NOTHING
+    key_count = popcount(key_mask)
+    return AnswerKey(
+        paper_id=paper.id,
+        question_ids=question_ids,
+        question_index={question_id: i for i, question_id in enumerate(question_ids)},
+        question_type=question_type,
+        key_mask=key_mask,
+        gradable=np.isin(question_type, GRADABLE_QUESTION_TYPES) & (key_mask != 0),
+        weight=weight,
+        section_index=section_index,
+        section_ids=section_ids,
+        section_pass_score=np.array([_to_float(section.pass_score) for section in sections], dtype=np.float64),
+        paper_pass_score=_to_float(paper.pass_score),
+        policy=policy,
+        key_count=key_count,
+        distractor_count=popcount(option_mask & ~key_mask),
+        key_sequence=key_sequence,
+        sequence_length=sequence_length,
+    )
+
+
+def _position_matches(sequences: np.ndarray, key_sequences: np.ndarray) -> np.ndarray:
+    """Number of positions at which an answer sequence names the key's option for that position."""
+    same = sequences ^ key_sequences
+    matches = np.zeros(len(sequences), dtype=np.int16)
+    for position in range(MAX_SEQUENCE):
+        shift = np.uint64(position * SEQUENCE_ITEM_BITS)
+        matches += ((((same >> shift) & _SEQUENCE_ITEM_MASK) == 0)
+                    & (((key_sequences >> shift) & _SEQUENCE_ITEM_MASK) != 0))
+    return matches
+
+
+def score_answers(key: AnswerKey, question_index: np.ndarray, masks: np.ndarray, sequences: np.ndarray):
+    """
+    Score answers in one vectorized pass.
+
+    Every policy's rule is evaluated for every answer as array arithmetic, then each answer takes the
+    result of its question's policy by table lookup; there is no per-answer branching.
+    - all-or-nothing: full weight when exactly the correct options are chosen.
+    - proportional: the share of correct options chosen, nothing when any wrong option is chosen.
+    - negative marking: the share of correct options chosen minus the share of wrong options chosen;
+      a wrong single choice costs weight / (options - 1), a blank answer scores 0.
+    - order-sensitive: the share of positions holding the option the key has at that position.
+
+    Returns (graded, is_correct, score): graded marks the answers to objective questions of the key;
+    is_correct and score are only meaningful where graded is set.
+    """
+    if not key.question_ids:
+        return np.zeros(len(masks), dtype=bool), np.zeros(len(masks), dtype=np.int8), np.zeros(len(masks))
+    known = question_index >= 0
+    index = np.where(known, question_index, 0)
+    graded = known & key.gradable[index]
+    key_mask = key.key_mask[index]
+    weight = key.weight[index]
+    key_count = np.maximum(key.key_count[index], 1)
+    hits = popcount(masks & key_mask)
+    misses = popcount(masks & ~key_mask)
+    exact = masks == key_mask
+
+    all_or_nothing = np.where(exact, 1.0, 0.0)
+    proportional = np.where(misses == 0, hits / key_count, 0.0)
+    negative = hits / key_count - misses / np.maximum(key.distractor_count[index], 1)
+    order = np.where(exact, _position_matches(sequences, key.key_sequence[index])
+                     / np.maximum(key.sequence_length[index], 1), 0.0)
+    # rows of the table follow the policy codes, row 0 is unused
+    credit_table = np.stack([all_or_nothing, all_or_nothing, proportional, negative, order])
+    credit = np.where(graded, credit_table[key.policy[index], np.arange(len(masks))], 0.0)
+    score = np.round(credit * weight, 2)
+
+    is_correct = np.select([credit >= 1, credit > 0], [ANSWER_ALL_CORRECT, ANSWER_HALF_CORRECT],
+                           ANSWER_WRONG).astype(np.int8)
+    return graded, is_correct, score
+
+
+def _passed(score: float, pass_score: float) -> bool | None:
+    return None if np.isnan(pass_score) else bool(score >= pass_score)
+
+
+# (paper_id, paper content version) -> AnswerKey
+_answer_keys = LRUCache(max_size=64)
+
+
+async def get_answer_key(paper_id: str) -> AnswerKey | None:
+    """The paper's compiled answer key, cached until the paper changes (see paper_cache.version)."""
+    cache_key = (paper_id, await paper_cache.version(paper_id))
+    key = _answer_keys.get(cache_key)
+    if key is None:
+        key = await load_answer_key_async(paper_id)
+        if key is None:
+            return None
+        _answer_keys.pop_where(lambda cached_key: cached_key[0] == paper_id)
+        _answer_keys.put(cache_key, key)
+    return key
+
+
+async def load_answer_key_async(paper_id: str) -> AnswerKey | None:
+    """Compile a paper's answer key straight from the database, bypassing the cache."""
+    paper = await PaperDAO().get_async(paper_id)
+    if paper is None or paper.is_deleted:
+        return None
+    return compile_answer_key(paper,
+                              await PaperSectionDAO.list_by_paper_async(paper_id),
+                              await QuestionDAO.list_by_paper_async(paper_id),
+                              await QuestionOptionDAO.list_by_paper_async(paper_id))
+
+
+def load_answer_key(paper_id: str) -> AnswerKey | None:
+    """Compile a paper's answer key straight from the database, bypassing the cache; for paper writers."""
+    paper = PaperDAO().get(paper_id)
+    if paper is None or paper.is_deleted:
+        return None
+    return compile_answer_key(paper, PaperSectionDAO.list_by_paper(paper_id), QuestionDAO.list_by_paper(paper_id),
+                              QuestionOptionDAO.list_by_paper(paper_id))
+
+
+# per-question tables of AnswerKey that decide an answer's score
+_SCORING_TABLES: tuple[str, ...] = ('gradable', 'key_mask', 'weight', 'policy', 'distractor_count', 'key_sequence')
+
+
+def diff_answer_keys(old: AnswerKey | None, new: AnswerKey | None) -> list[str]:
+    """Ids of the questions whose objective scoring differs between two versions of an answer key."""
+    if old is None or new is None:
+        return []
+    changed = [question_id for question_id in old.question_ids if question_id not in new.question_index]
+    for i, question_id in enumerate(new.question_ids):
+        j = old.question_index.get(question_id)
+        if j is None:
+            if new.gradable[i]:
+                changed.append(question_id)
+        elif any(getattr(new, table)[i] != getattr(old, table)[j] for table in _SCORING_TABLES):
+            changed.append(question_id)
+    return changed
+
+
+def record_answer_key_change(old: AnswerKey | None, new: AnswerKey | None) -> list[str]:
+    """Flag the questions an edit re-keyed for the next regrade of the paper; returns them."""
+    question_ids = diff_answer_keys(old, new)
+    if question_ids:
+        QuestionDAO.mark_rekeyed(question_ids, datetime.now())
+    return question_ids
+
+
+# exam_id -> paper_id; an exam keeps its paper for the whole sitting
+_exam_papers = TTLCache(max_size=20000, ttl=3600)
+
+
+async def get_answer_keys_by_exam(exam_ids: Sequence[str]) -> dict[str, AnswerKey]:
+    """Compiled answer keys of the papers of many exams, keyed by exam id; exams without a paper are left out."""
+    missing = [exam_id for exam_id in exam_ids if exam_id not in _exam_papers]
+    if missing:
+        for exam_id, paper_id in await ExamDAO.list_paper_ids_async(missing):
+            _exam_papers.put(exam_id, paper_id)
+    keys = {}
+    for exam_id in exam_ids:
+        paper_id = _exam_papers.get(exam_id)
+        key = await get_answer_key(paper_id) if paper_id else None
+        if key is not None:
+            keys[exam_id] = key
+    return keys
+
+
+def _to_decimal(value: float | None) -> Decimal | None:
+    return None if value is None or np.isnan(value) else Decimal(str(round(float(value), 2)))
+
+
+def score_saved_answers(keys_by_exam: dict[str, AnswerKey], answers: list[ExamAnswer]):
+    """
+    Score just-saved answers in place and return the running totals to add: (exam section rows, exam rows)
+    of b_id, b_delta and b_pass_score. Only objective answers whose score or is_correct changed count;
+    their exam section and exam totals move by the score difference.
+    """
+    section_totals: dict[str, dict] = {}
+    exam_totals: dict[str, dict] = {}
+    by_paper: dict[str, list[ExamAnswer]] = {}
+    for answer in answers:
+        key = keys_by_exam.get(answer.exam_id)
+        if key is not None:
+            by_paper.setdefault(key.paper_id, []).append(answer)
+    for paper_answers in by_paper.values():
+        key = keys_by_exam[paper_answers[0].exam_id]
+        question_index = key.indexes_of([answer.question_id for answer in paper_answers])
+        graded, is_correct, score = score_answers(
+            key, question_index, *parse_answers_with_order([answer.answer for answer in paper_answers]))
+        for i, answer in enumerate(paper_answers):
+            if not graded[i]:
+                continue
+            new_score = _to_decimal(score[i])
+            if answer.score == new_score and answer.is_correct == is_correct[i]:
+                continue
+            delta = new_score - (answer.score or 0)
+            answer.score = new_score
+            answer.is_correct = int(is_correct[i])
+            section_pass_score = key.section_pass_score[key.section_index[question_index[i]]] \
+                if key.section_index[question_index[i]] >= 0 else np.nan
+            section_total = section_totals.setdefault(answer.exam_section_id, {
+                'b_id': answer.exam_section_id, 'b_delta': Decimal(0), 'b_pass_score': _to_decimal(section_pass_score)})
+            section_total['b_delta'] += delta
+            exam_total = exam_totals.setdefault(answer.exam_id, {
+                'b_id': answer.exam_id, 'b_delta': Decimal(0), 'b_pass_score': _to_decimal(key.paper_pass_score)})
+            exam_total['b_delta'] += delta
+    return list(section_totals.values()), list(exam_totals.values())
+
+
+_ANSWER_COLUMNS = ['id', 'exam_id', 'exam_section_id', 'question_id', 'answer', 'score', 'is_correct']
+
+
+def _answer_frame(answer_rows: Sequence) -> pd.DataFrame:
+    return pd.DataFrame(list(answer_rows), columns=_ANSWER_COLUMNS)
+
+
+def _rescore(key: AnswerKey, answers: pd.DataFrame):
+    """(graded, is_correct, score, old_score, changed) of answer rows scored against key."""
+    graded, is_correct, score = score_answers(key, key.indexes_of(answers['question_id']),
+                                              *parse_answers_with_order(answers['answer'].tolist()))
+    old_score = answers['score'].astype(np.float64).to_numpy()
+    old_is_correct = answers['is_correct'].astype(np.float64).to_numpy()
+    changed = graded & ((old_score != np.round(score, 2)) | (old_is_correct != is_correct))
+    return graded, is_correct, score, old_score, changed
+
+
+def _answer_updates(answers: pd.DataFrame, is_correct: np.ndarray, score: np.ndarray, changed: np.ndarray,
+                    updated_by: str | None, now: datetime) -> list[dict]:
+    return [
+        {'id': answer_id, 'score': round(float(answer_score), 2), 'is_correct': int(answer_is_correct),
+         'updated_at': now, 'updated_by': updated_by}
+        for answer_id, answer_score, answer_is_correct
+        in zip(answers['id'][changed], score[changed], is_correct[changed])
+    ]
+
+
+@dataclass
+class GradingResult:
+    answers: list[dict]
+    exam_sections: list[dict]
+    exams: list[dict]
+    graded: int
+
+
+def grade(key: AnswerKey, answer_rows: Sequence, section_rows: Sequence, updated_by: str | None) -> GradingResult:
+    """
+    Grade a cohort: answer_rows are (id, exam_id, exam_section_id, question_id, answer, score, is_correct),
+    section_rows are (id, exam_id, paper_section_id). Returns the rows to update; answers whose score and
+    is_correct are unchanged are left out. Answers to other question types keep their (manual) score,
+    which still counts towards the totals.
+    """
+    now = datetime.now()
+    answers = _answer_frame(answer_rows)
+    sections = pd.DataFrame(list(section_rows), columns=['id', 'exam_id', 'paper_section_id'])
+
+    graded, is_correct, score, old_score, changed = _rescore(key, answers)
+    new_score = np.where(graded, score, old_score)
+    answer_updates = _answer_updates(answers, is_correct, score, changed, updated_by, now)
+
+    # totals: sum of answer scores per exam section and per exam, unanswered sections score 0
+    totals = pd.Series(np.nan_to_num(new_score), index=answers.index)
+    section_totals = totals.groupby(answers['exam_section_id']).sum()
+    exam_totals = totals.groupby(answers['exam_id']).sum()
+    section_score = section_totals.reindex(sections['id'], fill_value=0.0).to_numpy()
+    section_position = pd.Index(key.section_ids).get_indexer(sections['paper_section_id'])
+    section_pass = np.full(len(sections), np.nan)
+    found = section_position >= 0
+    section_pass[found] = key.section_pass_score[section_position[found]]
+    exam_section_updates = [
+        {'id': section_id, 'score': round(float(total), 2), 'is_passed': _passed(total, pass_score),
+         'updated_at': now, 'updated_by': updated_by}
+        for section_id, total, pass_score in zip(sections['id'], section_score, section_pass)
+    ]
+    exam_ids = pd.unique(pd.concat([sections['exam_id'], answers['exam_id']], ignore_index=True))
+    exam_updates = [
+        {'id': exam_id, 'score': round(float(total), 2), 'is_passed': _passed(total, key.paper_pass_score),
+         'updated_at': now, 'updated_by': updated_by}
+        for exam_id, total in exam_totals.reindex(exam_ids, fill_value=0.0).items()
+    ]
+    return GradingResult(answer_updates, exam_section_updates, exam_updates, int(graded.sum()))
+
+
+@dataclass
+class RegradeResult:
+    answers: list[dict]
+    exam_section_ids: list[str]
+    exam_ids: list[str]
+    exam_deltas: list[dict]
+    question_deltas: list[dict]
+
+
+def regrade(key: AnswerKey, answer_rows: Sequence, updated_by: str | None) -> RegradeResult:
+    """
+    Rescore answer rows (see grade) against a changed key. Returns the answers to update, the exam
+    sections and exams whose totals move, and the score deltas per exam and per question.
+    """
+    answers = _answer_frame(answer_rows)
+    _, is_correct, score, old_score, changed = _rescore(key, answers)
+    deltas = pd.DataFrame({'exam_id': answers['exam_id'], 'question_id': answers['question_id'], 'changed': changed,
+                           'delta': np.where(changed, np.round(score, 2) - np.nan_to_num(old_score), 0.0)})
+    per_exam = (deltas[changed].groupby('exam_id')
+                .agg(changed_answers=('changed', 'size'), delta=('delta', 'sum')))
+    per_question = (deltas.groupby('question_id')
+                    .agg(answers=('changed', 'size'), changed_answers=('changed', 'sum'), delta=('delta', 'sum')))
+    changed_answers = answers[changed]
+    return RegradeResult(
+        answers=_answer_updates(answers, is_correct, score, changed, updated_by, datetime.now()),
+        exam_section_ids=pd.unique(changed_answers['exam_section_id']).tolist(),
+        exam_ids=pd.unique(changed_answers['exam_id']).tolist(),
+        exam_deltas=[{"exam_id": exam_id, "changed_answers": int(row.changed_answers), "delta": round(float(row.delta), 2)}
+                     for exam_id, row in per_exam.iterrows()],
+        question_deltas=[{"question_id": question_id, "answers": int(row.answers),
+                          "changed_answers": int(row.changed_answers), "delta": round(float(row.delta), 2)}
+                         for question_id, row in per_question.iterrows()],
+    )
+
+
+class GradingService:
+    """Service class for auto-grading objective questions."""
+
+    @staticmethod
+    async def grade_session(schedule_session_id: str, paper_id: str, updated_by: str | None = None) -> dict:
+        """Grade every exam of a schedule session and write answer, section and exam results back."""
+        started = time.perf_counter()
+        key = await get_answer_key(paper_id)
+        if key is None:
+            return {"success": False, "error": "Paper not found"}
+        answer_rows = await ExamAnswerDAO.list_for_grading_async(schedule_session_id)
+        section_rows = await ExamSectionDAO.list_for_grading_async(schedule_session_id)
+        # the scoring pass is CPU bound; keep the event loop free while it runs
+        result = await asyncio.to_thread(grade, key, answer_rows, section_rows, updated_by)
+        await async_db_bulk_update(
+            (ExamAnswer, result.answers),
+            (ExamSection, result.exam_sections),
+            (Exam, result.exams),
+        )
+        return {
+            "success": True,
+            "answers": len(answer_rows),
+            "graded": result.graded,
+            "updated_answers": len(result.answers),
+            "exam_sections": len(result.exam_sections),
+            "exams": len(result.exams),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }
+
+    @staticmethod
+    async def regrade_paper(paper_id: str, question_ids: list[str] | None = None, dry_run: bool = False,
+                            updated_by: str | None = None) -> dict:
+        """
+        Rescore only the answers to re-keyed questions of a paper, across every exam that sat it, and
+        recompute the totals they belong to. question_ids defaults to the questions paper edits flagged
+        as re-keyed since their last regrade. A dry run reports the deltas only.
+        """
+        started = time.perf_counter()
+        regraded_at = datetime.now()
+        # straight from the database: the cached key may predate an edit saved by another worker
+        key = await load_answer_key_async(paper_id)
+        if key is None:
+            return {"success": False, "error": "Paper not found"}
+        if question_ids is None:
+            question_ids = await QuestionDAO.list_rekeyed_async(paper_id)
+        answer_rows = await ExamAnswerDAO.list_for_regrade_async(paper_id, question_ids) if question_ids else []
+        result = await asyncio.to_thread(regrade, key, answer_rows, updated_by)
+        if not dry_run:
+            await ExamAnswerDAO.apply_regrade_async(result.answers, result.exam_section_ids, result.exam_ids,
+                                                    updated_by)
+            if question_ids:
+                await QuestionDAO.clear_rekeyed_async(question_ids, regraded_at)
+        return {
+            "success": True,
+            "dry_run": dry_run,
+            "question_ids": question_ids,
+            "answers": len(answer_rows),
+            "updated_answers": len(result.answers),
+            "exam_sections": len(result.exam_section_ids),
+            "exams": len(result.exam_ids),
+            "exam_deltas": result.exam_deltas,
+            "question_deltas": result.question_deltas,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }
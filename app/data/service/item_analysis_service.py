@@ -0,0 +1,158 @@
+"""Item analysis service: difficulty, discrimination, distractors and reliability of a paper's questions."""
+
+import asyncio
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.data.dao.exam_answer_dao import ExamAnswerDAO
+from app.data.dao.question_option import QuestionOptionDAO
+from app.data.entity.entities import QuestionOption
+from app.data.service.grading_service import AnswerKey, get_answer_key, option_bit, parse_answers, \
+    INVALID_OPTION_BIT
+from app.data.service.paper_cache import paper_cache
+from app.util.util_cache import LRUCache
+
+
+def _rounded(value, digits: int = 4) -> float | None:
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+
+def _column_correlation(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation of each column of x with the same column of y; NaN where either is constant."""
+    xc = x - x.mean(axis=0)
+    yc = y - y.mean(axis=0)
+    denominator = np.sqrt((xc ** 2).sum(axis=0) * (yc ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, (xc * yc).sum(axis=0) / denominator, np.nan)
+
+
+def cronbach_alpha(scores: np.ndarray) -> float:
+    """Cronbach's alpha of an examinee x item score matrix; NaN for fewer than 2 items or examinees."""
+    n_exams, n_items = scores.shape
+    if n_items < 2 or n_exams < 2:
+        return np.nan
+    total_variance = scores.sum(axis=1).var(ddof=1)
+    if total_variance == 0:
+        return np.nan
+    return n_items / (n_items - 1) * (1 - scores.var(axis=0, ddof=1).sum() / total_variance)
+
+
+def analyze(key: AnswerKey, answer_rows: Sequence, options: Sequence[QuestionOption],
+            question_seqs: dict[str, int] | None = None) -> dict:
+    """
+    Item statistics of a paper from answer rows (exam_id, question_id, answer, score), in one pass over
+    the examinee x question score matrix. Examinees are the exams with at least one answer; a question
+    an examinee did not answer scores 0.
+
+    - difficulty: mean score over the question's weight (the p-value for 0/1 items).
+    - discrimination: correlation of the question's score with the examinee's score on the other
+      questions (corrected point-biserial for 0/1 items).
+    - options: how many examinees chose each option; blank counts examinees who chose none.
+    - alpha: Cronbach's alpha per paper section and for the paper.
+    """
+    answers = pd.DataFrame(list(answer_rows), columns=['exam_id', 'question_id', 'answer', 'score'])
+    question_index = key.indexes_of(answers['question_id'])
+    known = question_index >= 0
+    answers = answers[known]
+    question_index = question_index[known]
+    exam_codes, exam_ids = pd.factorize(answers['exam_id'])
+    n_exams, n_questions = len(exam_ids), len(key.question_ids)
+
+    scores = np.zeros((n_exams, n_questions))
+    scores[exam_codes, question_index] = answers['score'].astype(np.float64).fillna(0.0).to_numpy()
+    totals = scores.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = scores.mean(axis=0) / key.weight if n_exams else np.full(n_questions, np.nan)
+    discrimination = _column_correlation(scores, totals[:, None] - scores) if n_exams else \
+        np.full(n_questions, np.nan)
+
+    # option choice counts per question, one bincount per option bit
+    masks = parse_answers(answers['answer'].tolist())
+    option_rows = [(key.question_index[option.question_id], option_bit(option.code), option)
+                   for option in options if option.question_id in key.question_index and option_bit(option.code) >= 0]
+    n_bits = max((bit for _, bit, _ in option_rows), default=-1) + 1
+    choices = np.zeros((n_questions, n_bits))
+    for bit in range(n_bits):
+        chosen = ((masks >> np.uint64(bit)) & np.uint64(1)).astype(np.float64)
+        choices[:, bit] = np.bincount(question_index, weights=chosen, minlength=n_questions)
+    chose_any = np.bincount(question_index, weights=(masks != 0).astype(np.float64), minlength=n_questions)
+    invalid = np.bincount(question_index, weights=((masks & INVALID_OPTION_BIT) != 0).astype(np.float64),
+                          minlength=n_questions)
+    options_by_question: dict[int, list[dict]] = {}
+    for question, bit, option in sorted(option_rows, key=lambda row: (row[0], row[2].code)):
+        options_by_question.setdefault(question, []).append({
+            "code": option.code,
+            "is_correct": bool(option.is_correct),
+            "count": int(choices[question, bit]),
+            "share": _rounded(choices[question, bit] / n_exams) if n_exams else None,
+        })
+
+    question_seqs = question_seqs or {}
+    questions = []
+    for i, question_id in enumerate(key.question_ids):
+        section = key.section_index[i]
+        questions.append({
+            "question_id": question_id,
+            "section_id": key.section_ids[section] if section >= 0 else None,
+            "seq": question_seqs.get(question_id),
+            "question_type": int(key.question_type[i]),
+            "weight": float(key.weight[i]),
+            "mean_score": _rounded(scores[:, i].mean()) if n_exams else None,
+            "difficulty": _rounded(difficulty[i]),
+            "discrimination": _rounded(discrimination[i]),
+            "options": options_by_question.get(i, []),
+            "blank": int(n_exams - chose_any[i]),
+            "invalid": int(invalid[i]),
+        })
+    sections = [
+        {
+            "section_id": section_id,
+            "questions": int((key.section_index == s).sum()),
+            "alpha": _rounded(cronbach_alpha(scores[:, key.section_index == s])),
+        }
+        for s, section_id in enumerate(key.section_ids)
+    ]
+    return {
+        "paper_id": key.paper_id,
+        "exams": n_exams,
+        "answers": len(answers),
+        "mean_score": _rounded(totals.mean()) if n_exams else None,
+        "sd_score": _rounded(totals.std(ddof=1)) if n_exams > 1 else None,
+        "alpha": _rounded(cronbach_alpha(scores)),
+        "sections": sections,
+        "questions": questions,
+    }
+
+
+# (paper_id, schedule_session_id) -> (fingerprint, analysis); an analysis is served until its answers change
+_analyses = LRUCache(max_size=32)
+
+
+class ItemAnalysisService:
+    """Service class for item analysis of papers."""
+
+    @staticmethod
+    async def analyze_paper(paper_id: str, schedule_session_id: str | None = None) -> dict | None:
+        """
+        Item analysis of a paper over all its exams, or those of one session; None when the paper does
+        not exist. Cached until an answer is added, changed or regraded, or the paper is edited.
+        """
+        count, last_updated = await ExamAnswerDAO.get_analysis_fingerprint_async(paper_id, schedule_session_id)
+        fingerprint = (count, last_updated, await paper_cache.version(paper_id))
+        cached = _analyses.get((paper_id, schedule_session_id))
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        key = await get_answer_key(paper_id)
+        if key is None:
+            return None
+        answer_rows = await ExamAnswerDAO.list_for_analysis_async(paper_id, schedule_session_id)
+        options = await QuestionOptionDAO.list_by_paper_async(paper_id)
+        compiled_paper = await paper_cache.get(paper_id)
+        question_seqs = {question_id: seq for (_, seq), question_id in compiled_paper.question_ids.items()} \
+            if compiled_paper is not None else {}
+        # the matrix pass is CPU bound; keep the event loop free while it runs
+        analysis = await asyncio.to_thread(analyze, key, answer_rows, options, question_seqs)
+        _analyses.put((paper_id, schedule_session_id), (fingerprint, analysis))
+        return analysis
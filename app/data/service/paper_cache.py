@@ -0,0 +1,152 @@
+"""In-process cache of compiled, examinee-safe paper content."""
+
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from app.data.dao.paper_dao import PaperDAO, QUESTION_TYPE_FILL_IN_THE_BLANK
+from app.data.dao.paper_section_dao import PaperSectionDAO
+from app.data.dao.question_dao import QuestionDAO
+from app.data.dao.question_option import QuestionOptionDAO
+from app.data.entity.entities import QuestionOption
+from app.util.util import entity_to_dict, to_json_bytes
+from app.util.util_cache import LRUCache, TTLCache
+
+
+@dataclass(frozen=True)
+class CompiledPaper:
+    """
+    Read-only view of one paper version as examinees may see it.
+
+    Questions are pre-serialized: questions_in_section holds the whole response body per paper
+    section, question_fragments the '"question":...,"question_options":...' part of a question
+    response, keyed by (paper_section_id, seq). section_snapshots holds per paper section the JSON list
+    of every question with all its options, section_digests a content hash of it for ETags.
+    """
+    paper_id: str
+    version: datetime | None
+    paper: dict
+    sections: list[dict]
+    question_ids: dict[tuple[str, int], str] = field(default_factory=dict)
+    question_fragments: dict[tuple[str, int], bytes] = field(default_factory=dict)
+    questions_in_section: dict[str, bytes] = field(default_factory=dict)
+    section_snapshots: dict[str, bytes] = field(default_factory=dict)
+    section_digests: dict[str, str] = field(default_factory=dict)
+
+    def section_by_seq(self, seq: int) -> dict | None:
+        return next((section for section in self.sections if section['seq'] == seq), None)
+
+    def section_by_id(self, section_id: str) -> dict | None:
+        return next((section for section in self.sections if section['id'] == section_id), None)
+
+
+def _sanitize_option(option: QuestionOption, question_type: int | None) -> dict:
+    data = entity_to_dict(option)
+    data['is_correct'] = None
+    if question_type == QUESTION_TYPE_FILL_IN_THE_BLANK:
+        # the option content of a blank is its expected answer
+        data['content'] = None
+    else:
+        data['correct_seq'] = None
+    return data
+
+
+class PaperCache:
+    """
+    LRU cache of CompiledPaper keyed by (paper_id, content version).
+
+    The version is the paper row's updated_at, which every paper write bumps, so an edit saved through
+    any worker retires the compiled copies in all of them. It is read from the database at most once
+    per version_ttl seconds per paper; invalidate(), which paper writers call, drops it at once in the
+    writing process. Compilation is single-flight per paper.
+    """
+
+    def __init__(self, max_size: int = 64, version_ttl: float = 1):
+        self._cache = LRUCache(max_size)
+        # paper_id -> (updated_at,); wrapped, since a paper never updated has None
+        self._versions = TTLCache(max_size=max_size * 16, ttl=version_ttl)
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def version(self, paper_id: str) -> datetime | None:
+        cached = self._versions.get(paper_id)
+        if cached is None:
+            cached = (await self._load_version(paper_id),)
+            self._versions.put(paper_id, cached)
+        return cached[0]
+
+    def invalidate(self, paper_id: str):
+        self._versions.pop(paper_id)
+        self._cache.pop_where(lambda key: key[0] == paper_id)
+
+    async def get(self, paper_id: str) -> CompiledPaper | None:
+        key = (paper_id, await self.version(paper_id))
+        compiled = self._cache.get(key)
+        if compiled is not None:
+            return compiled
+        lock = self._locks.setdefault(paper_id, asyncio.Lock())
+        async with lock:
+            key = (paper_id, await self.version(paper_id))
+            compiled = self._cache.get(key)
+            if compiled is None:
+                compiled = await self._compile(paper_id)
+                if compiled is not None:
+                    # the compiled copy may be newer than the version looked up: file it under its own
+                    self._cache.pop_where(lambda cached_key: cached_key[0] == paper_id)
+                    self._cache.put((paper_id, compiled.version), compiled)
+                    self._versions.put(paper_id, (compiled.version,))
+        return compiled
+
+    @staticmethod
+    async def _load_version(paper_id: str) -> datetime | None:
+        return await PaperDAO.get_version_async(paper_id)
+
+    @staticmethod
+    async def _compile(paper_id: str) -> CompiledPaper | None:
+        paper = await PaperDAO().get_async(paper_id)
+        if paper is None or paper.is_deleted:
+            return None
+        sections = await PaperSectionDAO.list_by_paper_async(paper_id)
+        questions = await QuestionDAO.list_by_paper_async(paper_id)
+        options = await QuestionOptionDAO.list_by_paper_async(paper_id)
+
+        options_by_question: dict[str, list[QuestionOption]] = {}
+        for option in options:
+            options_by_question.setdefault(option.question_id, []).append(option)
+
+        compiled = CompiledPaper(
+            paper_id=paper_id,
+            version=paper.updated_at,
+            paper=entity_to_dict(paper),
+            sections=[entity_to_dict(section) for section in sections],
+        )
+        section_questions: dict[str, list[dict]] = {}
+        section_options: dict[str, list[dict]] = {}
+        section_fragments: dict[str, list[bytes]] = {}
+        for question in questions:
+            question_data = entity_to_dict(question)
+            option_data = [_sanitize_option(option, question.question_type)
+                           for option in options_by_question.get(question.id, [])]
+            key = (question.section_id, question.seq)
+            compiled.question_ids[key] = question.id
+            compiled.question_fragments[key] = (b'"question":' + to_json_bytes(question_data)
+                                                + b',"question_options":' + to_json_bytes(option_data))
+            section_questions.setdefault(question.section_id, []).append(question_data)
+            section_fragments.setdefault(question.section_id, []).append(b'{' + compiled.question_fragments[key] + b'}')
+            if question.question_type != QUESTION_TYPE_FILL_IN_THE_BLANK:
+                section_options.setdefault(question.section_id, []).extend(option_data)
+        for section_id, question_data in section_questions.items():
+            compiled.questions_in_section[section_id] = to_json_bytes({
+                "questions": question_data,
+                "question_options": section_options.get(section_id, []),
+            })
+        for section_id, fragments in section_fragments.items():
+            snapshot = b'[' + b','.join(fragments) + b']'
+            compiled.section_snapshots[section_id] = snapshot
+            compiled.section_digests[section_id] = hashlib.md5(snapshot).hexdigest()
+        return compiled
+
+
+paper_cache = PaperCache(max_size=int(os.getenv("PAPER_CACHE_SIZE", "64")),
+                         version_ttl=float(os.getenv("PAPER_VERSION_TTL", "1")))
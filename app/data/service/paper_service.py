@@ -2,22 +2,111 @@
 
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, TextIO
 
-from sqlalchemy import select
+from sqlalchemy import select, insert, update
+from ulid import ULID
 
+from app.data.dao.base_dao import soft_delete_cascade
 from app.data.dao.paper_dao import PaperDAO
 from app.data.dao.paper_section_dao import PaperSectionDAO
-from app.data.dao.question_dao import QuestionDAO
-from app.data.dao.question_option import QuestionOptionDAO
-from app.data.database import db_scalars
+from app.data.database import db_scalars, db_exec_all
 from app.data.dto.paper_dto import PaperDTO
+from app.data.service.grading_service import compile_answer_key, load_answer_key, record_answer_key_change
+from app.data.service.paper_cache import paper_cache
 from app.data.entity.entities import (
     Paper,
     PaperSection,
     Question,
     QuestionOption,
 )
+from app.util.util import md5_encode
+
+
+# columns save_paper_full compares to tell a changed row from an unchanged one
+_SECTION_FIELDS: tuple[str, ...] = ('seq', 'name', 'content', 'duration', 'question_num', 'question_type', 'unit_score',
+                                    'full_score', 'pass_score', 'scoring_policy', 'note')
+_QUESTION_FIELDS: tuple[str, ...] = ('seq', 'code', 'content', 'question_type', 'score', 'section_id')
+_OPTION_FIELDS: tuple[str, ...] = ('code', 'content', 'is_correct', 'correct_seq', 'question_id')
+# paper columns a save only sets when given; scores only when non-zero
+_PAPER_FIELDS: tuple[str, ...] = ('title', 'note', 'paper_type', 'duration', 'question_type', 'scoring_policy')
+_PAPER_SCORE_FIELDS: tuple[str, ...] = ('unit_score', 'full_score', 'pass_score')
+
+
+def _decimal_or_none(value) -> Optional[Decimal]:
+    return Decimal(str(value)) if value else None
+
+
+def _live(rows: list) -> list:
+    return [row for row in rows if row.is_deleted is None]
+
+
+def _content_hash(values: dict, fields: tuple[str, ...]) -> str:
+    # 2.0 and 2.00 are the same score
+    content = tuple(value.normalize() if isinstance(value, Decimal) else value
+                    for value in (values.get(field) for field in fields))
+    return md5_encode(repr(content))
+
+
+class _RowDiff:
+    """
+    The rows of one entity of a saved paper, diffed against the rows already stored. A row is matched by
+    ID, or else by natural key among the live rows; it is only rewritten when its content hash changed
+    or it was soft-deleted. Stored rows no row of the payload matched are soft-deleted.
+    """
+
+    def __init__(self, cls: type, stored: list, fields: tuple[str, ...], natural_key: tuple[str, ...]):
+        self._cls = cls
+        self._fields = fields
+        self._natural_key = natural_key
+        self._by_id = {row.id: row for row in stored}
+        self._by_key = {tuple(getattr(row, field) for field in natural_key): row for row in _live(stored)}
+        self._saved: set[str] = set()
+        self._inserts: list[dict] = []
+        self._updates: list[dict] = []
+
+    def save(self, values: dict) -> str:
+        """Diff one row of the payload and return its ID."""
+        row = self._by_id.get(values["id"]) or self._by_key.get(tuple(values[field] for field in self._natural_key))
+        if row is None or row.id in self._saved:
+            # an ID seen twice in the payload cannot name two rows
+            if values["id"] is None or values["id"] in self._saved:
+                values["id"] = str(ULID())
+            self._inserts.append(values)
+        else:
+            values["id"] = row.id
+            stored = {field: getattr(row, field) for field in self._fields}
+            if row.is_deleted is not None or _content_hash(stored, self._fields) != _content_hash(values, self._fields):
+                self._updates.append(values)
+        self._saved.add(values["id"])
+        return values["id"]
+
+    def statements(self, user_id: str, now: datetime) -> list:
+        """Bulk statements applying the diff: one soft-delete, one multi-row insert and one update by primary key."""
+        cls = self._cls
+        statements = []
+        deleted_ids = [row_id for row_id, row in self._by_id.items()
+                       if row.is_deleted is None and row_id not in self._saved]
+        if deleted_ids:
+            statements.append(update(cls).where(cls.id.in_(deleted_ids))
+                              .values(is_deleted=True, updated_at=now, updated_by=user_id)
+                              .execution_options(synchronize_session=False))
+        if self._inserts:
+            statements.append((insert(cls), [{**values, "created_by": user_id, "created_at": now,
+                                              "updated_by": user_id, "updated_at": now} for values in self._inserts]))
+        if self._updates:
+            statements.append((update(cls), [{**values, "is_deleted": None, "updated_by": user_id, "updated_at": now}
+                                             for values in self._updates]))
+        return statements
+
+
+def _paper_cascade(paper_id: str) -> list:
+    return [
+        (PaperSection, PaperSection.paper_id == paper_id),
+        (Question, Question.paper_id == paper_id),
+        (QuestionOption, QuestionOption.paper_id == paper_id),
+        (Paper, Paper.id == paper_id),
+    ]
 
 
 class PaperService:
@@ -34,6 +123,7 @@ class PaperService:
         note: Optional[str] = None,
         question_type: Optional[int] = None,
         unit_score: Optional[Decimal] = None,
+        scoring_policy: Optional[int] = None,
         created_by: Optional[str] = None,
     ) -> str:
         """Create a new paper and return its ID."""
@@ -47,6 +137,7 @@ class PaperService:
             unit_score=unit_score,
             full_score=full_score,
             pass_score=pass_score,
+            scoring_policy=scoring_policy,
             section_num=0,
             question_num=0,
             created_by=created_by,
@@ -106,6 +197,7 @@ class PaperService:
                 "code": opt.code,
                 "content": opt.content,
                 "is_correct": opt.is_correct,
+                "correct_seq": opt.correct_seq,
             })
 
         questions_by_section = {}
@@ -134,6 +226,7 @@ class PaperService:
                 "unit_score": float(s.unit_score) if s.unit_score else None,
                 "full_score": float(s.full_score) if s.full_score else None,
                 "pass_score": float(s.pass_score) if s.pass_score else None,
+                "scoring_policy": s.scoring_policy,
                 "note": s.note,
                 "questions": questions_by_section.get(s.id, []),
             })
@@ -148,6 +241,7 @@ class PaperService:
             "unit_score": float(paper.unit_score) if paper.unit_score else None,
             "full_score": float(paper.full_score) if paper.full_score else None,
             "pass_score": float(paper.pass_score) if paper.pass_score else None,
+            "scoring_policy": paper.scoring_policy,
             "section_num": paper.section_num,
             "question_num": paper.question_num,
             "sections": sections_data,
@@ -164,12 +258,15 @@ class PaperService:
         unit_score: Optional[Decimal] = None,
         full_score: Optional[Decimal] = None,
         pass_score: Optional[Decimal] = None,
+        scoring_policy: Optional[int] = None,
         updated_by: Optional[str] = None,
     ) -> bool:
         """Update paper metadata. Returns True if successful."""
         paper = PaperDAO().get(paper_id)
         if paper is None:
             return False
+        # a scoring policy change re-keys the paper's questions
+        old_answer_key = load_answer_key(paper_id) if scoring_policy is not None else None
 
         if title is not None:
             paper.title = title
@@ -187,35 +284,36 @@ class PaperService:
             paper.full_score = full_score
         if pass_score is not None:
             paper.pass_score = pass_score
+        if scoring_policy is not None:
+            paper.scoring_policy = scoring_policy
         paper.updated_by = updated_by
 
         PaperDAO.update(paper)
+        paper_cache.invalidate(paper_id)
+        if old_answer_key is not None:
+            record_answer_key_change(old_answer_key, load_answer_key(paper_id))
         return True
 
     @staticmethod
     def delete_paper(paper_id: str, deleted_by: str) -> bool:
-        """Soft-delete a paper and all its contents."""
+        """Soft-delete a paper with its sections, questions and options, in one transaction."""
         paper = PaperDAO().get(paper_id)
         if paper is None:
             return False
 
-        # Soft-delete all child entities
-        sections = PaperSectionDAO.list_by_paper(paper_id)
-        for section in sections:
-            PaperSectionDAO().delete(section.id, deleted_by)
-
-        stmt = select(Question).where(Question.paper_id == paper_id)
-        questions = db_scalars(stmt)
-        for question in questions:
-            QuestionDAO().delete(question.id, deleted_by)
+        soft_delete_cascade(_paper_cascade(paper_id), deleted_by)
+        paper_cache.invalidate(paper_id)
+        return True
 
-        stmt = select(QuestionOption).where(QuestionOption.paper_id == paper_id)
-        options = db_scalars(stmt)
-        for option in options:
-            QuestionOptionDAO().delete(option.id, deleted_by)
+    @staticmethod
+    def restore_paper(paper_id: str, restored_by: str) -> bool:
+        """Restore a deleted paper and what its deletion deleted. Returns False if it is not deleted."""
+        paper = PaperDAO().get(paper_id)
+        if paper is None or not paper.is_deleted or paper.deleted_batch is None:
+            return False
 
-        # Soft-delete the paper itself
-        PaperDAO().delete(paper_id, deleted_by)
+        soft_delete_cascade(_paper_cascade(paper_id), restored_by, restore_of=paper.deleted_batch)
+        paper_cache.invalidate(paper_id)
         return True
 
     @staticmethod
@@ -240,185 +338,159 @@ class PaperService:
     def save_paper_full(paper_data: dict, user_id: str) -> str:
         """
         Save a complete paper with all sections, question groups, questions, and options.
-        This is an upsert operation - create new or update existing based on IDs.
+        The payload is the whole tree: rows are matched to the stored ones by ID, or else by the natural
+        key the DAOs upsert on; changed rows are updated, new rows inserted and stored rows left out of
+        the payload soft-deleted. All of it is written in one transaction.
         """
-        paper_id = paper_data.get("id")
-        is_new = paper_id is None
+        paper_id = paper_data.get("id") or str(ULID())
+        paper = PaperDAO().get(paper_id)
+        sections, questions, options = PaperService._load_tree(paper_id) if paper else ([], [], [])
+        # answer key before the edit, so answers already given to re-keyed questions can be regraded
+        old_answer_key = None
+        if paper and not paper.is_deleted:
+            old_answer_key = compile_answer_key(paper, *(_live(rows) for rows in (sections, questions, options)))
+
+        section_diff = _RowDiff(PaperSection, sections, _SECTION_FIELDS, ("name",))
+        question_diff = _RowDiff(Question, questions, _QUESTION_FIELDS, ("section_id", "seq"))
+        option_diff = _RowDiff(QuestionOption, options, _OPTION_FIELDS, ("question_id", "code"))
+        total_questions = 0
+        for section_data in paper_data.get("sections", []):
+            section_questions = section_data.get("questions", [])
+            section_id = section_diff.save({
+                "id": section_data.get("id"),
+                "seq": section_data.get("seq", 1),
+                "name": section_data.get("name", "Section"),
+                "content": section_data.get("content"),
+                "duration": section_data.get("duration"),
+                "question_num": len(section_questions),
+                "question_type": section_data.get("question_type"),
+                "unit_score": _decimal_or_none(section_data.get("unit_score")),
+                "full_score": _decimal_or_none(section_data.get("full_score")),
+                "pass_score": _decimal_or_none(section_data.get("pass_score")),
+                "scoring_policy": section_data.get("scoring_policy"),
+                "note": section_data.get("note"),
+                "paper_id": paper_id,
+            })
+            total_questions += len(section_questions)
+            for question_data in section_questions:
+                question_id = question_diff.save({
+                    "id": question_data.get("id"),
+                    "seq": question_data.get("seq", 1),
+                    "code": question_data.get("code"),
+                    "content": question_data.get("content"),
+                    "question_type": question_data.get("question_type"),
+                    "score": _decimal_or_none(question_data.get("score")),
+                    "section_id": section_id,
+                    "paper_id": paper_id,
+                })
+                for option_data in question_data.get("options", []):
+                    option_diff.save({
+                        "id": option_data.get("id"),
+                        "code": option_data.get("code", "A"),
+                        "content": option_data.get("content"),
+                        "is_correct": option_data.get("is_correct", False),
+                        "correct_seq": option_data.get("correct_seq"),
+                        "question_id": question_id,
+                        "paper_id": paper_id,
+                    })
 
-        # Create or update paper
-        if is_new:
-            paper_id = PaperService.create_paper(
+        now = datetime.now()
+        paper_values = {
+            "section_num": len(paper_data.get("sections", [])),
+            "question_num": total_questions,
+            "updated_by": user_id,
+            "updated_at": now,
+        }
+        if paper is None:
+            paper_statement = insert(Paper).values(
+                id=paper_id,
                 title=paper_data.get("title", "Untitled"),
+                note=paper_data.get("note"),
                 paper_type=paper_data.get("paper_type"),
                 duration=paper_data.get("duration", 0),
-                full_score=Decimal(str(paper_data.get("full_score", 0))),
-                pass_score=Decimal(str(paper_data.get("pass_score", 0))),
-                note=paper_data.get("note"),
                 question_type=paper_data.get("question_type"),
-                unit_score=Decimal(str(paper_data.get("unit_score", 0))) if paper_data.get("unit_score") else None,
+                unit_score=_decimal_or_none(paper_data.get("unit_score")),
+                full_score=Decimal(str(paper_data.get("full_score") or 0)),
+                pass_score=Decimal(str(paper_data.get("pass_score") or 0)),
+                scoring_policy=paper_data.get("scoring_policy"),
                 created_by=user_id,
+                created_at=now,
+                **paper_values,
             )
         else:
-            # Check if paper actually exists
-            existing_paper = PaperDAO().get(paper_id)
-            if existing_paper:
-                PaperService.update_paper(
-                    paper_id=paper_id,
-                    title=paper_data.get("title"),
-                    note=paper_data.get("note"),
-                    paper_type=paper_data.get("paper_type"),
-                    duration=paper_data.get("duration"),
-                    question_type=paper_data.get("question_type"),
-                    unit_score=Decimal(str(paper_data.get("unit_score"))) if paper_data.get("unit_score") else None,
-                    full_score=Decimal(str(paper_data.get("full_score"))) if paper_data.get("full_score") else None,
-                    pass_score=Decimal(str(paper_data.get("pass_score"))) if paper_data.get("pass_score") else None,
-                    updated_by=user_id,
-                )
-            else:
-                # ID exists but paper doesn't (Upsert case for imports)
-                PaperService.create_paper(
-                    title=paper_data.get("title", "Untitled"),
-                    paper_type=paper_data.get("paper_type"),
-                    duration=paper_data.get("duration", 0),
-                    full_score=Decimal(str(paper_data.get("full_score", 0))),
-                    pass_score=Decimal(str(paper_data.get("pass_score", 0))),
-                    paper_id=paper_id,
-                    note=paper_data.get("note"),
-                    question_type=paper_data.get("question_type"),
-                    unit_score=Decimal(str(paper_data.get("unit_score", 0))) if paper_data.get("unit_score") else None,
-                    created_by=user_id,
-                )
-
-        # Track existing IDs to detect deletions (simplified for now, full sync would need list and diff)
-        existing_section_ids = set()
-        existing_question_ids = set()
-        existing_option_ids = set()
-
-        total_questions = 0
-
-        # Process sections
-        sections = paper_data.get("sections", [])
-        for section_data in sections:
-            section = PaperSection(
-                id=section_data.get("id"),
-                seq=section_data.get("seq", 1),
-                name=section_data.get("name", "Section"),
-                content=section_data.get("content"),
-                duration=section_data.get("duration"),
-                question_type=section_data.get("question_type"),
-                unit_score=Decimal(str(section_data.get("unit_score"))) if section_data.get("unit_score") else None,
-                full_score=Decimal(str(section_data.get("full_score"))) if section_data.get("full_score") else None,
-                pass_score=Decimal(str(section_data.get("pass_score"))) if section_data.get("pass_score") else None,
-                note=section_data.get("note"),
-                paper_id=paper_id,
-                created_by=user_id,
-                updated_by=user_id,
-            )
-            section_id = PaperSectionDAO().add_or_update(section)
-            existing_section_ids.add(section_id)
-
-            # Process questions
-            for question_data in section_data.get("questions", []):
-                total_questions += 1
-                question = Question(
-                    id=question_data.get("id"),
-                    seq=question_data.get("seq", 1),
-                    code=question_data.get("code"),
-                    content=question_data.get("content"),
-                    question_type=question_data.get("question_type"),
-                    score=Decimal(str(question_data.get("score"))) if question_data.get("score") else None,
-                    section_id=section_id,
-                    paper_id=paper_id,
-                    created_by=user_id,
-                    updated_by=user_id,
-                )
-                question_id = QuestionDAO().add_or_update(question)
-                existing_question_ids.add(question_id)
-
-                # Process options
-                for option_data in question_data.get("options", []):
-                    option = QuestionOption(
-                        id=option_data.get("id"),
-                        code=option_data.get("code", "A"),
-                        content=option_data.get("content"),
-                        is_correct=option_data.get("is_correct", False),
-                        correct_seq=option_data.get("correct_seq"),
-                        question_id=question_id,
-                        paper_id=paper_id,
-                        created_by=user_id,
-                        updated_by=user_id,
-                    )
-                    option_id = QuestionOptionDAO().add_or_update(option)
-                    existing_option_ids.add(option_id)
-
-        # Update paper counts
-        paper = PaperDAO().get(paper_id)
-        paper.section_num = len(sections)
-        paper.question_num = total_questions
-        paper.updated_by = user_id
-        PaperDAO.update(paper)
+            # like update_paper: fields missing from the payload keep their value
+            changes = {field: paper_data.get(field) for field in _PAPER_FIELDS if paper_data.get(field) is not None}
+            changes.update({field: _decimal_or_none(paper_data.get(field)) for field in _PAPER_SCORE_FIELDS
+                            if paper_data.get(field)})
+            paper_statement = update(Paper).where(Paper.id == paper_id).values(**changes, **paper_values)
+
+        db_exec_all(paper_statement,
+                    *section_diff.statements(user_id, now),
+                    *question_diff.statements(user_id, now),
+                    *option_diff.statements(user_id, now))
+        paper_cache.invalidate(paper_id)
+        if old_answer_key is not None:
+            record_answer_key_change(old_answer_key, load_answer_key(paper_id))
 
         return paper_id
 
     @staticmethod
-    def import_from_markdown(md_content: str, user_id: str) -> str:
-        """Import a paper from markdown content. Returns the paper ID."""
-        import tempfile
-        import os
-
-        # Write content to a temp file for the existing parser
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-            f.write(md_content)
-            temp_path = f.name
-
-        try:
-            paper_dto = PaperDTO().md_parse(temp_path)
-
-            # Convert to the format expected by save_paper_full
-            sections_data = []
-            for section_dto in paper_dto.sections:
-                questions_data = []
-                for question_dto in section_dto.questions:
-                    options_data = []
-                    for opt_dto in question_dto.question_options:
-                        options_data.append({
-                            "code": opt_dto.code,
-                            "content": opt_dto.content,
-                            "is_correct": opt_dto.is_correct,
-                        })
-                    questions_data.append({
-                        "seq": question_dto.seq,
-                        "content": question_dto.content,
-                        "question_type": question_dto.question_type,
-                        "score": float(question_dto.score) if question_dto.score else None,
-                        "options": options_data,
+    def _load_tree(paper_id: str) -> tuple[list[PaperSection], list[Question], list[QuestionOption]]:
+        """Every section, question and option of a paper, soft-deleted ones included."""
+        return (
+            db_scalars(select(PaperSection).where(PaperSection.paper_id == paper_id)),
+            db_scalars(select(Question).where(Question.paper_id == paper_id)),
+            db_scalars(select(QuestionOption).where(QuestionOption.paper_id == paper_id)),
+        )
+
+    @staticmethod
+    def import_from_markdown(md_content: str | TextIO, user_id: str) -> str:
+        """Import a paper from markdown text or a text stream. Returns the paper ID."""
+        paper_dto = PaperDTO().md_parse_content(md_content)
+
+        # Convert to the format expected by save_paper_full
+        sections_data = []
+        for section_dto in paper_dto.sections:
+            questions_data = []
+            for question_dto in section_dto.questions:
+                options_data = []
+                for opt_dto in question_dto.question_options:
+                    options_data.append({
+                        "code": opt_dto.code,
+                        "content": opt_dto.content,
+                        "is_correct": opt_dto.is_correct,
                     })
-                sections_data.append({
-                    "seq": section_dto.seq,
-                    "name": section_dto.name,
-                    "content": section_dto.content,
-                    "duration": section_dto.duration,
-                    "question_type": section_dto.question_type,
-                    "unit_score": float(section_dto.unit_score) if section_dto.unit_score else None,
-                    "full_score": float(section_dto.full_score) if section_dto.full_score else None,
-                    "pass_score": float(section_dto.pass_score) if section_dto.pass_score else None,
-                    "note": section_dto.note,
-                    "questions": questions_data,
+                questions_data.append({
+                    "seq": question_dto.seq,
+                    "content": question_dto.content,
+                    "question_type": question_dto.question_type,
+                    "score": float(question_dto.score) if question_dto.score else None,
+                    "options": options_data,
                 })
+            sections_data.append({
+                "seq": section_dto.seq,
+                "name": section_dto.name,
+                "content": section_dto.content,
+                "duration": section_dto.duration,
+                "question_type": section_dto.question_type,
+                "unit_score": float(section_dto.unit_score) if section_dto.unit_score else None,
+                "full_score": float(section_dto.full_score) if section_dto.full_score else None,
+                "pass_score": float(section_dto.pass_score) if section_dto.pass_score else None,
+                "note": section_dto.note,
+                "questions": questions_data,
+            })
 
-            paper_data = {
-                "id": paper_dto.paper_id,
-                "title": paper_dto.title,
-                "note": paper_dto.note,
-                "paper_type": paper_dto.paper_type,
-                "duration": paper_dto.duration,
-                "question_type": paper_dto.question_type,
-                "unit_score": float(paper_dto.unit_score) if paper_dto.unit_score else None,
-                "full_score": float(paper_dto.full_score) if paper_dto.full_score else None,
-                "pass_score": float(paper_dto.pass_score) if paper_dto.pass_score else None,
-                "sections": sections_data,
-            }
+        paper_data = {
+            "id": paper_dto.paper_id,
+            "title": paper_dto.title,
+            "note": paper_dto.note,
+            "paper_type": paper_dto.paper_type,
+            "duration": paper_dto.duration,
+            "question_type": paper_dto.question_type,
+            "unit_score": float(paper_dto.unit_score) if paper_dto.unit_score else None,
+            "full_score": float(paper_dto.full_score) if paper_dto.full_score else None,
+            "pass_score": float(paper_dto.pass_score) if paper_dto.pass_score else None,
+            "sections": sections_data,
+        }
 
-            return PaperService.save_paper_full(paper_data, user_id)
-        finally:
-            os.unlink(temp_path)
+        return PaperService.save_paper_full(paper_data, user_id)
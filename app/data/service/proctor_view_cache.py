@@ -0,0 +1,40 @@
+"""Short-lived cache of the proctor's live view of a schedule session."""
+
+import asyncio
+import os
+
+from app.data.dao.exam_dao import ExamDAO
+from app.util.util_cache import TTLCache
+
+
+class ProctorViewCache:
+    """
+    Micro-cache of the exam rows of a session's proctor view, keyed by schedule session id.
+
+    Entries live for a second or two, so proctors refreshing the same session during a sitting share
+    one query per ttl instead of each running it. Loading is single-flight per session: concurrent
+    misses wait for the one query in flight. Rows may be up to ttl seconds old.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 1):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, schedule_session_id: str):
+        self._cache.pop(schedule_session_id)
+
+    async def get(self, schedule_session_id: str) -> list[dict]:
+        exams = self._cache.get(schedule_session_id)
+        if exams is not None:
+            return exams
+        lock = self._locks.setdefault(schedule_session_id, asyncio.Lock())
+        async with lock:
+            exams = self._cache.get(schedule_session_id)
+            if exams is None:
+                rows = await ExamDAO.list_in_schedule_session_for_proctor_async(schedule_session_id)
+                exams = [row._asdict() for row in rows]
+                self._cache.put(schedule_session_id, exams)
+        return exams
+
+
+proctor_view_cache = ProctorViewCache(ttl=float(os.getenv("PROCTOR_VIEW_CACHE_TTL", "1")))
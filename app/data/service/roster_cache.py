@@ -0,0 +1,142 @@
+"""In-process login index of the rosters of ready schedule sessions."""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_CLOSED
+from app.util.util import entity_to_dict
+
+# a session found not ready is looked up again after this many seconds
+NOT_READY_RETRY_SECONDS: float = 60
+
+_USER_SECRET_FIELDS = ('password', 'pwd')
+
+
+def _user_data(user) -> dict:
+    user_data = entity_to_dict(user)
+    for field in _USER_SECRET_FIELDS:
+        user_data.pop(field, None)
+    return user_data
+
+
+@dataclass
+class RosterEntry:
+    """One examinee of a ready session: user and exam as login returns them."""
+    schedule_session_id: str
+    plan_start: datetime | None
+    user: dict
+    exam: dict
+
+
+class RosterCache:
+    """
+    Index of ready sessions' rosters keyed by examinee email and enroll number, so that login during
+    an exam-start storm is a dictionary hit.
+
+    A session is warmed up when it is marked ready, or lazily by the first login that misses it.
+    Roster changes invalidate the session. Exam status changes made by examinee endpoints are applied
+    through set_exam_status(). The index is per process and other workers' writes never reach it, so a
+    hit is only a candidate: lookup() re-reads that exam's roster row by primary key and drops the entry
+    when the exam was closed, removed or its session is no longer ready.
+    """
+
+    def __init__(self):
+        self._by_login: dict[tuple[str, str], dict[str, RosterEntry]] = {}
+        self._by_exam: dict[str, RosterEntry] = {}
+        self._sessions: dict[str, list[RosterEntry]] = {}
+        self._not_ready: dict[str, float] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _login_key(login: str) -> tuple[str, str]:
+        return ('email', login) if login.find("@") >= 0 else ('enroll_number', login)
+
+    def is_warm(self, schedule_session_id: str) -> bool:
+        if schedule_session_id in self._sessions:
+            return True
+        checked_at = self._not_ready.get(schedule_session_id)
+        return checked_at is not None and time.monotonic() - checked_at < NOT_READY_RETRY_SECONDS
+
+    async def lookup(self, login: str) -> RosterEntry | None:
+        """
+        The unclosed exam with the earliest plan start of a login, refreshed from the database, or None
+        when not indexed or no longer valid.
+        """
+        login_key = self._login_key(login)
+        entries = [entry for entry in self._by_login.get(login_key, {}).values()
+                   if entry.exam['status'] != EXAM_STATUS_CLOSED]
+        if not entries:
+            return None
+        entry = min(entries, key=lambda entry: entry.plan_start or datetime.max)
+        row = await ExamDAO.get_roster_row_async(entry.exam['id'])
+        if row is None or getattr(row[0], login_key[0]) != login:
+            self._drop(entry)
+            return None
+        user, exam, plan_start = row
+        entry.user, entry.exam, entry.plan_start = _user_data(user), entity_to_dict(exam), plan_start
+        return entry
+
+    def set_exam_status(self, exam_id: str, status: int):
+        entry = self._by_exam.get(exam_id)
+        if entry is not None:
+            entry.exam['status'] = status
+
+    def _unindex(self, entry: RosterEntry):
+        self._by_exam.pop(entry.exam['id'], None)
+        for key in (('email', entry.user['email']), ('enroll_number', entry.user['enroll_number'])):
+            by_session = self._by_login.get(key)
+            if by_session is not None and by_session.get(entry.schedule_session_id) is entry:
+                del by_session[entry.schedule_session_id]
+                if not by_session:
+                    del self._by_login[key]
+
+    def _drop(self, entry: RosterEntry):
+        """Forget one exam found stale, leaving the rest of its session indexed."""
+        self._unindex(entry)
+        entries = self._sessions.get(entry.schedule_session_id)
+        if entries is not None and entry in entries:
+            entries.remove(entry)
+
+    def invalidate(self, schedule_session_id: str):
+        self._not_ready.pop(schedule_session_id, None)
+        for entry in self._sessions.pop(schedule_session_id, []):
+            self._unindex(entry)
+
+    def _load(self, schedule_session_id: str, rows) -> int:
+        self.invalidate(schedule_session_id)
+        if not rows:
+            self._not_ready[schedule_session_id] = time.monotonic()
+            return 0
+        entries = []
+        for user, exam, plan_start in rows:
+            entry = RosterEntry(schedule_session_id, plan_start, _user_data(user), entity_to_dict(exam))
+            entries.append(entry)
+            self._by_exam[exam.id] = entry
+            for key in (('email', user.email), ('enroll_number', user.enroll_number)):
+                if key[1]:
+                    self._by_login.setdefault(key, {})[schedule_session_id] = entry
+        self._sessions[schedule_session_id] = entries
+        return len(entries)
+
+    def warm_up(self, schedule_session_id: str) -> int:
+        """(Re)load a session's roster; returns the number of exams indexed, 0 when the session is not ready."""
+        return self._load(schedule_session_id, ExamDAO.list_roster(schedule_session_id))
+
+    async def warm_up_async(self, schedule_session_id: str) -> int:
+        lock = self._locks.setdefault(schedule_session_id, asyncio.Lock())
+        async with lock:
+            if self.is_warm(schedule_session_id):
+                return len(self._sessions.get(schedule_session_id, []))
+            return self._load(schedule_session_id, await ExamDAO.list_roster_async(schedule_session_id))
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "exams": len(self._by_exam),
+            "logins": len(self._by_login),
+        }
+
+
+roster_cache = RosterCache()
@@ -1,11 +1,15 @@
 """Schedule service for CRUD operations on exam schedules and sessions."""
 
+import itertools
+import os
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional, List
+from typing import Optional, List, BinaryIO
 
 from sqlalchemy import select
+from ulid import ULID
 
+from app.data.dao.base_dao import soft_delete_cascade
 from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_NOT_STARTED
 from app.data.dao.schedule_dao import ScheduleDAO
 from app.data.dao.schedule_section_dao import ScheduleSectionDAO
@@ -19,6 +23,48 @@ from app.data.entity.entities import (
     ScheduleSession,
     Users,
 )
+from app.data.service.exam_event_service import invalidate_schedule_sections
+from app.data.service.roster_cache import roster_cache
+from app.data.service.session_monitor import session_monitor
+from app.util.util import to_json_bytes
+from app.util.util_cache import TTLCache
+from app.util.util_sheet import iter_sheet_rows, chunked
+
+# emails read from an uploaded roster and assigned per round of queries
+ASSIGN_CHUNK_ROWS: int = 5000
+
+# (schedule_id, students_offset, students_limit) -> serialized get_schedule_full. Schedule, session, section
+# and roster writes invalidate a schedule; exam statuses, which change during a sitting, may lag by the ttl.
+schedule_cache = TTLCache(max_size=256, ttl=float(os.getenv("SCHEDULE_CACHE_TTL", "30")))
+
+
+def invalidate_schedule(schedule_id: Optional[str]):
+    if schedule_id:
+        schedule_cache.pop_where(lambda key: key[0] == schedule_id)
+
+
+def _invalidate_session(session_id: str):
+    roster_cache.invalidate(session_id)
+    session_monitor.invalidate(session_id)
+    invalidate_schedule_sections(session_id)
+
+
+def _schedule_cascade(schedule_id: str) -> list:
+    session_ids = select(ScheduleSession.id).where(ScheduleSession.schedule_id == schedule_id)
+    return [
+        (ScheduleSection, ScheduleSection.schedule_session_id.in_(session_ids)),
+        (Exam, Exam.schedule_session_id.in_(session_ids)),
+        (ScheduleSession, ScheduleSession.schedule_id == schedule_id),
+        (Schedule, Schedule.id == schedule_id),
+    ]
+
+
+def _session_cascade(session_id: str) -> list:
+    return [
+        (ScheduleSection, ScheduleSection.schedule_session_id == session_id),
+        (Exam, Exam.schedule_session_id == session_id),
+        (ScheduleSession, ScheduleSession.id == session_id),
+    ]
 
 
 class ScheduleService:
@@ -39,67 +85,41 @@ class ScheduleService:
         return ScheduleDAO().get(schedule_id)
 
     @staticmethod
-    def get_schedule_full(schedule_id: str) -> dict:
-        """Get a schedule with all sessions and sections."""
+    def get_schedule_full(schedule_id: str, students_offset: int = 0, students_limit: Optional[int] = None) -> dict:
+        """
+        Get a schedule with all sessions, sections and students, in three queries whatever the number
+        of sessions. Students are ordered by enroll number; students_offset/students_limit page them
+        per session, and student_count is each session's total.
+        """
         schedule = ScheduleDAO().get(schedule_id)
         if schedule is None:
             return {}
 
-        # Get all sessions for this schedule
-        stmt = (
-            select(ScheduleSession)
-            .where(
-                ScheduleSession.schedule_id == schedule_id,
-                ScheduleSession.is_deleted.is_(None),
-            )
-            .order_by(ScheduleSession.plan_start)
-        )
-        sessions = db_scalars(stmt)
-
-        sessions_data = []
-        for session in sessions:
-            # Get sections for this session
-            stmt = (
-                select(ScheduleSection)
-                .where(
-                    ScheduleSection.schedule_session_id == session.id,
-                    ScheduleSection.is_deleted.is_(None),
-                )
-                .order_by(ScheduleSection.seq)
-            )
-            sections = db_scalars(stmt)
-
-            # Get exams (students) for this session
-            stmt = (
-                select(Exam)
-                .where(
-                    Exam.schedule_session_id == session.id,
-                    Exam.is_deleted.is_(None),
-                )
-            )
-            exams = db_scalars(stmt)
-
-            sections_data = [
-                {
+        sessions = ScheduleSessionDAO.list_by_schedule(schedule_id)
+        session_ids = [session.id for session in sessions]
+        sections_by_session: dict[str, list[dict]] = {session_id: [] for session_id in session_ids}
+        students_by_session: dict[str, list[dict]] = {session_id: [] for session_id in session_ids}
+        student_counts: dict[str, int] = {}
+        if session_ids:
+            for s in ScheduleSectionDAO.list_by_sessions(session_ids):
+                sections_by_session[s.schedule_session_id].append({
                     "id": s.id,
                     "seq": s.seq,
                     "plan_start_early": s.plan_start_early.isoformat() if s.plan_start_early else None,
                     "plan_start_late": s.plan_start_late.isoformat() if s.plan_start_late else None,
-                }
-                for s in sections
-            ]
-
-            students_data = [
-                {
-                    "exam_id": e.id,
-                    "email": e.examinee_email,
-                    "enroll_number": e.examinee_enroll_number,
-                    "status": e.status,
-                }
-                for e in exams
-            ]
-
-            sessions_data.append({
+                })
+            for e in ExamDAO.list_students_by_sessions(session_ids, students_offset, students_limit):
+                student_counts[e.schedule_session_id] = e.total
+                if e.rn > students_offset:
+                    students_by_session[e.schedule_session_id].append({
+                        "exam_id": e.id,
+                        "email": e.examinee_email,
+                        "enroll_number": e.examinee_enroll_number,
+                        "status": e.status,
+                    })
+
+        sessions_data = [
+            {
                 "id": session.id,
                 "title": session.title,
                 "plan_start": session.plan_start.isoformat() if session.plan_start else None,
@@ -109,9 +129,12 @@ class ScheduleService:
                 "proctor_email": session.proctor_email,
                 "proctor_id": session.proctor_id,
                 "paper_id": session.paper_id,
-                "sections": sections_data,
-                "students": students_data,
-            })
+                "sections": sections_by_session[session.id],
+                "students": students_by_session[session.id],
+                "student_count": student_counts.get(session.id, 0),
+            }
+            for session in sessions
+        ]
 
         return {
             "id": schedule.id,
@@ -120,6 +143,20 @@ class ScheduleService:
             "sessions": sessions_data,
         }
 
+    @staticmethod
+    def get_schedule_full_json(schedule_id: str, students_offset: int = 0,
+                               students_limit: Optional[int] = None) -> Optional[bytes]:
+        """get_schedule_full serialized, served from schedule_cache; None when the schedule does not exist."""
+        key = (schedule_id, students_offset, students_limit)
+        body = schedule_cache.get(key)
+        if body is None:
+            schedule = ScheduleService.get_schedule_full(schedule_id, students_offset, students_limit)
+            if not schedule:
+                return None
+            body = to_json_bytes(schedule)
+            schedule_cache.put(key, body)
+        return body
+
     @staticmethod
     def update_schedule(
         schedule_id: str,
@@ -137,23 +174,33 @@ class ScheduleService:
         schedule.updated_at = datetime.now()
 
         ScheduleDAO.update(schedule)
+        invalidate_schedule(schedule_id)
         return True
 
     @staticmethod
     def delete_schedule(schedule_id: str, deleted_by: str) -> bool:
-        """Soft-delete a schedule and all its contents."""
+        """Soft-delete a schedule with its sessions, their sections and exams, in one transaction."""
         schedule = ScheduleDAO().get(schedule_id)
         if schedule is None:
             return False
 
-        # Soft-delete all sessions
-        stmt = select(ScheduleSession).where(ScheduleSession.schedule_id == schedule_id)
-        sessions = db_scalars(stmt)
-        for session in sessions:
-            ScheduleService.delete_session(session.id, deleted_by)
+        soft_delete_cascade(_schedule_cascade(schedule_id), deleted_by)
+        for session_id in db_scalars(select(ScheduleSession.id).where(ScheduleSession.schedule_id == schedule_id)):
+            _invalidate_session(session_id)
+        invalidate_schedule(schedule_id)
+        return True
 
-        # Soft-delete the schedule itself
-        ScheduleDAO().delete(schedule_id, deleted_by)
+    @staticmethod
+    def restore_schedule(schedule_id: str, restored_by: str) -> bool:
+        """Restore a deleted schedule and what its deletion deleted. Returns False if it is not deleted."""
+        schedule = ScheduleDAO().get(schedule_id)
+        if schedule is None or not schedule.is_deleted or schedule.deleted_batch is None:
+            return False
+
+        soft_delete_cascade(_schedule_cascade(schedule_id), restored_by, restore_of=schedule.deleted_batch)
+        for session_id in db_scalars(select(ScheduleSession.id).where(ScheduleSession.schedule_id == schedule_id)):
+            _invalidate_session(session_id)
+        invalidate_schedule(schedule_id)
         return True
 
     @staticmethod
@@ -213,7 +260,11 @@ class SessionService:
             schedule_id=schedule_id,
             created_by=created_by,
         )
-        return ScheduleSessionDAO().add(session)
+        session_id = ScheduleSessionDAO().add(session)
+        if is_ready:
+            roster_cache.warm_up(session_id)
+        invalidate_schedule(schedule_id)
+        return session_id
 
     @staticmethod
     def update_session(
@@ -254,29 +305,37 @@ class SessionService:
         session.updated_at = datetime.now()
 
         ScheduleSessionDAO.update(session)
+        # a ready session gets its login index (re)built now, before examinees arrive
+        if session.is_ready:
+            roster_cache.warm_up(session_id)
+        else:
+            roster_cache.invalidate(session_id)
+        invalidate_schedule_sections(session_id)
+        invalidate_schedule(session.schedule_id)
         return True
 
     @staticmethod
     def delete_session(session_id: str, deleted_by: str) -> bool:
-        """Soft-delete a session and all its contents."""
+        """Soft-delete a session with its sections and exams, in one transaction."""
         session = ScheduleSessionDAO().get(session_id)
         if session is None:
             return False
 
-        # Soft-delete all sections
-        stmt = select(ScheduleSection).where(ScheduleSection.schedule_session_id == session_id)
-        sections = db_scalars(stmt)
-        for section in sections:
-            ScheduleSectionDAO().delete(section.id, deleted_by)
+        soft_delete_cascade(_session_cascade(session_id), deleted_by)
+        _invalidate_session(session_id)
+        invalidate_schedule(session.schedule_id)
+        return True
 
-        # Soft-delete all exams
-        stmt = select(Exam).where(Exam.schedule_session_id == session_id)
-        exams = db_scalars(stmt)
-        for exam in exams:
-            ExamDAO().delete(exam.id, deleted_by)
+    @staticmethod
+    def restore_session(session_id: str, restored_by: str) -> bool:
+        """Restore a deleted session and what its deletion deleted. Returns False if it is not deleted."""
+        session = ScheduleSessionDAO().get(session_id)
+        if session is None or not session.is_deleted or session.deleted_batch is None:
+            return False
 
-        # Soft-delete the session
-        ScheduleSessionDAO().delete(session_id, deleted_by)
+        soft_delete_cascade(_session_cascade(session_id), restored_by, restore_of=session.deleted_batch)
+        _invalidate_session(session_id)
+        invalidate_schedule(session.schedule_id)
         return True
 
     @staticmethod
@@ -288,45 +347,99 @@ class SessionService:
         """
         Assign students to a session by email.
         Returns dict with 'assigned' count and 'errors' list for invalid emails.
+        Users and existing exams are looked up with one query each and new exams are bulk inserted.
+        """
+        session = ScheduleSessionDAO().get(session_id)
+        if session is None:
+            return {"assigned": 0, "errors": ["Session not found"]}
+
+        result = SessionService._assign_students(session, student_emails, created_by)
+        if result["assigned"]:
+            SessionService._roster_changed(session)
+        return result
+
+    @staticmethod
+    def assign_students_from_file(
+        session_id: str,
+        file: BinaryIO,
+        filename: str,
+        created_by: Optional[str] = None,
+    ) -> dict:
+        """
+        Assign the students listed in a CSV or XLSX file, read and assigned ASSIGN_CHUNK_ROWS emails at a time.
+        Emails come from the column headed 'email', or from the first column when there is no such header.
         """
         session = ScheduleSessionDAO().get(session_id)
         if session is None:
             return {"assigned": 0, "errors": ["Session not found"]}
 
+        rows = iter_sheet_rows(file, filename)
+        first = next(rows, None)
+        if first is None:
+            return {"assigned": 0, "errors": []}
+        header = [str(value).strip().lower() if value is not None else '' for value in first]
+        column = header.index('email') if 'email' in header else 0
+        if 'email' not in header:
+            rows = itertools.chain([first], rows)
+        emails = (str(row[column]) for row in rows if len(row) > column and row[column] is not None)
+
         assigned = 0
         errors = []
+        for chunk in chunked(emails, ASSIGN_CHUNK_ROWS):
+            result = SessionService._assign_students(session, chunk, created_by)
+            assigned += result["assigned"]
+            errors.extend(result["errors"])
+        if assigned:
+            SessionService._roster_changed(session)
+        return {"assigned": assigned, "errors": errors}
 
-        for email in student_emails:
-            email = email.strip()
-            if not email:
-                continue
+    @staticmethod
+    def _assign_students(session: ScheduleSession, student_emails: List[str], created_by: Optional[str]) -> dict:
+        emails = [email.strip() for email in student_emails if email and email.strip()]
+        users = {user.email: user for user in UserDAO.list_by_emails(list(set(emails)))} if emails else {}
+        exams = ExamDAO.map_examinee_exams(session.id)
 
-            user = UserDAO.get_by_email(email)
+        now = datetime.now()
+        errors = []
+        rows = []
+        restore_ids = []
+        for email in emails:
+            user = users.get(email)
             if user is None:
                 errors.append(f"User not found: {email}")
                 continue
-
-            # Check if exam already exists for this user in this session
-            existing_exam = ExamDAO.get_by_session_examinee(session_id, email)
-            if existing_exam:
+            exam_id, is_live = exams.get(email, (None, False))
+            if is_live:
                 errors.append(f"Already assigned: {email}")
                 continue
+            if exam_id is not None:
+                # a removed student gets their exam back rather than a second one
+                exams[email] = (exam_id, True)
+                restore_ids.append(exam_id)
+                continue
+            exams[email] = (None, True)
+            rows.append({
+                "id": str(ULID()),
+                "status": EXAM_STATUS_NOT_STARTED,
+                "examinee_enroll_number": user.enroll_number,
+                "examinee_email": email,
+                "examinee_id": user.id,
+                "schedule_session_id": session.id,
+                "schedule_id": session.schedule_id,
+                "paper_id": session.paper_id,
+                "created_by": created_by,
+                "created_at": now,
+                "updated_by": created_by,
+                "updated_at": now,
+            })
+        if rows or restore_ids:
+            ExamDAO.add_many(rows, restore_ids, created_by)
+        return {"assigned": len(rows) + len(restore_ids), "errors": errors}
 
-            # Create exam for this student
-            exam = Exam(
-                status=EXAM_STATUS_NOT_STARTED,
-                examinee_enroll_number=user.enroll_number,
-                examinee_email=email,
-                examinee_id=user.id,
-                schedule_session_id=session_id,
-                schedule_id=session.schedule_id,
-                paper_id=session.paper_id,
-                created_by=created_by,
-            )
-            ExamDAO().add(exam)
-            assigned += 1
-
-        return {"assigned": assigned, "errors": errors}
+    @staticmethod
+    def _roster_changed(session: ScheduleSession):
+        _invalidate_session(session.id)
+        invalidate_schedule(session.schedule_id)
 
     @staticmethod
     def remove_student(session_id: str, student_email: str, deleted_by: str) -> bool:
@@ -335,11 +448,14 @@ class SessionService:
         if user is None:
             return False
 
-        exam = ExamDAO.get_by_session_examinee(session_id, user.id)
+        exam = ExamDAO.get_by_session_examinee(session_id, user.email)
         if exam is None:
             return False
 
         ExamDAO().delete(exam.id, deleted_by)
+        roster_cache.invalidate(session_id)
+        session_monitor.invalidate(session_id)
+        invalidate_schedule(exam.schedule_id)
         return True
 
     @staticmethod
@@ -358,4 +474,9 @@ class SessionService:
             schedule_session_id=session_id,
             created_by=created_by,
         )
-        return ScheduleSectionDAO().add(section)
+        section_id = ScheduleSectionDAO().add(section)
+        invalidate_schedule_sections(session_id)
+        session = ScheduleSessionDAO().get(session_id)
+        if session is not None:
+            invalidate_schedule(session.schedule_id)
+        return section_id
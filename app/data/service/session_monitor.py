@@ -0,0 +1,388 @@
+"""In-process live state of schedule sessions for the proctor dashboard: counters and an exam row feed."""
+
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator
+
+from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_NOT_STARTED, EXAM_STATUS_IN_PREPARATION, \
+    EXAM_STATUS_IN_EXAM, EXAM_STATUS_CLOSED
+from app.data.dao.schedule_session_dao import ScheduleSessionDAO
+from app.util.util_event import event_hub, format_sse
+
+logger = logging.getLogger(__name__)
+
+EVENT_SNAPSHOT: str = "snapshot"
+EVENT_EXAM: str = "exam"
+
+# changed rows kept per session for resuming streams, and seconds between keep-alives of an idle stream
+FEED_BUFFER_SIZE: int = int(os.getenv("SESSION_FEED_BUFFER_SIZE", "1024"))
+FEED_KEEPALIVE_SECONDS: float = float(os.getenv("SESSION_FEED_KEEPALIVE_SECONDS", "15"))
+
+_STATUS_NAMES = {
+    EXAM_STATUS_NOT_STARTED: "not_started",
+    EXAM_STATUS_IN_PREPARATION: "in_preparation",
+    EXAM_STATUS_IN_EXAM: "in_exam",
+    EXAM_STATUS_CLOSED: "closed",
+}
+
+# row fields whose change a rebuild reports; timestamps of the same transition differ between memory and database
+_ROW_STATE_FIELDS = ("examinee", "status", "section_seq", "section", "section_status")
+
+
+def proctor_channel(schedule_session_id: str) -> str:
+    return f"proctor:{schedule_session_id}"
+
+
+@dataclass
+class SectionActivity:
+    """Last known state of one exam section."""
+    seq: int
+    name: str | None = None
+    status: int = EXAM_STATUS_NOT_STARTED
+    actual_start: datetime | None = None
+    actual_end: datetime | None = None
+    is_timeout: bool = False
+
+
+@dataclass
+class ExamActivity:
+    """Last known state of one exam and its sections."""
+    exam_id: str
+    status: int
+    examinee: str | None = None
+    actual_start: datetime | None = None
+    actual_end: datetime | None = None
+    section_seq: int | None = None
+    sections: dict[int, SectionActivity] = field(default_factory=dict)
+    section_ids: dict[str, int] = field(default_factory=dict)
+    last_activity: datetime | None = None
+
+    def row(self) -> dict:
+        """The exam's row of the proctor view."""
+        section = self.sections.get(self.section_seq)
+        return {
+            "exam_id": self.exam_id,
+            "examinee": self.examinee,
+            "status": self.status,
+            "actual_start": self.actual_start,
+            "actual_end": self.actual_end,
+            "section_seq": self.section_seq,
+            "section": section.name if section else None,
+            "section_status": section.status if section else None,
+            "section_start": section.actual_start if section else None,
+            "section_end": section.actual_end if section else None,
+            "last_activity": self.last_activity,
+        }
+
+
+class SessionSummary:
+    """
+    Live state of one session: the exam rows of the proctor view and counters kept in step with them
+    (exams by status, started and closed exams per section, timed-out sections, last activity). Every
+    change moves a count from the old state to the new one, so applying the same transition twice is
+    harmless.
+
+    Once publishing, each changed row gets the next version, is kept in a ring buffer of recent rows and
+    is published on the session's proctor channel.
+    """
+
+    def __init__(self, schedule_session_id: str, buffer_size: int = FEED_BUFFER_SIZE):
+        self.schedule_session_id = schedule_session_id
+        self.exams: dict[str, ExamActivity] = {}
+        self.by_status: Counter[int] = Counter()
+        self.by_section: dict[int, Counter[int]] = {}
+        self.timeouts = 0
+        self.last_activity: datetime | None = None
+        self.loaded_at = time.monotonic()
+        self.expired = False
+        self.version = 0
+        self.recent: deque[tuple[int, dict]] = deque(maxlen=buffer_size)
+        self.publishing = False
+
+    def _touch(self, exam: ExamActivity, at: datetime | None):
+        if at is None:
+            return
+        if exam.last_activity is None or at > exam.last_activity:
+            exam.last_activity = at
+        if self.last_activity is None or at > self.last_activity:
+            self.last_activity = at
+
+    def publish(self, row: dict):
+        self.version += 1
+        self.recent.append((self.version, row))
+        event_hub.publish(proctor_channel(self.schedule_session_id), EVENT_EXAM, (self.version, row))
+
+    def _changed(self, exam: ExamActivity):
+        if self.publishing:
+            self.publish(exam.row())
+
+    def add_exam(self, exam_id: str, status: int | None, at: datetime | None, examinee: str | None = None,
+                 actual_start: datetime | None = None, actual_end: datetime | None = None) -> ExamActivity:
+        exam = ExamActivity(exam_id, status or EXAM_STATUS_NOT_STARTED, examinee, actual_start, actual_end)
+        self.exams[exam_id] = exam
+        self.by_status[exam.status] += 1
+        self._touch(exam, at)
+        self._changed(exam)
+        return exam
+
+    def set_exam_status(self, exam: ExamActivity, status: int, at: datetime | None):
+        if status != exam.status:
+            self.by_status[exam.status] -= 1
+            self.by_status[status] += 1
+            exam.status = status
+            if status == EXAM_STATUS_CLOSED:
+                exam.actual_end = at
+        self._touch(exam, at)
+        self._changed(exam)
+
+    def set_section_status(self, exam: ExamActivity, seq: int, status: int, at: datetime | None,
+                           section_id: str | None = None, name: str | None = None,
+                           actual_start: datetime | None = None, actual_end: datetime | None = None,
+                           is_timeout: bool = False):
+        if section_id is not None:
+            exam.section_ids[section_id] = seq
+        counts = self.by_section.setdefault(seq, Counter())
+        section = exam.sections.get(seq)
+        if section is None:
+            section = exam.sections[seq] = SectionActivity(seq, status=status)
+            counts[status] += 1
+        elif section.status != status:
+            counts[section.status] -= 1
+            counts[status] += 1
+            section.status = status
+        section.name = name or section.name
+        section.actual_start = actual_start or section.actual_start
+        section.actual_end = actual_end or section.actual_end
+        if status == EXAM_STATUS_IN_EXAM and section.actual_start is None:
+            section.actual_start = at
+        elif status == EXAM_STATUS_CLOSED and section.actual_end is None:
+            section.actual_end = at
+        if is_timeout and not section.is_timeout:
+            section.is_timeout = True
+            self.timeouts += 1
+        if exam.section_seq is None or seq >= exam.section_seq:
+            exam.section_seq = seq
+        self._touch(exam, at)
+        self._changed(exam)
+
+    def rows(self) -> list[dict]:
+        return [exam.row() for exam in self.exams.values()]
+
+    def since(self, version: int) -> list[tuple[int, dict]] | None:
+        """Rows changed after a version, or None when the ring buffer no longer reaches back to it."""
+        if version == self.version:
+            return []
+        if version > self.version or not self.recent or self.recent[0][0] > version + 1:
+            return None
+        return [(row_version, row) for row_version, row in self.recent if row_version > version]
+
+    def to_dict(self) -> dict:
+        return {
+            "schedule_session_id": self.schedule_session_id,
+            "exams": len(self.exams),
+            "by_status": {name: self.by_status[status] for status, name in _STATUS_NAMES.items()},
+            "sections": [
+                {
+                    "seq": seq,
+                    "in_exam": counts[EXAM_STATUS_IN_EXAM],
+                    "closed": counts[EXAM_STATUS_CLOSED],
+                }
+                for seq, counts in sorted(self.by_section.items())
+            ],
+            "timeouts": self.timeouts,
+            "last_activity": self.last_activity,
+        }
+
+
+class SessionMonitor:
+    """
+    Live state of schedule sessions, so the proctor overview and its change feed are served from memory.
+
+    A session is built from one query on first use (or at startup for the sessions under way) and then
+    kept current by the exam state transitions reported through the exam_* and section_* methods; reports
+    about exams of sessions not loaded are ignored. The state is per process, so transitions handled by
+    another worker are only seen once the session is rebuilt, after max_age seconds; a rebuild publishes
+    the rows it finds changed.
+
+    Stream resume tokens are "<process epoch>-<version>", so a token from another worker or an earlier
+    process falls back to a snapshot.
+    """
+
+    def __init__(self, max_age: float = 300, buffer_size: int = FEED_BUFFER_SIZE):
+        self._max_age = max_age
+        self._buffer_size = buffer_size
+        self._epoch = secrets.token_hex(4)
+        self._sessions: dict[str, SessionSummary] = {}
+        self._by_exam: dict[str, SessionSummary] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def _fresh(self, schedule_session_id: str) -> SessionSummary | None:
+        summary = self._sessions.get(schedule_session_id)
+        if summary is not None and not summary.expired and time.monotonic() - summary.loaded_at < self._max_age:
+            return summary
+        return None
+
+    def _drop(self, schedule_session_id: str):
+        summary = self._sessions.pop(schedule_session_id, None)
+        if summary is not None:
+            for exam_id in summary.exams:
+                if self._by_exam.get(exam_id) is summary:
+                    del self._by_exam[exam_id]
+
+    def invalidate(self, schedule_session_id: str):
+        """Rebuild a session on next use; one with open streams keeps its versions and publishes what changed."""
+        if event_hub.subscriber_count(proctor_channel(schedule_session_id)):
+            summary = self._sessions.get(schedule_session_id)
+            if summary is not None:
+                summary.expired = True
+        else:
+            self._drop(schedule_session_id)
+
+    async def _load(self, schedule_session_id: str) -> SessionSummary:
+        summary = SessionSummary(schedule_session_id, self._buffer_size)
+        for (exam_id, examinee, status, actual_start, actual_end, updated_at,
+             section_id, seq, section_name, section_status, section_start, section_end, section_is_timeout,
+             section_updated_at) in await ExamDAO.list_activity_async(schedule_session_id):
+            exam = summary.exams.get(exam_id) or summary.add_exam(exam_id, status, updated_at, examinee,
+                                                                  actual_start, actual_end)
+            if section_id is not None and seq is not None:
+                summary.set_section_status(exam, seq, section_status or EXAM_STATUS_NOT_STARTED, section_updated_at,
+                                           section_id=section_id, name=section_name, actual_start=section_start,
+                                           actual_end=section_end, is_timeout=bool(section_is_timeout))
+        previous = self._sessions.get(schedule_session_id)
+        self._drop(schedule_session_id)
+        self._sessions[schedule_session_id] = summary
+        for exam_id in summary.exams:
+            self._by_exam[exam_id] = summary
+        if previous is not None:
+            summary.version, summary.recent = previous.version, previous.recent
+        summary.publishing = True
+        if previous is not None:
+            for exam_id, exam in summary.exams.items():
+                row = exam.row()
+                old = previous.exams.get(exam_id)
+                if old is None or any(old.row()[name] != row[name] for name in _ROW_STATE_FIELDS):
+                    summary.publish(row)
+            for exam_id in previous.exams.keys() - summary.exams.keys():
+                summary.publish({"exam_id": exam_id, "removed": True})
+        return summary
+
+    async def get(self, schedule_session_id: str) -> SessionSummary:
+        summary = self._fresh(schedule_session_id)
+        if summary is not None:
+            return summary
+        lock = self._locks.setdefault(schedule_session_id, asyncio.Lock())
+        async with lock:
+            summary = self._fresh(schedule_session_id)
+            if summary is None:
+                summary = await self._load(schedule_session_id)
+        return summary
+
+    async def summary(self, schedule_session_id: str) -> dict:
+        return (await self.get(schedule_session_id)).to_dict()
+
+    async def warm_up_async(self) -> int:
+        """Build the sessions under way now; returns how many were built. Failures are logged, not raised."""
+        try:
+            session_ids = await ScheduleSessionDAO.list_live_ids_async(datetime.now())
+            for schedule_session_id in session_ids:
+                await self.get(schedule_session_id)
+            return len(session_ids)
+        except Exception:
+            logger.exception("Failed to warm up session counters")
+            return 0
+
+    def token(self, version: int) -> str:
+        return f"{self._epoch}-{version}"
+
+    def _token_version(self, token: str | None) -> int | None:
+        epoch, _, version = (token or "").partition("-")
+        if epoch != self._epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    async def stream(self, schedule_session_id: str, resume_token: str | None = None,
+                     keepalive_seconds: float = FEED_KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+        """
+        Server-Sent Events of a session's proctor view: a snapshot of every exam row, then each changed
+        row as it happens. Every event id is a resume token; resuming from a token the ring buffer still
+        covers replays the rows changed since, otherwise the stream starts with a snapshot. A stream that
+        fell behind and lost rows also starts over with a snapshot.
+        """
+        summary = await self.get(schedule_session_id)
+        # subscribe before reading the version, so no change falls between the snapshot and the feed
+        subscription = event_hub.subscribe(proctor_channel(schedule_session_id))
+        try:
+            version = self._token_version(resume_token)
+            replay = summary.since(version) if version is not None else None
+            if replay is None:
+                version = summary.version
+                yield format_sse(EVENT_SNAPSHOT, {"exams": summary.rows()}, event_id=self.token(version))
+            for version, row in replay or []:
+                yield format_sse(EVENT_EXAM, row, event_id=self.token(version))
+            while True:
+                event = await subscription.get(timeout=keepalive_seconds)
+                if event is None:
+                    # idle: refresh an expired session, which publishes what other workers changed
+                    await self.get(schedule_session_id)
+                    yield b": keep-alive\n\n"
+                    continue
+                row_version, row = event.data
+                if row_version <= version:
+                    continue
+                if row_version > version + 1:
+                    summary = await self.get(schedule_session_id)
+                    version = summary.version
+                    yield format_sse(EVENT_SNAPSHOT, {"exams": summary.rows()}, event_id=self.token(version))
+                    continue
+                version = row_version
+                yield format_sse(EVENT_EXAM, row, event_id=self.token(version))
+        finally:
+            subscription.close()
+
+    def _exam(self, exam_id: str) -> tuple[SessionSummary, ExamActivity] | tuple[None, None]:
+        summary = self._by_exam.get(exam_id)
+        if summary is None:
+            return None, None
+        return summary, summary.exams[exam_id]
+
+    def exam_status(self, exam_id: str, status: int):
+        """An exam moved to a status; login reports the exam's status even when it is unchanged."""
+        summary, exam = self._exam(exam_id)
+        if summary is not None:
+            summary.set_exam_status(exam, status, datetime.now())
+
+    def exam_close(self, exam_id: str):
+        self.exam_status(exam_id, EXAM_STATUS_CLOSED)
+
+    def section_start(self, exam_id: str, section_id: str, seq: int, name: str | None = None,
+                      actual_start: datetime | None = None):
+        summary, exam = self._exam(exam_id)
+        if summary is not None:
+            summary.set_section_status(exam, seq, EXAM_STATUS_IN_EXAM, datetime.now(), section_id=section_id,
+                                       name=name, actual_start=actual_start)
+
+    def section_close(self, exam_id: str, section_id: str, seq: int | None = None, is_timeout: bool = False):
+        """A section closed; without seq it is looked up by section id, then taken to be the current section."""
+        summary, exam = self._exam(exam_id)
+        if summary is None:
+            return
+        seq = seq or exam.section_ids.get(section_id) or exam.section_seq
+        if seq is not None:
+            summary.set_section_status(exam, seq, EXAM_STATUS_CLOSED, datetime.now(), section_id=section_id,
+                                       is_timeout=is_timeout)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "exams": len(self._by_exam),
+        }
+
+
+session_monitor = SessionMonitor(max_age=float(os.getenv("SESSION_MONITOR_MAX_AGE", "300")))
@@ -0,0 +1,42 @@
+import sys
+import time
+
+from app.data.dto.paper_dto import PaperDTO
+
+file_name: str = 'paper_sample.md'
+SCALES = (1, 10, 50, 200)
+ROUNDS = 5
+
+def _scaled(md_content: str, scale: int) -> str:
+    """The paper with each prose paragraph repeated, so notes, passages and questions grow scale times longer."""
+    blocks = []
+    in_fence = False
+    for block in md_content.split('\n\n'):
+        fences = block.count('```')
+        structural = in_fence or fences or block.lstrip().startswith(('#', '-', '<'))
+        in_fence = in_fence != (fences % 2 == 1)
+        blocks += [block] * (1 if structural else scale)
+    return '\n\n'.join(blocks)
+
+def bench_parse():
+    with open(file_name, 'r', encoding='utf-8') as f:
+        md_content = f.read()
+    print(f'{"scale":>6} {"KB":>8} {"ms":>9} {"us/KB":>8}')
+    for scale in SCALES:
+        content = _scaled(md_content, scale)
+        best = None
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            PaperDTO().md_parse_content(content)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        kb = len(content.encode('utf-8')) / 1024
+        print(f'{scale:>6} {kb:>8.0f} {best * 1000:>9.1f} {best * 1e6 / kb:>8.0f}')
+
+def main():
+    bench_parse()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        file_name = sys.argv[1]
+    main()
@@ -2,74 +2,139 @@ import os
 import sys
 
 import pandas as pd
+from sqlalchemy.exc import IntegrityError
 
 from app.data.dao.user_dao import UserDAO
-from app.data.entity.entities import Users
 from app.util.util import md5_encode
+from app.util.util_sheet import iter_xlsx_rows, chunked
 
 file_name: str = 'user_sample.xlsx'
 
-def _is_male(value: str) -> bool | None:
-    if pd.isna(value) or value is None or value=='':
-        return None
-    if value in ['M', 'm']:
-        return True
-    return False
-
-def _is_true(value: str) -> bool | None:
-    if pd.isna(value) or value is None or value=='':
-        return None
-    if value in ['T', 't', 'Y', 'y']:
-        return True
-    return False
-
-def _get_str(value: str | int) -> str | None:
-    if pd.isna(value):
-        return None
-    if type(value) == int:
-        return str(value)
-    return value
-
-def import_examinee():
-    df = pd.read_excel(file_name, sheet_name='student')
-    if df.empty:
-        return
-    for index, row in df.iterrows():
-        email = _get_str(row['email'])
-        user = Users(
-            enroll_number=_get_str(row['student id']),
-            email=email,
-            mobile=_get_str(row['mobile']),
-            name=_get_str(row['given name']),
-            surname=_get_str(row['surname']),
-            gender=_is_male(row['gender']),
-            is_deleted=_is_true(row['deleted']),
-            is_examinee=True,
-        )
-        if user.email is not None:
-            UserDAO().add_or_update(user)
-            print(f'Import examinee {email}')
-
-def import_proctor():
-    df = pd.read_excel(file_name, sheet_name='invigilator')
-    if df.empty:
-        return
-    for index, row in df.iterrows():
-        email = _get_str(row['email'])
-        user = Users(
-            enroll_number=_get_str(row['staff id']),
-            email=email,
-            pwd=md5_encode(_get_str(row['password'])),
-            mobile=_get_str(row['mobile']),
-            name=_get_str(row['given name']),
-            surname=_get_str(row['surname']),
-            gender=_is_male(row['gender']),
-            is_deleted=_is_true(row['deleted']),
-            is_proctor=True,
-        )
-        if user.email is not None:
-            UserDAO().add_or_update(user)
-            print(f'Import proctor {email}')
+# sheet rows normalized and upserted per batch; 2000 rows x 11 columns stays well under the bind parameter
+# limits of both PostgreSQL and SQLite
+IMPORT_CHUNK_ROWS: int = 2000
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+$'
+MAX_LENGTHS = {'email': 64, 'enroll_number': 20, 'mobile': 64, 'name': 64, 'surname': 64}
+
+# sheet name, id column and role flag of each kind of user
+EXAMINEE_SHEET = ('student', 'student id', 'is_examinee')
+PROCTOR_SHEET = ('invigilator', 'staff id', 'is_proctor')
+
+
+def _str_column(values: pd.Series) -> pd.Series:
+    text = values.astype('string').str.strip()
+    return text.mask(text == '')
+
+def _flag_column(values: pd.Series, true_values: list[str]) -> pd.Series:
+    """True for the given letters, False for anything else, None for blank cells."""
+    text = _str_column(values)
+    return text.isin(true_values).astype(object).where(text.notna(), None)
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+def _normalize(df: pd.DataFrame, id_column: str, role: str) -> pd.DataFrame:
+    """Sheet columns turned into users table columns, a whole batch at a time."""
+    users = pd.DataFrame({
+        'email': _str_column(_column(df, 'email')),
+        'enroll_number': _str_column(_column(df, id_column)),
+        'mobile': _str_column(_column(df, 'mobile')),
+        'name': _str_column(_column(df, 'given name')),
+        'surname': _str_column(_column(df, 'surname')),
+        'gender': _flag_column(_column(df, 'gender'), ['M', 'm']),
+        'is_deleted': _flag_column(_column(df, 'deleted'), ['T', 't', 'Y', 'y']),
+    }, index=df.index)
+    users[role] = True
+    if 'password' in df.columns:
+        passwords = _str_column(df['password'])
+        # rosters mostly share a handful of initial passwords: hash each distinct one once
+        hashes = {password: md5_encode(password) for password in passwords.dropna().unique()}
+        users['pwd'] = passwords.map(hashes)
+    return users
+
+def _validation_errors(users: pd.DataFrame) -> pd.Series:
+    """First validation error of each row, NA for valid rows."""
+    errors = pd.Series(pd.NA, index=users.index, dtype=object)
+    checks = [
+        (users['email'].isna(), 'missing email'),
+        (~users['email'].str.fullmatch(EMAIL_PATTERN).fillna(True).astype(bool), 'invalid email'),
+    ]
+    checks += [(users[column].str.len().gt(length).fillna(False).astype(bool), f'{column} longer than {length}')
+               for column, length in MAX_LENGTHS.items()]
+    # the last row of an email wins; an enroll number belongs to the first email claiming it
+    checks.append((users['email'].notna() & users['email'].duplicated(keep='last'), 'email repeated further down'))
+    checks.append((users['enroll_number'].notna() & users['enroll_number'].duplicated(keep='first'),
+                   'enroll number repeated'))
+    for mask, message in reversed(checks):
+        errors = errors.mask(mask, message)
+    return errors
+
+def _import_chunk(df: pd.DataFrame, id_column: str, role: str, report: dict):
+    users = _normalize(df, id_column, role)
+    errors = _validation_errors(users)
+    valid = users[errors.isna()]
+    existing = UserDAO.list_email_enroll_numbers(valid['email'].tolist(), valid['enroll_number'].dropna().tolist())
+    existing_emails = {email for email, _ in existing}
+    enroll_owners = {enroll_number: email for email, enroll_number in existing if enroll_number is not None}
+    owners = valid['enroll_number'].map(enroll_owners)
+    taken = owners.notna() & (owners != valid['email'])
+    errors[taken[taken].index] = owners[taken].map('enroll number belongs to {}'.format)
+    valid = valid[~taken]
+
+    if not valid.empty:
+        rows = valid.astype(object).where(valid.notna(), None).to_dict('records')
+        try:
+            UserDAO.upsert_by_email(rows, tuple(column for column in valid.columns if column != 'email'))
+        except IntegrityError as e:
+            errors[valid.index] = f'batch rejected: {e.orig}'
+            valid = valid.iloc[0:0]
+    updated = int(valid['email'].isin(existing_emails).sum())
+    report['updated'] += updated
+    report['inserted'] += len(valid) - updated
+    report['skipped'] += int(errors.notna().sum())
+    report['errors'] += [f'Row {row}: {message}' for row, message in errors.dropna().items()]
+
+def _import_sheet(sheet_name: str, id_column: str, role: str) -> dict:
+    """
+    Upsert the users of a sheet by email. The workbook is streamed in read-only mode and handled
+    IMPORT_CHUNK_ROWS rows at a time: each batch is normalized column-wise, checked, and written with
+    one lookup and one multi-row upsert.
+    """
+    report = {'inserted': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+    with open(file_name, 'rb') as file:
+        rows = iter_xlsx_rows(file, sheet_name)
+        header = next(rows, None)
+        if header is None:
+            return report
+        columns = [str(cell).strip().lower() if cell is not None else f'column {i}' for i, cell in enumerate(header)]
+        first_row = 2
+        for chunk in chunked(rows, IMPORT_CHUNK_ROWS):
+            # sheet row numbers as index, so errors point at the spreadsheet row
+            padded = [(tuple(row) + (None,) * len(columns))[:len(columns)] for row in chunk]
+            df = pd.DataFrame(padded, columns=columns, index=range(first_row, first_row + len(chunk)))
+            first_row += len(chunk)
+            df = df.dropna(how='all')
+            if not df.empty:
+                _import_chunk(df, id_column, role, report)
+            print(f'Import {sheet_name}: {report["inserted"]} inserted, {report["updated"]} updated, '
+                  f'{report["skipped"]} skipped')
+    return report
+
+def _print_errors(report: dict):
+    for error in report['errors']:
+        print(f'- {error}')
+
+def import_examinee() -> dict:
+    report = _import_sheet(*EXAMINEE_SHEET)
+    _print_errors(report)
+    return report
+
+def import_proctor() -> dict:
+    report = _import_sheet(*PROCTOR_SHEET)
+    _print_errors(report)
+    return report
 
 def main():
     import_examinee()
@@ -79,4 +144,4 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         file_name = sys.argv[1]
         print(f"[{os.getenv("ENV_STATE")} env] importing user from {file_name}")
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,19 @@
+import sys
+
 from sqlalchemy import text
 from app.data.database import engine
 
-def update_schema():
+# answers that lose to a later answer of the same exam and question
+_DUPLICATE_ANSWER_IDS = """
+  SELECT id FROM (
+    SELECT id, ROW_NUMBER() OVER (
+      PARTITION BY exam_id, question_id ORDER BY updated_at DESC, id DESC) AS rn
+    FROM exam_answer) ranked
+  WHERE rn > 1"""
+MAX_LISTED_DUPLICATES: int = 100
+
+def update_schema(archive_duplicates: bool = False) -> bool:
+    """Apply the schema changes; False when the exam answer index is blocked by duplicate answers."""
     with engine.connect() as conn:
         try:
             # Add paper_type column to paper table
@@ -19,9 +31,77 @@ def update_schema():
         except Exception as e:
             print(f"Skipping content (maybe exists): {e}")
 
+        for table in ("paper", "paper_section"):
+            try:
+                # Add scoring_policy column to paper and paper_section tables
+                print(f"Adding scoring_policy to {table} table...")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN scoring_policy SMALLINT"))
+                print("Success.")
+            except Exception as e:
+                print(f"Skipping {table}.scoring_policy (maybe exists): {e}")
+
+        try:
+            # Add rekeyed_at column to question table
+            print("Adding rekeyed_at to question table...")
+            conn.execute(text("ALTER TABLE question ADD COLUMN rekeyed_at TIMESTAMP"))
+            print("Success.")
+        except Exception as e:
+            print(f"Skipping rekeyed_at (maybe exists): {e}")
+
+        for table in ("exam", "paper", "paper_section", "question", "question_option", "schedule", "schedule_section",
+                      "schedule_session"):
+            try:
+                # Add deleted_batch column; rows deleted before it existed shared their cascade's updated_at
+                print(f"Adding deleted_batch to {table} table...")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN deleted_batch VARCHAR(26)"))
+                conn.execute(text(f"UPDATE {table} SET deleted_batch = CAST(updated_at AS VARCHAR(26)) "
+                                  f"WHERE is_deleted IS NOT NULL AND updated_at IS NOT NULL"))
+                print("Success.")
+            except Exception as e:
+                print(f"Skipping {table}.deleted_batch (maybe exists): {e}")
+
         conn.commit()
 
+    return add_exam_answer_unique_index(archive_duplicates)
+
+def add_exam_answer_unique_index(archive_duplicates: bool) -> bool:
+    """
+    One answer per exam and question. Answers repeating an (exam_id, question_id) pair block the index:
+    they are listed and nothing is changed, unless archive_duplicates moves every one but the latest of
+    each pair to exam_answer_duplicate first.
+    """
+    try:
+        print("Adding unique index idx_exam_answer_exam_question...")
+        with engine.begin() as conn:
+            duplicates = conn.execute(text(f"""
+SELECT id, exam_id, question_id, answer, updated_at FROM exam_answer
+WHERE id IN ({_DUPLICATE_ANSWER_IDS}) ORDER BY exam_id, question_id, updated_at""")).fetchall()
+            if duplicates and not archive_duplicates:
+                print(f"Aborted: {len(duplicates)} answers are older copies of another answer to the same exam "
+                      f"and question:")
+                for row in duplicates[:MAX_LISTED_DUPLICATES]:
+                    print(f"- {row.id}: exam {row.exam_id}, question {row.question_id}, "
+                          f"answer {row.answer!r}, updated {row.updated_at}")
+                if len(duplicates) > MAX_LISTED_DUPLICATES:
+                    print(f"- ... and {len(duplicates) - MAX_LISTED_DUPLICATES} more")
+                print("Resolve them, or rerun with --archive-duplicate-answers to move them to exam_answer_duplicate.")
+                return False
+            if duplicates:
+                conn.execute(text("CREATE TABLE IF NOT EXISTS exam_answer_duplicate AS "
+                                  "SELECT * FROM exam_answer WHERE 1 = 0"))
+                conn.execute(text(f"INSERT INTO exam_answer_duplicate "
+                                  f"SELECT * FROM exam_answer WHERE id IN ({_DUPLICATE_ANSWER_IDS})"))
+                conn.execute(text(f"DELETE FROM exam_answer WHERE id IN ({_DUPLICATE_ANSWER_IDS})"))
+                print(f"Archived {len(duplicates)} duplicate answers to exam_answer_duplicate.")
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_exam_answer_exam_question "
+                              "ON exam_answer(exam_id, question_id)"))
+        print("Success.")
+    except Exception as e:
+        print(f"Skipping idx_exam_answer_exam_question: {e}")
+    return True
+
 if __name__ == "__main__":
     print("Updating schema...")
-    update_schema()
+    if not update_schema(archive_duplicates="--archive-duplicate-answers" in sys.argv[1:]):
+        sys.exit(1)
     print("Schema update complete.")
@@ -1,10 +1,18 @@
+import os
+import time
 from typing import Annotated
 
+import jwt
 from fastapi import Depends, HTTPException
 from starlette import status
 
 from app.data.dao.user_dao import UserDAO
-from app.util.util_jwt import oauth2_scheme, jwt_token_decode
+from app.util.util_cache import TTLCache
+from app.util.util_jwt import oauth2_scheme, optional_oauth2_scheme, jwt_token_payload, EVENTS_TOKEN_SCOPE
+
+# verified token -> user id; an entry never outlives the token's exp
+token_cache = TTLCache(max_size=int(os.getenv("TOKEN_CACHE_SIZE", "20000")),
+                       ttl=float(os.getenv("TOKEN_CACHE_TTL", "600")))
 
 
 def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
@@ -20,11 +28,43 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     return current_user
 
 def get_current_user_id(token: Annotated[str, Depends(oauth2_scheme)]) -> str:
-    user_id = jwt_token_decode(token)
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+    try:
+        payload = jwt_token_payload(token)
+    except jwt.PyJWTError:
+        payload = {}
+    # scoped tokens, like the events token carried in URLs, are only good for their own routes
+    user_id = payload.get("user_id") if payload.get("scope") is None else None
     if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials!",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    return user_id
\ No newline at end of file
+        raise _invalid_credentials()
+    exp = payload.get("exp")
+    token_cache.put(token, user_id, ttl=exp - time.time() if exp is not None else None)
+    return user_id
+
+def get_events_user_id(bearer: Annotated[str | None, Depends(optional_oauth2_scheme)],
+                       token: str | None = None) -> str:
+    """
+    User of a Server-Sent Events request: a short-lived events token from the token query parameter, for
+    the browser's EventSource, or else the usual bearer token.
+    """
+    if token is None:
+        if bearer is None:
+            raise _invalid_credentials()
+        return get_current_user_id(bearer)
+    try:
+        payload = jwt_token_payload(token)
+    except jwt.PyJWTError:
+        payload = {}
+    user_id = payload.get("user_id") if payload.get("scope") == EVENTS_TOKEN_SCOPE else None
+    if not user_id:
+        raise _invalid_credentials()
+    return user_id
+
+def _invalid_credentials() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials!",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
@@ -6,6 +6,8 @@ from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, File
 from starlette import status
 
+from app.data.service.grading_service import GradingService
+from app.data.service.item_analysis_service import ItemAnalysisService
 from app.data.service.paper_service import PaperService
 from app.ui.common.user_ui import get_current_user_id
 from app.util.util_ali import get_ali_credentials
@@ -45,6 +47,7 @@ async def create_paper(
     paper_type: Optional[int] = Form(None),
     question_type: Optional[int] = Form(None),
     unit_score: Optional[float] = Form(None),
+    scoring_policy: Optional[int] = Form(None),
 ):
     """Create a new paper with basic metadata."""
     paper_id = PaperService.create_paper(
@@ -56,6 +59,7 @@ async def create_paper(
         paper_type=paper_type,
         question_type=question_type,
         unit_score=Decimal(str(unit_score)) if unit_score is not None else None,
+        scoring_policy=scoring_policy,
         created_by=current_user_id,
     )
     return {"id": paper_id}
@@ -73,6 +77,7 @@ async def update_paper(
     paper_type: Optional[int] = Form(None),
     question_type: Optional[int] = Form(None),
     unit_score: Optional[float] = Form(None),
+    scoring_policy: Optional[int] = Form(None),
 ):
     """Update paper metadata."""
     success = PaperService.update_paper(
@@ -85,6 +90,7 @@ async def update_paper(
         paper_type=paper_type,
         question_type=question_type,
         unit_score=Decimal(str(unit_score)) if unit_score is not None else None,
+        scoring_policy=scoring_policy,
         updated_by=current_user_id,
     )
     if not success:
@@ -110,6 +116,21 @@ async def delete_paper(
     return {"success": True}
 
 
+@router.post("/{paper_id}/restore", response_model=None, tags=["paper"])
+async def restore_paper(
+    paper_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+):
+    """Restore a deleted paper with the sections, questions and options deleted along with it."""
+    success = PaperService.restore_paper(paper_id, current_user_id)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deleted paper not found",
+        )
+    return {"success": True}
+
+
 @router.post("/save", response_model=None, tags=["paper"])
 async def save_paper_full(
     current_user_id: Annotated[str, Depends(get_current_user_id)],
@@ -123,6 +144,49 @@ async def save_paper_full(
     return {"id": paper_id}
 
 
+@router.get("/{paper_id}/analysis", response_model=None, tags=["paper"])
+async def analyze_paper(
+    paper_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+    schedule_session_id: Optional[str] = None,
+):
+    """Item analysis of a paper: difficulty, discrimination and option choices per question, reliability per section."""
+    analysis = await ItemAnalysisService.analyze_paper(paper_id, schedule_session_id)
+    if analysis is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Paper not found",
+        )
+    return analysis
+
+
+@router.post("/{paper_id}/regrade", response_model=None, tags=["paper"])
+async def regrade_paper(
+    paper_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+    dry_run: bool = Form(False),
+    question_ids: Optional[str] = Form(None),
+):
+    """
+    Rescore the answers to questions whose answer key changed and update the affected totals.
+    question_ids (comma separated) defaults to the questions re-keyed by paper edits since they were last regraded;
+    dry_run only reports the score deltas.
+    """
+    result = await GradingService.regrade_paper(
+        paper_id,
+        question_ids=[question_id.strip() for question_id in question_ids.split(",") if question_id.strip()]
+        if question_ids else None,
+        dry_run=dry_run,
+        updated_by=current_user_id,
+    )
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=result["error"],
+        )
+    return result
+
+
 @router.post("/import", response_model=None, tags=["paper"])
 async def import_paper(
     current_user_id: Annotated[str, Depends(get_current_user_id)],
@@ -1,10 +1,13 @@
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Header
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette import status
 
-from app.data.dao.exam_dao import ExamDAO
+from app.data.dao.exam_dao import ExamDAO, EXAM_STATUS_CLOSED
+from app.data.dao.exam_section_dao import ExamSectionDAO
 from app.data.dao.schedule_dao import ScheduleDAO
 from app.data.dao.schedule_session_dao import ScheduleSessionDAO
 from app.data.dao.user_dao import UserDAO
@@ -14,14 +17,20 @@ from app.data.dto.schedule_assignment_dto import (
     ScheduleAssignmentUpdatePayload,
 )
 from app.data.entity.entities import Users
-from app.ui.common.user_ui import get_current_user_id
+from app.data.service.exam_event_service import publish_session_event, publish_exam_event, EVENT_ANNOUNCEMENT, \
+    EVENT_SECTION_CLOSE, EVENT_EXAM_CLOSE
+from app.data.service.grading_service import GradingService
+from app.data.service.proctor_view_cache import proctor_view_cache
+from app.data.service.roster_cache import roster_cache
+from app.data.service.session_monitor import session_monitor
+from app.ui.common.user_ui import get_current_user_id, get_events_user_id
 from app.ui.proctor.assignment_service import (
     AssignmentConflictError,
     AssignmentLockedError,
     AssignmentService,
 )
 from app.util.util import md5_encode, respond_suc, respond_fail
-from app.util.util_jwt import jwt_token_encode
+from app.util.util_jwt import jwt_token_encode, jwt_events_token_encode, EVENTS_TOKEN_TTL
 
 router = APIRouter()
 assignment_api = APIRouter(prefix="/api")
@@ -58,16 +67,85 @@ async def get_session(current_user_id: Annotated[str, Depends(get_current_user_i
     session = ScheduleSessionDAO().get(session_id)
     if session.proctor_id != current_user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
-    exams = ExamDAO.list_in_schedule_session_for_proctor(session_id)
     return {
         "session": session,
-        "exams": [exam._asdict() for exam in exams],
+        "exams": await proctor_view_cache.get(session_id),
     }
 
+@router.get("/session/{session_id}/summary", response_model=None, tags=["exam"])
+async def get_session_summary(current_user_id: Annotated[str, Depends(get_current_user_id)], session_id: str):
+    """Live counters of a session: exams by status, per-section progress, timeouts and last activity."""
+    session = ScheduleSessionDAO().get(session_id)
+    if session is None or session.proctor_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
+    return await session_monitor.summary(session_id)
+
+@router.post("/events_token", response_model=None, tags=["exam"])
+async def events_token(current_user_id: Annotated[str, Depends(get_current_user_id)]):
+    """Short-lived token for opening an events stream with EventSource, passed as its token query parameter."""
+    return {"token": jwt_events_token_encode(current_user_id), "expires_in": int(EVENTS_TOKEN_TTL.total_seconds())}
+
+@router.get("/session/{session_id}/events", response_model=None, tags=["exam"])
+async def session_events(current_user_id: Annotated[str, Depends(get_events_user_id)], session_id: str,
+                         resume: str | None = None,
+                         last_event_id: Annotated[str | None, Header(alias="Last-Event-ID")] = None):
+    """
+    Server-Sent Events of the session's exam rows: a snapshot, then each row as it changes. Event ids are
+    resume tokens, taken from Last-Event-ID on reconnect or from resume.
+    """
+    session = ScheduleSessionDAO().get(session_id)
+    if session is None or session.proctor_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
+    return StreamingResponse(session_monitor.stream(session_id, last_event_id or resume),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/sessions", response_model=None, tags=["exam"])
 async def list_session(current_user_id: Annotated[str, Depends(get_current_user_id)], schedule_id: str):
     return ScheduleSessionDAO.list_for_schedule_proctor(schedule_id=schedule_id, proctor_id=current_user_id)
 
+@router.post("/session/{session_id}/announce", response_model=None, tags=["exam"])
+async def announce(current_user_id: Annotated[str, Depends(get_current_user_id)], session_id: str,
+                   message: Annotated[str, Form()]):
+    """Push an announcement to the event streams of every examinee in the session."""
+    session = ScheduleSessionDAO().get(session_id)
+    if session is None or session.proctor_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
+    delivered = publish_session_event(session_id, EVENT_ANNOUNCEMENT, {"message": message, "created_at": datetime.now()})
+    return {"delivered": delivered}
+
+@router.post("/exam/{exam_id}/force_submit", response_model=None, tags=["exam"])
+async def force_submit(current_user_id: Annotated[str, Depends(get_current_user_id)], exam_id: str):
+    """Close an examinee's open section and exam, and tell the examinee's client."""
+    exam = await ExamDAO().get_async(exam_id)
+    if exam is None or exam.is_deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exam not exist!")
+    session = ScheduleSessionDAO().get(exam.schedule_session_id)
+    if session is None or session.proctor_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
+    exam_section = await ExamSectionDAO.get_last_section_async(exam_id)
+    if exam_section is not None and exam_section.status != EXAM_STATUS_CLOSED:
+        await ExamSectionDAO.submit_async(exam_section.id, current_user_id)
+        session_monitor.section_close(exam_id, exam_section.id, exam_section.seq)
+        publish_exam_event(exam_id, EVENT_SECTION_CLOSE, {"exam_section_id": exam_section.id, "forced": True})
+    await ExamDAO.submit_async(exam_id, current_user_id)
+    roster_cache.set_exam_status(exam_id, EXAM_STATUS_CLOSED)
+    session_monitor.exam_close(exam_id)
+    proctor_view_cache.invalidate(exam.schedule_session_id)
+    publish_exam_event(exam_id, EVENT_EXAM_CLOSE, {"forced": True})
+    return {"success": True}
+
+@router.post("/session/{session_id}/grade", response_model=None, tags=["exam"])
+async def grade_session(current_user_id: Annotated[str, Depends(get_current_user_id)], session_id: str):
+    """Auto-grade the objective questions of every exam in the session and store the scores."""
+    session = ScheduleSessionDAO().get(session_id)
+    if session is None or session.proctor_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session!")
+    result = await GradingService.grade_session(session_id, session.paper_id, updated_by=current_user_id)
+    if not result["success"]:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=result["error"])
+    return result
+
 
 @assignment_api.get("/sessions/{session_id}/assignments", tags=["assignments"])
 async def list_assignments(session_id: str):
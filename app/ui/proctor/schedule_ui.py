@@ -1,13 +1,21 @@
 """Schedule API router for proctor schedule and session management."""
 
+import asyncio
+import csv
 from datetime import datetime
 from typing import Annotated, Optional, List
+from zipfile import BadZipFile
 
-from fastapi import APIRouter, Depends, Form, HTTPException, Body
+from fastapi import APIRouter, Depends, Form, HTTPException, Body, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from openpyxl.utils.exceptions import InvalidFileException
 from starlette import status
 
+from app.data.dao.schedule_session_dao import ScheduleSessionDAO
+from app.data.service.export_service import ExportService, EXPORT_STATEMENTS, EXPORT_FORMATS
 from app.data.service.schedule_service import ScheduleService, SessionService
 from app.ui.common.user_ui import get_current_user_id
+from app.util.util_sheet import SHEET_EXTENSIONS
 
 router = APIRouter()
 
@@ -24,15 +32,17 @@ async def list_schedules(current_user_id: Annotated[str, Depends(get_current_use
 async def get_schedule(
     schedule_id: str,
     current_user_id: Annotated[str, Depends(get_current_user_id)],
+    students_offset: Annotated[int, Query(ge=0)] = 0,
+    students_limit: Annotated[Optional[int], Query(ge=1)] = None,
 ):
-    """Get a schedule with all sessions and sections."""
-    schedule = ScheduleService.get_schedule_full(schedule_id)
-    if not schedule:
+    """Get a schedule with all sessions, sections and students; students can be paged per session."""
+    body = ScheduleService.get_schedule_full_json(schedule_id, students_offset, students_limit)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Schedule not found",
         )
-    return schedule
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("", response_model=None, tags=["schedule"])
@@ -83,6 +93,21 @@ async def delete_schedule(
     return {"success": True}
 
 
+@router.post("/{schedule_id}/restore", response_model=None, tags=["schedule"])
+async def restore_schedule(
+    schedule_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+):
+    """Restore a deleted schedule with the sessions, sections and exams deleted along with it."""
+    success = ScheduleService.restore_schedule(schedule_id, current_user_id)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deleted schedule not found",
+        )
+    return {"success": True}
+
+
 # Session endpoints
 
 @router.post("/session", response_model=None, tags=["session"])
@@ -160,6 +185,55 @@ async def delete_session(
     return {"success": True}
 
 
+@router.post("/session/{session_id}/restore", response_model=None, tags=["session"])
+async def restore_session(
+    session_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+):
+    """Restore a deleted session with the sections and exams deleted along with it."""
+    success = SessionService.restore_session(session_id, current_user_id)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deleted session not found",
+        )
+    return {"success": True}
+
+
+@router.get("/session/{session_id}/export", response_model=None, tags=["session"])
+async def export_session(
+    session_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+    kind: str = "exams",
+    format: str = "csv",
+):
+    """
+    Stream the results of a session as CSV or XLSX: one row per exam (kind=exams), exam section
+    (kind=sections) or answer (kind=answers). Rows are read through a server-side cursor.
+    """
+    if kind not in EXPORT_STATEMENTS or format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"kind must be one of {', '.join(EXPORT_STATEMENTS)} and format one of {', '.join(EXPORT_FORMATS)}",
+        )
+    session = await ScheduleSessionDAO().get_async(session_id)
+    if session is None or session.is_deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found",
+        )
+    if session.proctor_id != current_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not the proctor of this session",
+        )
+    return StreamingResponse(
+        ExportService.stream(kind, format, session_id),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="session_{session_id}_{kind}.{format}"'},
+    )
+
+
 @router.post("/session/{session_id}/students", response_model=None, tags=["session"])
 async def assign_students(
     session_id: str,
@@ -175,6 +249,34 @@ async def assign_students(
     return result
 
 
+@router.post("/session/{session_id}/students/upload", response_model=None, tags=["session"])
+async def upload_students(
+    session_id: str,
+    current_user_id: Annotated[str, Depends(get_current_user_id)],
+    file: UploadFile = File(...),
+):
+    """Assign the students listed in a CSV or XLSX file (an 'email' column, or emails in the first column)."""
+    if not (file.filename or '').lower().endswith(SHEET_EXTENSIONS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a .csv or .xlsx file",
+        )
+    try:
+        # reading and bulk inserting a large roster blocks; keep the event loop free meanwhile
+        return await asyncio.to_thread(
+            SessionService.assign_students_from_file,
+            session_id=session_id,
+            file=file.file,
+            filename=file.filename,
+            created_by=current_user_id,
+        )
+    except (UnicodeDecodeError, csv.Error, InvalidFileException, BadZipFile) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to read roster file: {str(e)}",
+        )
+
+
 @router.delete("/session/{session_id}/students/{email}", response_model=None, tags=["session"])
 async def remove_student(
     session_id: str,
@@ -1,9 +1,12 @@
 import hashlib
+import json
 import logging
 from copy import deepcopy
 from datetime import datetime
 from typing import Any, Dict, Iterable
 
+from fastapi.encoders import jsonable_encoder
+
 def md5_encode(text):
     md5 = hashlib.md5()
     md5.update(text.encode('utf-8'))
@@ -22,6 +25,15 @@ def to_datetime(text: str)-> datetime:
     format_str:str = '%Y-%m-%d %H:%M:%S' if text.find('-') >= 0 else '%Y/%m/%d %H:%M:%S'
     return datetime.strptime(text, format_str)
 
+def entity_to_dict(entity) -> dict:
+    """Column values of an ORM entity, detached from its session state."""
+    return {column.name: getattr(entity, column.name) for column in entity.__table__.columns}
+
+def to_json_bytes(data: Any) -> bytes:
+    """Serialize the way FastAPI's JSONResponse does, so pre-rendered bodies match live ones."""
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
 def respond_suc(data: dict) -> dict:
     return {
         "code": 0,
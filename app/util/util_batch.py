@@ -0,0 +1,71 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class GroupCommitter(Generic[T]):
+    """
+    Queue of items from many callers, handed to a flush callable in batches by one background task.
+
+    A flush waits up to window_ms for more items to arrive, unless max_batch items are already queued
+    or the committer is closing. Flushes run one at a time, so items queued during a flush form the
+    next batch and keep their queue order. The flush callable handles its own errors.
+    """
+
+    def __init__(self, flush: Callable[[list[T]], Awaitable[None]], window_ms: float, max_batch: int):
+        self._flush = flush
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._pending: list[T] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushed: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _ensure_flusher(self):
+        # restart when not yet running, or when bound to an event loop that is gone
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not asyncio.get_running_loop():
+            self._wakeup = asyncio.Event()
+            self._flushed = asyncio.Event()
+            self._flusher = asyncio.create_task(self._run())
+
+    def put(self, *items: T):
+        """Queue items for the next flush."""
+        self._ensure_flusher()
+        self._pending.extend(items)
+        self._wakeup.set()
+
+    async def wait_flushed(self):
+        """Wait until the flusher has flushed its next batch, making room in the queue."""
+        self._ensure_flusher()
+        self._wakeup.set()
+        self._flushed.clear()
+        await self._flushed.wait()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._closing and len(self._pending) < self._max_batch:
+                await asyncio.sleep(self._window)
+            self._wakeup.clear()
+            while self._pending:
+                batch = self._pending[:self._max_batch]
+                self._pending = self._pending[self._max_batch:]
+                await self._flush(batch)
+                self._flushed.set()
+            if self._closing:
+                return
+
+    async def close(self):
+        """Flush whatever is still queued and stop the flusher; used on application shutdown."""
+        if self._flusher is None or self._flusher.done():
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._flusher
+        self._flusher = None
+        self._closing = False
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+
+
+@dataclass(frozen=True)
+class Event:
+    channel: str
+    name: str
+    data: Any
+
+
+class Subscription:
+    """Bounded inbox of one subscriber; when it is full the oldest event is dropped."""
+
+    def __init__(self, hub: "EventHub", channels: tuple[str, ...], max_queue: int):
+        self._hub = hub
+        self.channels = channels
+        self._queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def deliver(self, event: Event):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: float | None = None) -> Event | None:
+        """Next event, or None when none arrives within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._hub.unsubscribe(self)
+
+
+class EventHub:
+    """In-process publish/subscribe of named events on string channels."""
+
+    def __init__(self, max_queue: int = 256):
+        self._max_queue = max_queue
+        self._subscribers: dict[str, set[Subscription]] = {}
+
+    def subscribe(self, *channels: str) -> Subscription:
+        subscription = Subscription(self, channels, self._max_queue)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for channel in subscription.channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel: str, name: str, data: Any = None) -> int:
+        """Deliver an event to every current subscriber of the channel; returns how many got it."""
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return 0
+        event = Event(channel, name, data)
+        for subscription in list(subscribers):
+            subscription.deliver(event)
+        return len(subscribers)
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+
+def format_sse(name: str, data: Any = None, event_id: str | None = None) -> bytes:
+    """One Server-Sent Events message; data is JSON encoded the way FastAPI encodes responses."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+event_hub = EventHub()
@@ -5,8 +5,19 @@ from fastapi.security import OAuth2PasswordBearer
 
 JWT_TOKEN_SECRET_SALT = "ep2025"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/exam/examinee/login")
+# same scheme for routes that also accept other credentials, None instead of a 401 without the header
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/exam/examinee/login", auto_error=False)
+# Server-Sent Events are opened by the browser's EventSource, which cannot send an Authorization header;
+# those routes take a short-lived token of this scope from the query string instead
+EVENTS_TOKEN_SCOPE = "events"
+EVENTS_TOKEN_TTL = timedelta(minutes=2)
+
+def jwt_token_payload(token) -> dict:
+    """Verified payload of a token; raises jwt.PyJWTError when the token is invalid or expired."""
+    return jwt.decode(token, key=JWT_TOKEN_SECRET_SALT, algorithms='HS256', options={'verify_signature': True})
+
 def jwt_token_decode(token) -> str:
-    payload = jwt.decode(token, key=JWT_TOKEN_SECRET_SALT, algorithms='HS256', options={'verify_signature': True})
+    payload = jwt_token_payload(token)
     user_id = payload.get("user_id")
     return user_id
 
@@ -14,3 +25,7 @@ def jwt_token_encode(user_id: str) -> str:
     payload = {'user_id': user_id, 'exp': datetime.now(timezone.utc) + timedelta(weeks=1)}
     jwt_token = jwt.encode(payload, JWT_TOKEN_SECRET_SALT, algorithm="HS256")
     return jwt_token
+
+def jwt_events_token_encode(user_id: str) -> str:
+    payload = {'user_id': user_id, 'scope': EVENTS_TOKEN_SCOPE, 'exp': datetime.now(timezone.utc) + EVENTS_TOKEN_TTL}
+    return jwt.encode(payload, JWT_TOKEN_SECRET_SALT, algorithm="HS256")
@@ -0,0 +1,41 @@
+import csv
+import io
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator
+
+from openpyxl import load_workbook
+
+SHEET_EXTENSIONS = ('.csv', '.xlsx')
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[tuple]:
+    """Rows of a UTF-8 (optionally BOM-prefixed) CSV file, decoded as they are read."""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.reader(text):
+            yield tuple(row)
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(file: BinaryIO, sheet_name: str | None = None) -> Iterator[tuple]:
+    """Cell values of a worksheet, row by row; read-only mode keeps only the current row in memory."""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_rows(file: BinaryIO, filename: str, sheet_name: str | None = None) -> Iterator[tuple]:
+    """Rows of an uploaded CSV or XLSX file, told apart by extension."""
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_rows(file, sheet_name)
+    return iter_csv_rows(file)
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -307,6 +307,9 @@ COMMENT ON COLUMN exam_answer.updated_by IS 'Updator ID';
 COMMENT ON COLUMN exam_answer.updated_at IS 'Update Datetime';
 COMMENT ON COLUMN exam_answer.is_deleted IS 'Is Deleted';
 
+
+CREATE UNIQUE INDEX idx_exam_answer_exam_question ON exam_answer(exam_id,question_id);
+
 DROP TABLE IF EXISTS paper;
 CREATE TABLE paper(
     id VARCHAR(26) NOT NULL,
@@ -318,6 +321,7 @@ CREATE TABLE paper(
     unit_score NUMERIC(6,2),
     full_score NUMERIC(6,2),
     pass_score NUMERIC(6,2),
+    scoring_policy smallint,
     duration smallint,
     created_by VARCHAR(26),
     created_at TIMESTAMP,
@@ -337,6 +341,7 @@ COMMENT ON COLUMN paper.question_type IS 'Question Type;1.single choice; 2.true-
 COMMENT ON COLUMN paper.unit_score IS 'Unit/Question Score';
 COMMENT ON COLUMN paper.full_score IS 'Full Score';
 COMMENT ON COLUMN paper.pass_score IS 'Pass Score';
+COMMENT ON COLUMN paper.scoring_policy IS 'Scoring Policy of objective questions;1.all-or-nothing; 2.proportional; 3.negative marking; 4.order-sensitive';
 COMMENT ON COLUMN paper.duration IS 'Duration in Minutes';
 COMMENT ON COLUMN paper.created_by IS 'Creator ID';
 COMMENT ON COLUMN paper.created_at IS 'Create Datetime';
@@ -355,6 +360,7 @@ CREATE TABLE paper_section(
     unit_score NUMERIC(6,2),
     full_score NUMERIC(6,2),
     pass_score NUMERIC(6,2),
+    scoring_policy smallint,
     note TEXT,
     paper_id VARCHAR(26),
     created_by VARCHAR(26),
@@ -375,6 +381,7 @@ COMMENT ON COLUMN paper_section.question_type IS 'Question Type;1.single choice;
 COMMENT ON COLUMN paper_section.unit_score IS 'Unit/Question Score';
 COMMENT ON COLUMN paper_section.full_score IS 'Full Score';
 COMMENT ON COLUMN paper_section.pass_score IS 'Pass Score';
+COMMENT ON COLUMN paper_section.scoring_policy IS 'Scoring Policy of objective questions;1.all-or-nothing; 2.proportional; 3.negative marking; 4.order-sensitive';
 COMMENT ON COLUMN paper_section.note IS 'Note';
 COMMENT ON COLUMN paper_section.paper_id IS 'Paper ID';
 COMMENT ON COLUMN paper_section.created_by IS 'Creator ID';
@@ -1,13 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app.data.service.answer_service import answer_commit_buffer
+from app.data.service.behavior_service import behavior_recorder
+from app.data.service.session_monitor import session_monitor
 from app.ui.examinee import exam_ui
 from app.ui.proctor import proctor_ui
 from app.ui.proctor import paper_ui as proctor_paper_ui
 from app.ui.common import paper_ui as common_paper_ui
 from app.ui.proctor import schedule_ui
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await session_monitor.warm_up_async()
+    yield
+    await answer_commit_buffer.close()
+    await behavior_recorder.close()
+
 app = FastAPI(
     title="EP",
+    lifespan=lifespan,
     version="0.0.1",
     responses={404: {"description": "Not found"}},
 )
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.util.util_event import EventHub, format_sse
+
+
+def test_event_hub_delivers_to_channel_subscribers_and_drops_oldest():
+    hub = EventHub(max_queue=2)
+
+    async def scenario():
+        exam = hub.subscribe("exam:1", "session:1")
+        other = hub.subscribe("exam:2")
+        assert hub.publish("session:1", "announcement", {"message": "a"}) == 1
+        hub.publish("exam:1", "tick", 1)
+        hub.publish("exam:1", "tick", 2)
+        received = [await exam.get(timeout=0.1), await exam.get(timeout=0.1)]
+        nothing = await other.get(timeout=0.01)
+        exam.close()
+        other.close()
+        return received, exam.dropped, nothing
+
+    received, dropped, nothing = asyncio.run(scenario())
+    assert [event.data for event in received] == [1, 2]
+    assert dropped == 1
+    assert nothing is None
+    assert hub.subscriber_count("exam:1") == 0 and hub.publish("exam:1", "tick") == 0
+
+
+def test_format_sse():
+    assert format_sse("tick", {"a": 1}, event_id="7") == b'id: 7\nevent: tick\ndata: {"a":1}\n\n'
@@ -0,0 +1,159 @@
+import os
+from decimal import Decimal
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+import numpy as np  # noqa: E402
+
+from app.data.dao.paper_dao import (  # noqa: E402
+    SCORING_POLICY_NEGATIVE_MARKING,
+    SCORING_POLICY_ORDER_SENSITIVE,
+    SCORING_POLICY_PROPORTIONAL,
+)
+from app.data.entity.entities import Paper, PaperSection, Question, QuestionOption, ExamAnswer  # noqa: E402
+from app.data.service.grading_service import (  # noqa: E402
+    ANSWER_ALL_CORRECT,
+    ANSWER_HALF_CORRECT,
+    ANSWER_WRONG,
+    compile_answer_key,
+    diff_answer_keys,
+    grade,
+    parse_answer,
+    parse_answers,
+    parse_answers_with_order,
+    regrade,
+    score_answers,
+    score_saved_answers,
+)
+
+
+def _paper(q1_correct: str = "2"):
+    paper = Paper(id="P", unit_score=Decimal("1"), pass_score=Decimal("3"))
+    sections = [PaperSection(id="S1", paper_id="P", seq=1, unit_score=Decimal("2"), pass_score=Decimal("2"))]
+    questions = [
+        Question(id="Q1", section_id="S1", seq=1, question_type=1),
+        Question(id="Q2", section_id="S1", seq=2, question_type=3, score=Decimal("1.5")),
+        Question(id="Q3", section_id="S1", seq=3, question_type=5),
+    ]
+    options = [
+        QuestionOption(question_id="Q1", code="1", is_correct=q1_correct == "1"),
+        QuestionOption(question_id="Q1", code="2", is_correct=q1_correct == "2"),
+        QuestionOption(question_id="Q2", code="1", is_correct=True),
+        QuestionOption(question_id="Q2", code="3", is_correct=True),
+        QuestionOption(question_id="Q3", code="1", is_correct=True),
+    ]
+    return compile_answer_key(paper, sections, questions, options)
+
+
+def test_parse_answer_accepts_codes_and_letters():
+    assert parse_answer("2") == 0b10
+    assert parse_answer("3,1") == parse_answer("A C") == 0b101
+    assert parse_answer(None) == 0
+    assert parse_answer("x") != parse_answer("")
+    assert parse_answers(["1", None, "1", "2"]).tolist() == [1, 0, 1, 2]
+
+
+def test_grade_scores_objective_answers_and_totals():
+    key = _paper()
+    answers = [
+        ("A1", "E1", "ES1", "Q1", "2", None, None),
+        ("A2", "E1", "ES1", "Q2", "1,3", None, None),
+        ("A3", "E1", "ES1", "Q3", "anything", 0.5, None),
+        ("A4", "E2", "ES2", "Q1", "1", None, None),
+        ("A5", "E2", "ES2", "Q2", "1", 0, ANSWER_WRONG),
+    ]
+    sections = [("ES1", "E1", "S1"), ("ES2", "E2", "S1"), ("ES3", "E3", "S1")]
+    result = grade(key, answers, sections, "proctor")
+
+    by_id = {row["id"]: row for row in result.answers}
+    assert by_id["A1"]["score"] == 2.0 and by_id["A1"]["is_correct"] == ANSWER_ALL_CORRECT
+    assert by_id["A2"]["score"] == 1.5
+    assert by_id["A4"]["is_correct"] == ANSWER_WRONG
+    # fill-in-the-blank is not auto-graded, unchanged answers are not rewritten
+    assert "A3" not in by_id and "A5" not in by_id
+    assert result.graded == 4
+
+    sections_by_id = {row["id"]: row for row in result.exam_sections}
+    assert sections_by_id["ES1"]["score"] == 4.0 and sections_by_id["ES1"]["is_passed"] is True
+    assert sections_by_id["ES2"]["score"] == 0.0 and sections_by_id["ES2"]["is_passed"] is False
+    assert sections_by_id["ES3"]["score"] == 0.0
+    exams_by_id = {row["id"]: row for row in result.exams}
+    assert exams_by_id["E1"]["score"] == 4.0 and exams_by_id["E1"]["is_passed"] is True
+    assert exams_by_id["E3"]["is_passed"] is False
+    assert np.isnan(key.section_pass_score).sum() == 0
+
+
+def test_score_saved_answers_returns_running_total_deltas():
+    key = _paper()
+    answers = [
+        ExamAnswer(id="A1", exam_id="E1", exam_section_id="ES1", question_id="Q1", answer="2"),
+        ExamAnswer(id="A2", exam_id="E1", exam_section_id="ES1", question_id="Q2", answer="1",
+                   score=Decimal("1.5"), is_correct=ANSWER_ALL_CORRECT),
+        ExamAnswer(id="A3", exam_id="E1", exam_section_id="ES1", question_id="Q3", answer="x", score=Decimal("1")),
+        ExamAnswer(id="A4", exam_id="E2", exam_section_id="ES2", question_id="Q1", answer="1"),
+        ExamAnswer(id="A5", exam_id="E3", exam_section_id="ES3", question_id="Q1", answer="2"),
+    ]
+    section_totals, exam_totals = score_saved_answers({"E1": key, "E2": key}, answers)
+
+    assert (answers[0].score, answers[0].is_correct) == (Decimal("2"), ANSWER_ALL_CORRECT)
+    assert (answers[1].score, answers[1].is_correct) == (Decimal("0"), ANSWER_WRONG)
+    assert answers[2].score == Decimal("1") and answers[2].is_correct is None
+    # exams without a key are left alone
+    assert answers[4].score is None
+    assert {row['b_id']: row['b_delta'] for row in section_totals} == {"ES1": Decimal("0.5"), "ES2": Decimal("0")}
+    assert {row['b_id']: row['b_pass_score'] for row in exam_totals} == {"E1": Decimal("3"), "E2": Decimal("3")}
+
+
+def test_regrade_rescores_only_rekeyed_questions():
+    old_key, new_key = _paper(), _paper(q1_correct="1")
+    assert diff_answer_keys(old_key, new_key) == ["Q1"]
+    assert diff_answer_keys(old_key, _paper()) == []
+
+    answers = [
+        ("A1", "E1", "ES1", "Q1", "2", 2.0, ANSWER_ALL_CORRECT),
+        ("A2", "E2", "ES2", "Q1", "1", 0.0, ANSWER_WRONG),
+        ("A3", "E3", "ES3", "Q1", "3", 0.0, ANSWER_WRONG),
+    ]
+    result = regrade(new_key, answers, "proctor")
+    assert sorted(row["id"] for row in result.answers) == ["A1", "A2"]
+    assert sorted(result.exam_ids) == ["E1", "E2"] and sorted(result.exam_section_ids) == ["ES1", "ES2"]
+    assert {row["exam_id"]: row["delta"] for row in result.exam_deltas} == {"E1": -2.0, "E2": 2.0}
+    assert result.question_deltas == [{"question_id": "Q1", "answers": 3, "changed_answers": 2, "delta": 0.0}]
+
+
+def test_scoring_policies():
+    paper = Paper(id="P", unit_score=Decimal("2"), scoring_policy=SCORING_POLICY_NEGATIVE_MARKING)
+    sections = [
+        PaperSection(id="S1", paper_id="P", seq=1, scoring_policy=SCORING_POLICY_PROPORTIONAL),
+        PaperSection(id="S2", paper_id="P", seq=2),
+        PaperSection(id="S3", paper_id="P", seq=3, scoring_policy=SCORING_POLICY_ORDER_SENSITIVE),
+    ]
+    questions = [
+        Question(id="MULTI", section_id="S1", seq=1, question_type=4),
+        Question(id="SINGLE", section_id="S2", seq=1, question_type=1),
+        Question(id="ORDER", section_id="S3", seq=1, question_type=3),
+    ]
+    options = [QuestionOption(question_id="MULTI", code=code, is_correct=code in ("1", "3")) for code in "1234"]
+    options += [QuestionOption(question_id="SINGLE", code=code, is_correct=code == "2") for code in "1234"]
+    options += [QuestionOption(question_id="ORDER", code=code, is_correct=True, correct_seq=seq)
+                for code, seq in (("1", 3), ("2", 1), ("3", 2))]
+    key = compile_answer_key(paper, sections, questions, options)
+
+    cases = [
+        ("MULTI", "1,3", 2.0, ANSWER_ALL_CORRECT),
+        ("MULTI", "3", 1.0, ANSWER_HALF_CORRECT),
+        ("MULTI", "1,2", 0.0, ANSWER_WRONG),
+        ("SINGLE", "2", 2.0, ANSWER_ALL_CORRECT),
+        ("SINGLE", "1", -0.67, ANSWER_WRONG),
+        ("SINGLE", None, 0.0, ANSWER_WRONG),
+        ("ORDER", "2,3,1", 2.0, ANSWER_ALL_CORRECT),
+        ("ORDER", "2,1,3", 0.67, ANSWER_HALF_CORRECT),
+        ("ORDER", "1,2,3", 0.0, ANSWER_WRONG),
+        ("ORDER", "2,3", 0.0, ANSWER_WRONG),
+    ]
+    graded, is_correct, score = score_answers(key, key.indexes_of([case[0] for case in cases]),
+                                              *parse_answers_with_order([case[1] for case in cases]))
+    assert graded.all()
+    assert score.tolist() == [case[2] for case in cases]
+    assert is_correct.tolist() == [case[3] for case in cases]
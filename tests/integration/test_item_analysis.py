@@ -0,0 +1,45 @@
+import os
+from decimal import Decimal
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from app.data.entity.entities import Paper, PaperSection, Question, QuestionOption  # noqa: E402
+from app.data.service.grading_service import compile_answer_key  # noqa: E402
+from app.data.service.item_analysis_service import analyze, cronbach_alpha  # noqa: E402
+
+
+def test_cronbach_alpha():
+    scores = np.array([[1, 1, 1], [1, 1, 0], [0, 1, 0], [0, 0, 0]], dtype=float)
+    # k/(k-1) * (1 - sum of item variances / total variance)
+    expected = 3 / 2 * (1 - (1 / 3 + 0.25 + 0.25) / (5 / 3))
+    assert cronbach_alpha(scores) == pytest.approx(expected)
+    assert np.isnan(cronbach_alpha(scores[:, :1]))
+
+
+def test_analyze_item_statistics():
+    paper = Paper(id="P", unit_score=Decimal("1"))
+    sections = [PaperSection(id="S1", paper_id="P", seq=1)]
+    questions = [Question(id=f"Q{i}", section_id="S1", seq=i, question_type=1) for i in (1, 2)]
+    options = [QuestionOption(question_id=question.id, code=code, is_correct=code == "1")
+               for question in questions for code in "123"]
+    key = compile_answer_key(paper, sections, questions, options)
+    answers = [
+        ("E1", "Q1", "1", 1.0), ("E1", "Q2", "1", 1.0),
+        ("E2", "Q1", "1", 1.0), ("E2", "Q2", "2", 0.0),
+        ("E3", "Q1", "3", 0.0),
+    ]
+    analysis = analyze(key, answers, options, {"Q1": 1, "Q2": 2})
+
+    assert analysis["exams"] == 3 and analysis["answers"] == 5
+    q1, q2 = analysis["questions"]
+    assert q1["difficulty"] == pytest.approx(2 / 3, abs=1e-4) and q2["seq"] == 2
+    assert [option["count"] for option in q1["options"]] == [2, 0, 1]
+    # E3 left Q2 unanswered
+    assert q2["blank"] == 1 and [option["count"] for option in q2["options"]] == [1, 1, 0]
+    # Q1 scores [1, 1, 0] against the rest of the paper (Q2) [1, 0, 0]
+    assert q1["discrimination"] == pytest.approx(0.5, abs=1e-4)
+    assert analysis["sections"][0]["questions"] == 2
@@ -0,0 +1,77 @@
+import asyncio
+import os
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+from app.data.service.paper_cache import CompiledPaper, PaperCache  # noqa: E402
+from app.util.util_cache import LRUCache  # noqa: E402
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.get("b") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_paper_cache_compiles_once_and_recompiles_after_invalidate():
+    compiled_versions = []
+    stored_versions = {"paper-1": 0}
+
+    async def fake_load_version(paper_id):
+        return stored_versions[paper_id]
+
+    async def fake_compile(paper_id):
+        version = stored_versions[paper_id]
+        compiled_versions.append(version)
+        await asyncio.sleep(0)
+        return CompiledPaper(paper_id=paper_id, version=version, paper={"id": paper_id}, sections=[])
+
+    cache = PaperCache(max_size=4)
+    cache._load_version = fake_load_version
+    cache._compile = fake_compile
+
+    async def scenario():
+        first = await asyncio.gather(*[cache.get("paper-1") for _ in range(20)])
+        stored_versions["paper-1"] = 1
+        cache.invalidate("paper-1")
+        second = await cache.get("paper-1")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert compiled_versions == [0, 1]
+    assert all(paper is first[0] for paper in first)
+    assert second.version == 1
+
+
+def test_paper_cache_sees_edits_saved_by_another_worker():
+    stored_versions = {"paper-1": 0}
+
+    async def fake_load_version(paper_id):
+        return stored_versions[paper_id]
+
+    async def fake_compile(paper_id):
+        return CompiledPaper(paper_id=paper_id, version=stored_versions[paper_id], paper={"id": paper_id},
+                             sections=[])
+
+    # no version_ttl: every lookup checks the stored version
+    cache = PaperCache(max_size=4, version_ttl=0)
+    cache._load_version = fake_load_version
+    cache._compile = fake_compile
+
+    async def scenario():
+        first = await cache.get("paper-1")
+        again = await cache.get("paper-1")
+        # saved through another worker: this cache's invalidate() is never called
+        stored_versions["paper-1"] = 1
+        return first, again, await cache.get("paper-1")
+
+    first, again, edited = asyncio.run(scenario())
+    assert again is first
+    assert edited.version == 1
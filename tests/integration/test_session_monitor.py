@@ -0,0 +1,42 @@
+import os
+from datetime import datetime
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+from app.data.dao.exam_dao import EXAM_STATUS_CLOSED, EXAM_STATUS_IN_EXAM, EXAM_STATUS_IN_PREPARATION  # noqa: E402
+from app.data.service.session_monitor import SessionSummary  # noqa: E402
+
+
+def test_session_summary_counters():
+    summary = SessionSummary("S")
+    first = summary.add_exam("E1", None, None)
+    summary.add_exam("E2", EXAM_STATUS_IN_PREPARATION, None)
+
+    summary.set_exam_status(first, EXAM_STATUS_IN_EXAM, datetime(2026, 1, 1, 9))
+    summary.set_section_status(first, 1, EXAM_STATUS_IN_EXAM, datetime(2026, 1, 1, 9), section_id="ES1")
+    summary.set_section_status(first, 1, EXAM_STATUS_CLOSED, datetime(2026, 1, 1, 10), is_timeout=True)
+    # a transition reported twice is counted once
+    summary.set_section_status(first, 1, EXAM_STATUS_CLOSED, datetime(2026, 1, 1, 10), is_timeout=True)
+
+    result = summary.to_dict()
+    assert result["exams"] == 2
+    assert result["by_status"] == {"not_started": 0, "in_preparation": 1, "in_exam": 1, "closed": 0}
+    assert result["sections"] == [{"seq": 1, "in_exam": 0, "closed": 1}]
+    assert result["timeouts"] == 1
+    assert result["last_activity"] == datetime(2026, 1, 1, 10)
+
+
+def test_session_summary_resume_from_ring_buffer():
+    summary = SessionSummary("S", buffer_size=2)
+    exam = summary.add_exam("E1", None, None)
+    summary.publishing = True
+    for status in (EXAM_STATUS_IN_PREPARATION, EXAM_STATUS_IN_EXAM, EXAM_STATUS_CLOSED):
+        summary.set_exam_status(exam, status, datetime(2026, 1, 1, 9))
+
+    assert summary.version == 3
+    assert [(version, row["status"]) for version, row in summary.since(1)] == [(2, EXAM_STATUS_IN_EXAM),
+                                                                              (3, EXAM_STATUS_CLOSED)]
+    assert summary.since(3) == []
+    # version 1 has left the ring buffer, and a version from the future was never issued
+    assert summary.since(0) is None and summary.since(4) is None
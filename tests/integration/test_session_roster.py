@@ -0,0 +1,88 @@
+import asyncio
+import os
+from datetime import datetime
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+from sqlalchemy import select, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from ulid import ULID  # noqa: E402
+
+from app.data.dao.exam_dao import EXAM_STATUS_CLOSED  # noqa: E402
+from app.data.database import engine  # noqa: E402
+from app.data.entity.base import Base  # noqa: E402
+from app.data.entity.entities import Exam, ScheduleSession, Users  # noqa: E402
+from app.data.service.exam_event_service import get_schedule_sections  # noqa: E402
+from app.data.service.roster_cache import RosterCache  # noqa: E402
+from app.data.service.schedule_service import SessionService  # noqa: E402
+
+
+def _session_with_student() -> tuple[str, str]:
+    Base.metadata.create_all(engine)
+    suffix = str(ULID())
+    session_id, email = f"RS{suffix}", f"{suffix}@roster.test"
+    with Session(engine) as session:
+        session.add(Users(id=f"RU{suffix}", email=email, enroll_number=suffix[-20:], is_examinee=True))
+        session.add(ScheduleSession(id=session_id, schedule_id=f"RH{suffix}", paper_id=f"RP{suffix}"))
+        session.commit()
+    return session_id, email
+
+
+def test_reassign_restores_removed_exam():
+    session_id, email = _session_with_student()
+
+    assert SessionService.assign_students(session_id, [email])["assigned"] == 1
+    assert SessionService.remove_student(session_id, email, "PROCTOR")
+    assert SessionService.assign_students(session_id, [email])["assigned"] == 1
+    assert SessionService.assign_students(session_id, [email])["errors"] == [f"Already assigned: {email}"]
+    # removing again finds the one live exam instead of failing on duplicates
+    assert SessionService.remove_student(session_id, email, "PROCTOR")
+
+    with Session(engine) as session:
+        exams = session.scalars(select(Exam).where(Exam.schedule_session_id == session_id)).all()
+    assert len(exams) == 1
+    assert exams[0].is_deleted is True
+
+
+def test_roster_hit_sees_other_workers_writes():
+    session_id, email = _session_with_student()
+    SessionService.assign_students(session_id, [email])
+    with Session(engine) as session:
+        session.execute(update(ScheduleSession).where(ScheduleSession.id == session_id).values(is_ready=True))
+        session.commit()
+    cache = RosterCache()
+    assert cache.warm_up(session_id) == 1
+    assert asyncio.run(cache.lookup(email)).exam['status'] != EXAM_STATUS_CLOSED
+
+    # closed by another worker, whose set_exam_status never reaches this cache
+    with Session(engine) as session:
+        session.execute(update(Exam).where(Exam.schedule_session_id == session_id).values(status=EXAM_STATUS_CLOSED))
+        session.commit()
+    assert asyncio.run(cache.lookup(email)) is None
+    assert cache.stats()["exams"] == 0
+
+
+def test_added_section_reaches_cached_timings():
+    session_id, _ = _session_with_student()
+    SessionService.add_section(session_id, 1)
+    assert list(asyncio.run(get_schedule_sections(session_id))) == [1]
+
+    SessionService.add_section(session_id, 2)
+    assert sorted(asyncio.run(get_schedule_sections(session_id))) == [1, 2]
+
+
+def test_restore_brings_back_children_written_after_the_delete():
+    session_id, email = _session_with_student()
+    SessionService.assign_students(session_id, [email])
+    assert SessionService.delete_session(session_id, "PROCTOR")
+    # a later write to the deleted exam, e.g. a regrade total update, must not keep it deleted
+    with Session(engine) as session:
+        session.execute(update(Exam).where(Exam.schedule_session_id == session_id)
+                        .values(score=1, updated_at=datetime.now()))
+        session.commit()
+    assert SessionService.restore_session(session_id, "PROCTOR")
+
+    with Session(engine) as session:
+        exam = session.scalars(select(Exam).where(Exam.schedule_session_id == session_id)).one()
+    assert exam.is_deleted is None and exam.deleted_batch is None
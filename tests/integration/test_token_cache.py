@@ -0,0 +1,46 @@
+import os
+from datetime import datetime, timezone, timedelta
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SQLALCHEMY_ECHO", "False")
+
+import jwt  # noqa: E402
+import pytest  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+
+from app.ui.common.user_ui import get_current_user_id, token_cache  # noqa: E402
+from app.util.util_cache import TTLCache  # noqa: E402
+from app.util.util_jwt import jwt_token_encode, JWT_TOKEN_SECRET_SALT  # noqa: E402
+
+
+def test_ttl_cache_expires_and_caps_ttl():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=-1)
+    assert cache.get("a") == 1
+    assert "b" not in cache and cache.get("b") is None
+    cache.put("c", 3, ttl=0.000001)
+    assert cache.get("c") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_verified_token_is_cached():
+    token = jwt_token_encode("user-1")
+    hits = token_cache.hits
+    assert get_current_user_id(token) == "user-1"
+    assert get_current_user_id(token) == "user-1"
+    assert token_cache.hits == hits + 1
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-token",
+    jwt.encode({"user_id": "user-1", "exp": datetime.now(timezone.utc) - timedelta(seconds=1)},
+               JWT_TOKEN_SECRET_SALT, algorithm="HS256"),
+    jwt.encode({"user_id": "user-1"}, "wrong-secret", algorithm="HS256"),
+])
+def test_invalid_token_fails_closed(token):
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            get_current_user_id(token)
+        assert exc_info.value.status_code == 401
+    assert token not in token_cache